@@ -0,0 +1,15 @@
+from .generate import ArchiveGenerator
+from .generate import Scale
+from .generate import generate_database
+from .run import benchmarks
+from .run import compare_results
+from .run import run_benchmarks
+
+__all__ = [
+    "ArchiveGenerator",
+    "Scale",
+    "benchmarks",
+    "compare_results",
+    "generate_database",
+    "run_benchmarks",
+]
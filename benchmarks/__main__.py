@@ -0,0 +1,88 @@
+from argparse import ArgumentParser
+from argparse import Namespace
+from json import dumps
+from json import loads
+from pathlib import Path
+from shutil import rmtree
+from sys import exit
+from sys import stderr
+from tempfile import mkdtemp
+from typing import Any
+
+from .generate import Scale
+from .importtime import check_import
+from .run import benchmarks
+from .run import compare_results
+from .run import run_benchmarks
+
+
+def main(args: Namespace) -> int:
+    if args.command == "compare":
+        comparison: list[dict[str, Any]] = compare_results(loads(args.old.read_text()), loads(args.new.read_text()),
+                                                           args.metric, args.threshold)
+        for c in comparison:
+            print(f"{'REGRESSION' if c['regression'] else 'ok':<10} {c['change']:>+8.1%} "
+                  f"{c['old']:>12.6f} {c['new']:>12.6f} {c['name']}")
+        return 1 if any(c["regression"] for c in comparison) else 0
+
+    elif args.command == "importtime":
+        passed, result = check_import(args.budget, args.module, args.runs)
+        for name, time in result["slowest"]:
+            print(f"{time:>10.6f} {name}")
+        print(f"{result['median']:>10.6f} {result['module']} (median of {len(result['times'])}, budget {args.budget})")
+        if result["loaded"]:
+            print(f"Eagerly imported: {', '.join(result['loaded'])}")
+        return 0 if passed else 1
+
+    folder: Path = args.folder or Path(mkdtemp(prefix="localrepo-benchmark-"))
+    try:
+        scale: Scale = Scale(args.submissions, users=args.users, journals=args.journals,
+                             comments_per_submission=args.comments, tags_mean=args.tags,
+                             favorites_mean=args.favorites, files=args.files, file_size=args.file_size,
+                             seed=args.seed)
+        results: dict[str, Any] = run_benchmarks(folder, scale, args.benchmark, args.iterations,
+                                                 lambda n: print(f"Running {n}...", file=stderr, flush=True))
+        if args.output:
+            args.output.write_text(dumps(results, indent=2))
+        else:
+            print(dumps(results, indent=2))
+    finally:
+        if not args.folder and not args.keep:
+            rmtree(folder, ignore_errors=True)
+
+    return 0
+
+
+if __name__ == "__main__":
+    parser: ArgumentParser = ArgumentParser("python -m benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser: ArgumentParser = commands.add_parser("run", help="generate a synthetic archive and run benchmarks")
+    run_parser.add_argument("--submissions", type=int, default=10_000)
+    run_parser.add_argument("--users", type=int, default=None)
+    run_parser.add_argument("--journals", type=int, default=None)
+    run_parser.add_argument("--comments", type=float, default=1.5, help="mean comments per submission")
+    run_parser.add_argument("--tags", type=float, default=14, help="mean tags per submission")
+    run_parser.add_argument("--favorites", type=float, default=25, help="mean favorites per submission")
+    run_parser.add_argument("--files", type=int, default=1_000, help="submissions with files on disk")
+    run_parser.add_argument("--file-size", type=int, default=16 * 1024, help="mean file size in bytes")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--iterations", type=int, default=1_000)
+    run_parser.add_argument("--benchmark", action="append", choices=list(benchmarks.keys()),
+                            help="benchmark to run, can be repeated (default: all)")
+    run_parser.add_argument("--folder", type=Path, default=None, help="folder for generated databases and files")
+    run_parser.add_argument("--keep", action="store_true", help="keep the temporary folder")
+    run_parser.add_argument("--output", type=Path, default=None, help="JSON results file (default: stdout)")
+
+    compare_parser: ArgumentParser = commands.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("old", type=Path)
+    compare_parser.add_argument("new", type=Path)
+    compare_parser.add_argument("--metric", default="p50", choices=["p50", "p99", "mean", "total", "min"])
+    compare_parser.add_argument("--threshold", type=float, default=.1, help="relative change flagged as regression")
+
+    import_parser: ArgumentParser = commands.add_parser("importtime", help="check the package import time budget")
+    import_parser.add_argument("--budget", type=float, default=.1, help="maximum median import time in seconds")
+    import_parser.add_argument("--module", default="localrepo_database")
+    import_parser.add_argument("--runs", type=int, default=7)
+
+    exit(main(parser.parse_args()))
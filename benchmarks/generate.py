@@ -0,0 +1,278 @@
+from datetime import datetime
+from datetime import timedelta
+from pathlib import Path
+from random import Random
+from sqlite3 import Connection
+from sqlite3 import connect
+from typing import Any
+from typing import Generator
+from typing import Iterable
+
+from localrepo_database import Database
+from localrepo_database import Table
+from localrepo_database.column import format_list
+from localrepo_database.tables import CommentsColumns
+from localrepo_database.tables import JournalsColumns
+from localrepo_database.tables import SubmissionsColumns
+from localrepo_database.tables import UsersColumns
+from localrepo_database.update import make_database_5_3
+from localrepo_database.util import tiered_path
+
+__all__ = [
+    "Scale",
+    "ArchiveGenerator",
+    "generate_database",
+    "generate_database_5_3",
+]
+
+_syllables: list[str] = ["ka", "ri", "to", "mu", "ne", "sa", "lo", "vi", "zen", "fox", "wolf", "paw", "tail", "ash",
+                         "fur", "ry", "dra", "kit", "sun", "moo", "ber", "lyn", "rex", "ota", "ink"]
+_words: list[str] = ["the", "a", "and", "of", "to", "in", "commission", "sketch", "drawing", "character", "art",
+                     "thanks", "for", "watching", "my", "new", "piece", "colour", "line", "background", "page",
+                     "comic", "story", "chapter", "stream", "ych", "auction", "reference", "sheet", "badge", "icon",
+                     "please", "do", "not", "repost", "without", "permission", "enjoy", "link", "patreon"]
+_categories: list[str] = ["All", "Artwork (Digital)", "Artwork (Traditional)", "Cellshading", "Crafting", "Designs",
+                          "Flash", "Fursuiting", "Icons", "Mosaics", "Photography", "Sculpting", "Story", "Poetry",
+                          "Prose", "Music", "Podcasts", "Skins", "Handhelds", "Resources", "Adoptables", "Auctions",
+                          "Contests", "Current Events", "Desktops", "Stockart", "Screenshots", "Scraps",
+                          "Wallpaper", "YCH / Sale", "Other"]
+_species: list[str] = ["Unspecified / Any", "Canine", "Wolf", "Fox", "Feline", "Dragon", "Avian", "Equine",
+                       "Rodent", "Reptilian", "Hybrid Species", "Bear", "Otter", "Deer", "Rabbit / Hare", "Hyena",
+                       "Skunk", "Raccoon", "Kangaroo", "Lion", "Tiger", "Husky", "Shark", "Bat", "Cow", "Goat"]
+_genders: list[str] = ["Any", "Male", "Female", "Herm", "Intersex", "Trans (Male)", "Trans (Female)", "Non-Binary",
+                       "Multiple characters", "Other / Not Specified"]
+_ratings: list[str] = ["General", "Mature", "Adult"]
+_types: list[tuple[str, str]] = [("image", "png"), ("image", "jpg"), ("text", "txt"), ("music", "mp3"),
+                                 ("flash", "swf")]
+_file_headers: dict[str, bytes] = {
+    "png": b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR",
+    "jpg": b"\xff\xd8\xff\xe0\x00\x10JFIF\x00",
+    "mp3": b"ID3\x03\x00\x00\x00\x00\x00\x00",
+    "swf": b"FWS\x0a\x00\x00\x00\x00",
+    "txt": b"",
+}
+
+
+class Scale:
+    def __init__(self, submissions: int = 10_000, *, users: int = None, journals: int = None,
+                 comments_per_submission: float = 1.5, tags_mean: float = 14, favorites_mean: float = 25,
+                 files: int = 1_000, file_size: int = 16 * 1024, seed: int = 0):
+        assert submissions > 0, "submissions must be greater than 0"
+        self.submissions: int = submissions
+        self.users: int = users or max(10, submissions // 40)
+        self.journals: int = journals if journals is not None else max(1, submissions // 10)
+        self.comments_per_submission: float = comments_per_submission
+        self.tags_mean: float = tags_mean
+        self.favorites_mean: float = favorites_mean
+        self.files: int = min(files, submissions)
+        self.file_size: int = file_size
+        self.seed: int = seed
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.as_dict()!r})"
+
+    def as_dict(self) -> dict[str, Any]:
+        return dict(self.__dict__)
+
+
+class ArchiveGenerator:
+    def __init__(self, scale: Scale):
+        self.scale: Scale = scale
+        self.random: Random = Random(scale.seed)
+        self.usernames: list[str] = self._usernames(scale.users)
+        self.tags: list[str] = sorted({self._word(1, 3) for _ in range(max(200, scale.submissions // 20))})
+        self.start_date: datetime = datetime(2006, 1, 1)
+
+    def _word(self, min_syllables: int, max_syllables: int) -> str:
+        return "".join(self.random.choices(_syllables, k=self.random.randint(min_syllables, max_syllables)))
+
+    def _usernames(self, n: int) -> list[str]:
+        names: set[str] = set()
+        while len(names) < n:
+            names.add(self._word(2, 4) + (str(self.random.randint(0, 999)) if self.random.random() < .3 else ""))
+        return sorted(names)
+
+    def _zipf_choice(self, population: list[str], k: int) -> list[str]:
+        # Zipf-like distribution: few very common elements, long tail of rare ones
+        k = min(k, len(population))
+        chosen: dict[str, None] = {}
+        while len(chosen) < k:
+            chosen[population[min(len(population) - 1, int(self.random.paretovariate(1.1)) - 1)]] = None
+            if len(chosen) < k and self.random.random() < .5:
+                chosen[self.random.choice(population)] = None
+        return list(chosen)
+
+    def _length(self, mean: float, limit: int) -> int:
+        return min(limit, int(self.random.lognormvariate(0, 1) * mean / 1.65))
+
+    def _text(self, mean_words: float, html: bool = True) -> str:
+        words: list[str] = self.random.choices(_words, k=self._length(mean_words, 2000))
+        if not html:
+            return " ".join(words)
+        return "<br/>\n".join(" ".join(words[i:i + 12]) for i in range(0, len(words), 12))
+
+    def _date(self, i: int, total: int) -> datetime:
+        return self.start_date + timedelta(minutes=int(i / total * 9_000_000) + self.random.randint(0, 600))
+
+    def user(self, username: str) -> dict[str, Any]:
+        return {
+            UsersColumns.USERNAME.name: username,
+            UsersColumns.FOLDERS.name: self.random.sample(["gallery", "scraps", "favorites", "journals"],
+                                                          self.random.randint(0, 4)),
+            UsersColumns.ACTIVE.name: self.random.random() < .9,
+            UsersColumns.USERPAGE.name: self._text(80),
+        }
+
+    def submission(self, id_: int) -> dict[str, Any]:
+        type_, ext = self.random.choice(_types)
+        author: str = self._zipf_choice(self.usernames, 1)[0]
+        return {
+            SubmissionsColumns.ID.name: id_,
+            SubmissionsColumns.AUTHOR.name: author,
+            SubmissionsColumns.TITLE.name: self._text(5, html=False).title(),
+            SubmissionsColumns.DATE.name: self._date(id_, self.scale.submissions),
+            SubmissionsColumns.DESCRIPTION.name: self._text(90),
+            SubmissionsColumns.FOOTER.name: self._text(10) if self.random.random() < .2 else "",
+            SubmissionsColumns.TAGS.name: self._zipf_choice(self.tags, self._length(self.scale.tags_mean, 60)),
+            SubmissionsColumns.CATEGORY.name: self.random.choice(_categories),
+            SubmissionsColumns.SPECIES.name: self.random.choice(_species),
+            SubmissionsColumns.GENDER.name: self.random.choice(_genders),
+            SubmissionsColumns.RATING.name: self.random.choice(_ratings),
+            SubmissionsColumns.TYPE.name: type_,
+            SubmissionsColumns.FILEURL.name: [f"https://d.example.net/art/{author}/{id_}/file.{ext}"],
+            SubmissionsColumns.FILEEXT.name: [ext],
+            SubmissionsColumns.FILESAVED.name: 0b111 if id_ <= self.scale.files else 0,
+            SubmissionsColumns.FAVORITE.name: set(self._zipf_choice(
+                self.usernames, self._length(self.scale.favorites_mean, len(self.usernames)))),
+            SubmissionsColumns.MENTIONS.name: set(self.random.sample(self.usernames, self.random.randint(0, 3))),
+            SubmissionsColumns.FOLDER.name: "scraps" if self.random.random() < .15 else "gallery",
+            SubmissionsColumns.USERUPDATE.name: self.random.random() < .7,
+        }
+
+    def journal(self, id_: int) -> dict[str, Any]:
+        return {
+            JournalsColumns.ID.name: id_,
+            JournalsColumns.AUTHOR.name: self._zipf_choice(self.usernames, 1)[0],
+            JournalsColumns.TITLE.name: self._text(5, html=False).title(),
+            JournalsColumns.DATE.name: self._date(id_, self.scale.journals),
+            JournalsColumns.CONTENT.name: self._text(150),
+            JournalsColumns.HEADER.name: self._text(10) if self.random.random() < .1 else "",
+            JournalsColumns.FOOTER.name: self._text(10) if self.random.random() < .2 else "",
+            JournalsColumns.MENTIONS.name: set(self.random.sample(self.usernames, self.random.randint(0, 3))),
+            JournalsColumns.USERUPDATE.name: self.random.random() < .7,
+        }
+
+    def comments(self, parent_table: str, parent_id: int, first_id: int) -> list[dict[str, Any]]:
+        # Geometric number of comments per parent, each one replying to a previous comment with some probability,
+        # producing a few deep threads and many shallow ones
+        comments: list[dict[str, Any]] = []
+        n: int = 0
+        while self.random.random() < self.scale.comments_per_submission / (1 + self.scale.comments_per_submission):
+            reply_to: int | None = None
+            if comments and self.random.random() < .45:
+                reply_to = comments[-1 if self.random.random() < .6 else self.random.randrange(len(comments))][
+                    CommentsColumns.ID.name]
+            comments.append({
+                CommentsColumns.ID.name: first_id + n,
+                CommentsColumns.PARENT_TABLE.name: parent_table,
+                CommentsColumns.PARENT_ID.name: parent_id,
+                CommentsColumns.REPLY_TO.name: reply_to,
+                CommentsColumns.AUTHOR.name: self.random.choice(self.usernames),
+                CommentsColumns.DATE.name: self._date(parent_id, self.scale.submissions),
+                CommentsColumns.TEXT.name: self._text(20),
+            })
+            n += 1
+        return comments
+
+    def file(self, ext: str) -> bytes:
+        size: int = max(64, int(self.random.lognormvariate(0, .75) * self.scale.file_size))
+        if ext == "txt":
+            return self._text(size // 6, html=False).encode()[:size] or b"text"
+        return _file_headers[ext] + self.random.randbytes(size)
+
+    def thumbnail(self) -> bytes:
+        return _file_headers["jpg"] + self.random.randbytes(max(64, self.scale.file_size // 16))
+
+    def users(self) -> Generator[dict[str, Any], None, None]:
+        return (self.user(u) for u in self.usernames)
+
+    def submissions(self, start: int = 1, stop: int = None) -> Generator[dict[str, Any], None, None]:
+        return (self.submission(i) for i in range(start, (stop or self.scale.submissions) + 1))
+
+    def journals(self, start: int = 1, stop: int = None) -> Generator[dict[str, Any], None, None]:
+        return (self.journal(i) for i in range(start, (stop or self.scale.journals) + 1))
+
+
+def _insert_many(table: Table, entries: Iterable[dict[str, Any]], chunk_size: int = 10_000):
+    chunk: list[dict[str, Any]] = []
+    for entry in entries:
+        chunk.append(table.format_entry(entry))
+        if len(chunk) >= chunk_size:
+            _flush(table, chunk)
+            chunk = []
+    _flush(table, chunk)
+
+
+def _flush(table: Table, entries: list[dict[str, Any]]):
+    if not entries:
+        return
+    keys: list[str] = list(entries[0].keys())
+    table.database.connection.executemany(f"insert or replace into {table.name} ({','.join(keys)})"
+                                          f" values ({','.join('?' * len(keys))})",
+                                          [[e[k] for k in keys] for e in entries])
+
+
+def generate_database(path: Path, scale: Scale, *, files: bool = True) -> Database:
+    generator: ArchiveGenerator = ArchiveGenerator(scale)
+    db: Database = Database(path, init=True, check_connections=False)
+
+    _insert_many(db.users, generator.users())
+    _insert_many(db.submissions, generator.submissions())
+    _insert_many(db.journals, generator.journals())
+
+    def comments() -> Generator[dict[str, Any], None, None]:
+        comment_id: int = 1
+        for parent_table, total in ((db.submissions.name, scale.submissions), (db.journals.name, scale.journals)):
+            for parent_id in range(1, total + 1):
+                for comment in generator.comments(parent_table, parent_id, comment_id):
+                    comment_id += 1
+                    yield comment
+
+    _insert_many(db.comments, comments())
+    db.commit()
+
+    if files:
+        for id_, [ext] in db.submissions.select_sql("ID <= ?", [scale.files],
+                                                    [SubmissionsColumns.ID, SubmissionsColumns.FILEEXT]).tuples:
+            folder: Path = db.submissions.files_folder / tiered_path(id_)
+            folder.mkdir(parents=True, exist_ok=True)
+            folder.joinpath(f"submission.{ext}").write_bytes(generator.file(ext))
+            folder.joinpath("thumbnail.jpg").write_bytes(generator.thumbnail())
+
+    return db
+
+
+def generate_database_5_3(path: Path, scale: Scale) -> Connection:
+    generator: ArchiveGenerator = ArchiveGenerator(scale)
+    conn: Connection = make_database_5_3(connect(path))
+    conn.executemany("insert into USERS (USERNAME, FOLDERS, ACTIVE, USERPAGE) values (?, ?, ?, ?)",
+                     ([u["USERNAME"], format_list(u["FOLDERS"], sort=True), u["ACTIVE"], u["USERPAGE"]]
+                      for u in generator.users()))
+    conn.executemany("insert into SUBMISSIONS (ID,AUTHOR,TITLE,DATE,DESCRIPTION,TAGS,CATEGORY,SPECIES,GENDER,RATING,"
+                     "TYPE,FILEURL,FILEEXT,FILESAVED,FAVORITE,MENTIONS,FOLDER,USERUPDATE)"
+                     "values (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                     ([s["ID"], s["AUTHOR"], s["TITLE"], s["DATE"].strftime("%Y-%m-%dT%H:%M"),
+                       s["DESCRIPTION"] + (f'<div class="submission-footer"><hr>{s["FOOTER"]}</div>'
+                                           if s["FOOTER"] else ""),
+                       format_list(s["TAGS"]), s["CATEGORY"], s["SPECIES"], s["GENDER"], s["RATING"], s["TYPE"],
+                       format_list(s["FILEURL"]), format_list(s["FILEEXT"]), s["FILESAVED"],
+                       format_list(s["FAVORITE"], sort=True), format_list(s["MENTIONS"], sort=True), s["FOLDER"],
+                       s["USERUPDATE"]]
+                      for s in generator.submissions()))
+    conn.executemany("insert into JOURNALS (ID,AUTHOR,TITLE,DATE,CONTENT,MENTIONS,USERUPDATE)"
+                     "values (?,?,?,?,?,?,?)",
+                     ([j["ID"], j["AUTHOR"], j["TITLE"], j["DATE"].strftime("%Y-%m-%dT%H:%M"), j["CONTENT"],
+                       format_list(j["MENTIONS"], sort=True), j["USERUPDATE"]]
+                      for j in generator.journals()))
+    conn.commit()
+    return conn
@@ -0,0 +1,41 @@
+from statistics import median
+from subprocess import run
+from sys import executable
+from typing import Any
+
+__all__ = [
+    "lazy_modules",
+    "measure_import",
+    "check_import",
+]
+
+lazy_modules: tuple[str, ...] = ("psutil", "chardet", "filetype")
+
+
+def measure_import(module: str = "localrepo_database", runs: int = 7) -> dict[str, Any]:
+    times: list[float] = []
+    modules: dict[str, float] = {}
+    for _ in range(runs):
+        process = run([executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True,
+                      check=True)
+        for line in process.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line.removeprefix("import time:").split("|")
+            if not cumulative.strip().isdigit():
+                continue
+            modules[name := name.strip()] = max(modules.get(name, 0), int(cumulative) / 1_000_000)
+            if name == module:
+                times.append(int(cumulative) / 1_000_000)
+    return {
+        "module": module,
+        "times": times,
+        "median": median(times) if times else 0,
+        "loaded": sorted(m for m in modules if m.split(".")[0] in lazy_modules),
+        "slowest": sorted(((m, t) for m, t in modules.items() if m != module), key=lambda m: m[1], reverse=True)[:10],
+    }
+
+
+def check_import(budget: float, module: str = "localrepo_database", runs: int = 7) -> tuple[bool, dict[str, Any]]:
+    result: dict[str, Any] = measure_import(module, runs)
+    return result["median"] <= budget and not result["loaded"], result
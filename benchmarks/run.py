@@ -0,0 +1,315 @@
+from contextlib import redirect_stdout
+from io import StringIO
+from math import ceil
+from pathlib import Path
+from platform import platform
+from platform import python_version
+from random import Random
+from shutil import copy2
+from sqlite3 import Connection
+from sqlite3 import sqlite_version
+from statistics import mean
+from time import perf_counter
+from typing import Any
+from typing import Callable
+
+from localrepo_database import Database
+from localrepo_database import __version__
+from localrepo_database.tables import CommentsColumns
+from localrepo_database.tables import SubmissionsColumns
+from localrepo_database.update import update_database
+
+from .generate import ArchiveGenerator
+from .generate import Scale
+from .generate import generate_database
+from .generate import generate_database_5_3
+from .importtime import measure_import
+
+__all__ = [
+    "Result",
+    "Context",
+    "benchmarks",
+    "run_benchmarks",
+    "compare_results",
+]
+
+
+class Result:
+    def __init__(self, name: str, times: list[float], items: int = None, **extra: Any):
+        self.name: str = name
+        self.times: list[float] = times
+        self.items: int = items if items is not None else len(times)
+        self.extra: dict[str, Any] = extra
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.name!r}, total={self.total:.6f}, items={self.items})"
+
+    @property
+    def total(self) -> float:
+        return sum(self.times)
+
+    def percentile(self, q: float) -> float:
+        times: list[float] = sorted(self.times)
+        return times[max(0, ceil(q * len(times)) - 1)] if times else 0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "runs": len(self.times),
+            "items": self.items,
+            "total": self.total,
+            "mean": mean(self.times) if self.times else 0,
+            "min": min(self.times, default=0),
+            "max": max(self.times, default=0),
+            "p50": self.percentile(.5),
+            "p99": self.percentile(.99),
+            "items_per_second": self.items / self.total if self.total else 0,
+            **self.extra,
+        }
+
+
+class Context:
+    def __init__(self, db: Database, scale: Scale, folder: Path, iterations: int):
+        self.db: Database = db
+        self.scale: Scale = scale
+        self.folder: Path = folder
+        self.iterations: int = iterations
+        self.random: Random = Random(scale.seed)
+        self.generator: ArchiveGenerator = ArchiveGenerator(scale)
+
+    def sample_ids(self, n: int, total: int = None) -> list[int]:
+        return [self.random.randint(1, total or self.scale.submissions) for _ in range(n)]
+
+
+benchmarks: dict[str, Callable[[Context], list[Result]]] = {}
+
+
+def benchmark(name: str):
+    def decorator(func: Callable[[Context], list[Result]]) -> Callable[[Context], list[Result]]:
+        benchmarks[name] = func
+        return func
+
+    return decorator
+
+
+def time_each(name: str, func: Callable[[Any], Any], arguments: list[Any], **extra: Any) -> Result:
+    times: list[float] = []
+    for argument in arguments:
+        start: float = perf_counter()
+        func(argument)
+        times.append(perf_counter() - start)
+    return Result(name, times, **extra)
+
+
+def time_once(name: str, func: Callable[[], Any], items: int = 1, **extra: Any) -> Result:
+    start: float = perf_counter()
+    func()
+    return Result(name, [perf_counter() - start], items, **extra)
+
+
+@benchmark("save_submission")
+def bench_save_submission(ctx: Context) -> list[Result]:
+    first_id: int = ctx.scale.submissions + 1
+    submissions: list[tuple[dict, list[bytes], bytes]] = []
+    for submission in ctx.generator.submissions(first_id, first_id + ctx.iterations - 1):
+        submissions.append((submission, [ctx.generator.file(e) for e in submission["FILEEXT"]],
+                            ctx.generator.thumbnail()))
+    result: Result = time_each("save_submission",
+                               lambda s: ctx.db.submissions.save_submission(s[0], s[1], s[2], replace=True),
+                               submissions)
+    return [result, time_once("save_submission[commit]", ctx.db.commit, len(submissions))]
+
+
+@benchmark("getitem")
+def bench_getitem(ctx: Context) -> list[Result]:
+    ids: list[int] = ctx.sample_ids(ctx.iterations)
+    return [
+        time_each("submissions.__getitem__", ctx.db.submissions.__getitem__, ids),
+        time_each("submissions.__getitem__[list]", ctx.db.submissions.__getitem__,
+                  [ctx.sample_ids(500) for _ in range(max(1, ctx.iterations // 100))], keys=500),
+        time_each("journals.__getitem__", ctx.db.journals.__getitem__, ctx.sample_ids(ctx.iterations,
+                                                                                      ctx.scale.journals)),
+    ]
+
+
+@benchmark("contains")
+def bench_contains(ctx: Context) -> list[Result]:
+    misses: list[int] = [ctx.scale.submissions * 10 + i for i in range(ctx.iterations)]
+    return [
+        time_each("submissions.__contains__[hit]", ctx.db.submissions.__contains__, ctx.sample_ids(ctx.iterations)),
+        time_each("submissions.__contains__[miss]", ctx.db.submissions.__contains__, misses),
+    ]
+
+
+@benchmark("select_query")
+def bench_select_query(ctx: Context) -> list[Result]:
+    tags: list[str] = ctx.generator.tags
+    authors: list[str] = ctx.generator.usernames
+    queries: dict[str, list[str]] = {
+        "tag": [f"@tags {ctx.random.choice(tags)}" for _ in range(ctx.iterations // 10 or 1)],
+        "tags_and_or": [f"@tags {ctx.random.choice(tags)} & ({ctx.random.choice(tags)} | !{ctx.random.choice(tags)})"
+                        for _ in range(ctx.iterations // 10 or 1)],
+        "author": [f"@author ^{ctx.random.choice(authors)}$" for _ in range(ctx.iterations // 10 or 1)],
+        "title_any": [f"@title {ctx.random.choice(['sketch', 'comic', 'ych'])} @rating general"
+                      for _ in range(ctx.iterations // 10 or 1)],
+    }
+    likes: list[str] = ["tags", "title", "description", "rating"]
+    aliases: dict[str, str] = {"tags": "TAGS", "author": "AUTHOR", "title": "TITLE", "rating": "RATING"}
+    return [time_each(f"select_query[{name}]",
+                      lambda q: ctx.db.submissions.select_query(
+                          q, [SubmissionsColumns.ID.name], "any", likes, aliases,
+                          order=[f"{SubmissionsColumns.ID.name} DESC"]).fetchall(),
+                      qs)
+            for name, qs in queries.items()]
+
+
+@benchmark("scan")
+def bench_scan(ctx: Context) -> list[Result]:
+    return [
+        time_once("submissions.select().entries", lambda: sum(1 for _ in ctx.db.submissions.select().entries),
+                  ctx.scale.submissions),
+        time_once("submissions.select([ID,AUTHOR]).entries",
+                  lambda: sum(1 for _ in ctx.db.submissions.select(
+                      columns=[SubmissionsColumns.ID.name, SubmissionsColumns.AUTHOR.name]).entries),
+                  ctx.scale.submissions),
+        time_once("journals.select().entries", lambda: sum(1 for _ in ctx.db.journals.select().entries),
+                  ctx.scale.journals),
+    ]
+
+
+@benchmark("comments_tree")
+def bench_comments_tree(ctx: Context) -> list[Result]:
+    parents: list[int] = [
+        i for [i] in ctx.db.comments.select_sql(
+            f"{CommentsColumns.PARENT_TABLE.name} = ?", [ctx.db.submissions.name],
+            [f"distinct {CommentsColumns.PARENT_ID.name}"], limit=ctx.iterations * 10).cursor]
+    ctx.random.shuffle(parents)
+    return [time_each("comments.get_comments_tree",
+                      lambda i: ctx.db.comments.get_comments_tree(ctx.db.submissions.name, i),
+                      parents[:ctx.iterations])]
+
+
+@benchmark("merge")
+def bench_merge(ctx: Context) -> list[Result]:
+    source_scale: Scale = Scale(min(ctx.scale.submissions, ctx.iterations * 2), files=ctx.iterations // 10,
+                                file_size=ctx.scale.file_size, seed=ctx.scale.seed + 1)
+    # Each database gets its own folder so the files folders are not shared with each other or the main database
+    (source_folder := ctx.folder / "merge" / "source").mkdir(parents=True, exist_ok=True)
+    (destination_folder := ctx.folder / "merge" / "destination").mkdir(parents=True, exist_ok=True)
+    source: Database = generate_database(source_folder / "FA.db", source_scale)
+    destination: Database = Database(destination_folder / "FA.db", init=True, check_connections=False)
+    try:
+        items: int = source_scale.users + source_scale.submissions + source_scale.journals
+        return [time_once("merge", lambda: destination.merge(source), items),
+                time_once("merge[commit]", destination.commit, items)]
+    finally:
+        source.close()
+        destination.close()
+
+
+@benchmark("backup")
+def bench_backup(ctx: Context) -> list[Result]:
+    ctx.db.commit()
+    return [time_once("backup", lambda: ctx.db.backup(folder=ctx.folder / "backup"),
+                      size=ctx.db.path.stat().st_size)]
+
+
+@benchmark("update_database")
+def bench_update_database(ctx: Context) -> list[Result]:
+    path: Path = ctx.folder / "update" / "FA.db"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn: Connection = generate_database_5_3(path, Scale(min(ctx.scale.submissions, ctx.iterations * 10),
+                                                         seed=ctx.scale.seed))
+    output: StringIO = StringIO()
+
+    def update():
+        nonlocal conn
+        with redirect_stdout(output):
+            conn = update_database(conn, __version__)
+
+    try:
+        return [time_once("update_database[5.3.0]", update, conn.execute("select count(*) from SUBMISSIONS")
+                          .fetchone()[0])]
+    finally:
+        conn.close()
+
+
+@benchmark("compression")
+def bench_compression(ctx: Context) -> list[Result]:
+    ctx.db.commit()
+    results: list[Result] = []
+    for name, dictionary in (("plain", None), ("zlib", False), ("zlib+dictionary", True)):
+        copy2(ctx.db.path, path := ctx.folder / f"compression_{name.replace('+', '_')}.db")
+        db: Database = Database(path, check_connections=False)
+        try:
+            if dictionary is not None:
+                zdict: bytes | None = db.train_compression_dictionary() if dictionary else None
+                results.append(time_once(f"enable_compression[{name}]", lambda: db.enable_compression(dictionary=zdict),
+                                         ctx.scale.submissions))
+            db.execute("vacuum")
+            size: int = path.stat().st_size
+            results.append(time_once(f"scan[DESCRIPTION,{name}]", lambda: sum(1 for _ in db.submissions.select(
+                columns=[SubmissionsColumns.ID.name, SubmissionsColumns.DESCRIPTION.name]).entries),
+                                     ctx.scale.submissions, size=size))
+            results.append(time_each(f"select_query[description,{name}]",
+                                     lambda q: db.submissions.select_query(
+                                         q, [SubmissionsColumns.ID.name], "any", ["description"],
+                                         {"description": SubmissionsColumns.DESCRIPTION.name}).fetchall(),
+                                     [f"@description {w}" for w in ("commission", "patreon", "ych & auction")],
+                                     size=size))
+        finally:
+            db.close()
+    return results
+
+
+@benchmark("import_time")
+def bench_import_time(ctx: Context) -> list[Result]:
+    result: dict[str, Any] = measure_import("localrepo_database", max(1, min(ctx.iterations, 10)))
+    return [Result("import[localrepo_database]", result["times"], lazy_loaded=result["loaded"])]
+
+
+def run_benchmarks(folder: Path, scale: Scale, names: list[str] = None, iterations: int = 1000,
+                   progress: Callable[[str], Any] = None) -> dict[str, Any]:
+    names = names or list(benchmarks.keys())
+    assert all(n in benchmarks for n in names), f"unknown benchmarks {set(names) - set(benchmarks)}"
+    folder.mkdir(parents=True, exist_ok=True)
+
+    start: float = perf_counter()
+    db: Database = generate_database(folder / "FA.db", scale)
+    generation: float = perf_counter() - start
+
+    results: list[Result] = []
+    try:
+        for name in names:
+            if progress:
+                progress(name)
+            results.extend(benchmarks[name](Context(db, scale, folder, iterations)))
+    finally:
+        db.close()
+
+    return {
+        "meta": {
+            "version": __version__,
+            "python": python_version(),
+            "sqlite": sqlite_version,
+            "platform": platform(),
+            "scale": scale.as_dict(),
+            "iterations": iterations,
+            "generation": generation,
+            "database_size": (folder / "FA.db").stat().st_size,
+        },
+        "results": [r.as_dict() for r in results],
+    }
+
+
+def compare_results(old: dict[str, Any], new: dict[str, Any], metric: str = "p50", threshold: float = .1
+                    ) -> list[dict[str, Any]]:
+    old_results: dict[str, dict[str, Any]] = {r["name"]: r for r in old["results"]}
+    comparison: list[dict[str, Any]] = []
+    for result in new["results"]:
+        if (old_result := old_results.get(result["name"])) is None or not old_result[metric]:
+            continue
+        change: float = (result[metric] - old_result[metric]) / old_result[metric]
+        comparison.append({"name": result["name"], "old": old_result[metric], "new": result[metric],
+                           "change": change, "regression": change > threshold})
+    return comparison
@@ -8,6 +8,7 @@ from .database import SettingsTable
 from .database import SubmissionsTable
 from .database import Table
 from .database import UsersTable
+from .files import SubmissionFile
 
 __all__ = [
     "__version__",
@@ -17,10 +18,21 @@ __all__ = [
     "HistoryTable",
     "JournalsTable",
     "SettingsTable",
+    "SubmissionFile",
     "SubmissionsTable",
     "UsersTable",
     "Table",
+    "audit",
+    "autocomplete",
+    "batch",
     "exceptions",
+    "export",
+    "functions",
+    "parallel",
+    "shard",
+    "similarity",
     "util",
-    "tables"
+    "tables",
+    "tracing",
+    "writer",
 ]
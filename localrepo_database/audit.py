@@ -0,0 +1,160 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from json import dumps
+from json import loads
+from os import scandir
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+from typing import Callable
+from typing import TYPE_CHECKING
+
+from .tables import SubmissionsColumns
+from .util import tiered_path
+
+if TYPE_CHECKING:
+    from .database import Database
+
+__all__ = [
+    "AuditMismatch",
+    "AuditReport",
+    "audit_files",
+]
+
+
+class AuditMismatch:
+    def __init__(self, submission_id: int, filesaved: int, expected: int, missing: list[str]):
+        self.submission_id: int = submission_id
+        self.filesaved: int = filesaved
+        self.expected: int = expected
+        self.missing: list[str] = missing
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.submission_id}, " \
+               f"filesaved={self.filesaved:03b}, expected={self.expected:03b}, missing={self.missing!r})"
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"submission_id": self.submission_id, "filesaved": self.filesaved, "expected": self.expected,
+                "missing": self.missing}
+
+
+class AuditReport:
+    def __init__(self, last_id: int = 0, checked: int = 0, mismatched: int = 0, repaired: int = 0):
+        self.last_id: int = last_id
+        self.checked: int = checked
+        self.mismatched: int = mismatched
+        self.repaired: int = repaired
+        self.mismatches: list[AuditMismatch] = []
+        self.complete: bool = False
+        self.elapsed: float = 0
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(last_id={self.last_id}, checked={self.checked}, " \
+               f"mismatched={self.mismatched}, repaired={self.repaired}, complete={self.complete})"
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"last_id": self.last_id, "checked": self.checked, "mismatched": self.mismatched,
+                "repaired": self.repaired, "complete": self.complete}
+
+    def save(self, file: Path):
+        file.with_suffix(".tmp").write_text(dumps(self.as_dict()))
+        file.with_suffix(".tmp").replace(file)
+
+    @classmethod
+    def load(cls, file: Path) -> 'AuditReport':
+        data: dict[str, Any] = loads(file.read_text())
+        report: AuditReport = cls(data["last_id"], data["checked"], data["mismatched"], data["repaired"])
+        report.complete = data.get("complete", False)
+        return report
+
+
+def _scan_folder(folder: Path, *, directories: bool = False) -> set[str]:
+    try:
+        with scandir(folder) as entries:
+            return {e.name for e in entries if (e.is_dir() if directories else e.is_file())}
+    except (FileNotFoundError, NotADirectoryError):
+        return set()
+
+
+def _scan_folders(executor: ThreadPoolExecutor, folders: list[Path]) -> dict[Path, set[str]]:
+    # Consecutive IDs share the parent tier directory, listing it once skips the folders of submissions without files
+    parents: list[Path] = list(dict.fromkeys(f.parent for f in folders))
+    existing: set[Path] = {p / name for p, names in
+                           zip(parents, executor.map(partial(_scan_folder, directories=True), parents))
+                           for name in names}
+    folders = [f for f in dict.fromkeys(folders) if f in existing]
+    return dict(zip(folders, executor.map(_scan_folder, folders)))
+
+
+def _expected_filesaved(filesaved: int, file_url: list[str], file_ext: list[str], files: set[str]
+                        ) -> tuple[int, list[str]]:
+    names: list[str] = [f"submission{n or ''}{('.' + ext) if ext else ''}" for n, ext in enumerate(file_ext)]
+    missing: list[str] = [name for name in names if name not in files]
+    any_file: bool = len(missing) < len(names)
+    # The all-files flag can only be confirmed from disk, never raised for submissions where some remote files
+    # were not saved (and thus not listed in FILEEXT).
+    all_files: bool = bool(names) and not missing and (bool(filesaved & 0b100) or len(names) >= len(file_url))
+    thumbnail: bool = "thumbnail.jpg" in files
+    if not thumbnail and filesaved & 0b001:
+        missing.append("thumbnail.jpg")
+    return (0b100 * all_files) + (0b010 * any_file) + (0b001 * thumbnail), missing
+
+
+def audit_files(db: 'Database', *, start: int = 0, end: int = None, chunk_size: int = 1000, workers: int = 8,
+                repair: bool = False, checkpoint: Path = None,
+                on_mismatch: Callable[[AuditMismatch], Any] = None,
+                progress: Callable[[AuditReport], Any] = None) -> AuditReport:
+    report: AuditReport = AuditReport(start)
+    if checkpoint is not None and checkpoint.is_file():
+        report = AuditReport.load(checkpoint)
+        report.complete = False
+
+    files_folder: Path = db.submissions.files_folder
+    columns: list[str] = [SubmissionsColumns.ID.name, SubmissionsColumns.FILEURL.name,
+                          SubmissionsColumns.FILEEXT.name, SubmissionsColumns.FILESAVED.name]
+    start_time: float = perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            entries: list[dict[str, Any]] = db.submissions.select_sql(
+                f"{SubmissionsColumns.ID.name} > ?" + (f" and {SubmissionsColumns.ID.name} <= ?" if end else ""),
+                [report.last_id, *([end] if end else [])], columns,
+                order=[SubmissionsColumns.ID.name], limit=chunk_size).fetchall()
+            if not entries:
+                report.complete = True
+                break
+
+            folders: list[Path] = [files_folder / tiered_path(e[SubmissionsColumns.ID.name]) for e in entries]
+            folder_files: dict[Path, set[str]] = _scan_folders(executor, folders)
+
+            for entry, folder in zip(entries, folders):
+                filesaved: int = entry[SubmissionsColumns.FILESAVED.name]
+                expected, missing = _expected_filesaved(filesaved, entry[SubmissionsColumns.FILEURL.name],
+                                                        entry[SubmissionsColumns.FILEEXT.name],
+                                                        folder_files.get(folder, set()))
+                if expected != filesaved:
+                    mismatch: AuditMismatch = AuditMismatch(entry[SubmissionsColumns.ID.name], filesaved,
+                                                            expected, missing)
+                    report.mismatches.append(mismatch)
+                    report.mismatched += 1
+                    if on_mismatch is not None:
+                        on_mismatch(mismatch)
+                    if repair and db.submissions.set_filesaved(mismatch.submission_id, expected & 0b100,
+                                                               expected & 0b010, expected & 0b001):
+                        report.repaired += 1
+
+            report.checked += len(entries)
+            report.last_id = entries[-1][SubmissionsColumns.ID.name]
+
+            if repair:
+                db.commit()
+            if checkpoint is not None:
+                report.save(checkpoint)
+            if progress is not None:
+                progress(report)
+
+    report.elapsed = perf_counter() - start_time
+    if checkpoint is not None:
+        report.save(checkpoint)
+
+    return report
@@ -0,0 +1,138 @@
+from bisect import bisect_left
+from bisect import insort
+from collections import Counter
+from heapq import nlargest
+from sqlite3 import Cursor as SQLCursor
+from typing import Iterable
+from typing import TYPE_CHECKING
+
+from .column import parse_list_filter_empty
+from .tables import SubmissionsColumns
+from .tables import UsersColumns
+from .tables import submissions_table
+from .tables import users_table
+from .types import Value
+from .util import clean_username
+
+if TYPE_CHECKING:
+    from .database import Database
+
+__all__ = [
+    "PrefixIndex",
+    "Autocomplete",
+]
+
+
+class PrefixIndex:
+    def __init__(self, counts: dict[str, int] = None):
+        self.counts: dict[str, int] = {}
+        self.terms: list[str] = []
+        if counts:
+            self.load(counts)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(terms={len(self.terms)})"
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.counts
+
+    def load(self, counts: dict[str, int]):
+        self.counts = {t: n for t, n in counts.items() if t and n > 0}
+        self.terms = sorted(self.counts)
+
+    def update(self, counts: dict[str, int]):
+        for term, n in counts.items():
+            if not term or not n:
+                continue
+            elif (count := self.counts.get(term, 0) + n) > 0:
+                if term not in self.counts:
+                    insort(self.terms, term)
+                self.counts[term] = count
+            elif term in self.counts:
+                del self.counts[term]
+                del self.terms[bisect_left(self.terms, term)]
+
+    def prefix_range(self, prefix: str) -> tuple[int, int]:
+        # Every term that starts with the prefix sorts between the prefix and the prefix followed by the last code point
+        return bisect_left(self.terms, prefix), bisect_left(self.terms, prefix + "\U0010FFFF")
+
+    def complete(self, prefix: str, limit: int = 10) -> list[tuple[str, int]]:
+        start, end = self.prefix_range(prefix)
+        terms: list[str] = self.terms[start:end]
+        if limit <= 0 or len(terms) <= limit:
+            return sorted(((t, self.counts[t]) for t in terms), key=lambda c: -c[1])
+        return [(t, self.counts[t]) for t in nlargest(limit, terms, key=self.counts.__getitem__)]
+
+
+class Autocomplete:
+    chunk_size: int = 10000
+
+    def __init__(self, database: 'Database'):
+        self.database: Database = database
+        self.tags_index: PrefixIndex = PrefixIndex()
+        self.usernames_index: PrefixIndex = PrefixIndex()
+        self.loaded: bool = False
+        self._version: int | None = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(tags={len(self.tags_index)}, usernames={len(self.usernames_index)})"
+
+    @staticmethod
+    def _counts(table: str, rows: Iterable[dict[str, Value]]) -> tuple[Counter[str], Counter[str]]:
+        tags: Counter[str] = Counter()
+        usernames: Counter[str] = Counter()
+        for row in rows:
+            if table == submissions_table:
+                tags.update(t.lower() for t in parse_list_filter_empty(row.get(SubmissionsColumns.TAGS.name) or ""))
+                usernames[clean_username(row.get(SubmissionsColumns.AUTHOR.name) or "")] += 1
+            elif table == users_table:
+                usernames[clean_username(row.get(UsersColumns.USERNAME.name) or "")] += 1
+        return tags, usernames
+
+    def load(self):
+        tags: Counter[str] = Counter()
+        usernames: Counter[str] = Counter()
+        self._version = self.database.pragma("data_version")
+        for table, columns in ((self.database.submissions, [SubmissionsColumns.TAGS.name,
+                                                             SubmissionsColumns.AUTHOR.name]),
+                               (self.database.users, [UsersColumns.USERNAME.name])):
+            cursor: SQLCursor = self.database.execute(f"select {', '.join(columns)} from {table.name}",
+                                                      table=table.name)
+            while rows := cursor.fetchmany(self.chunk_size):
+                t, u = self._counts(table.name, (dict(zip(columns, row)) for row in rows))
+                tags.update(t)
+                usernames.update(u)
+        self.tags_index.load(tags)
+        self.usernames_index.load(usernames)
+        self.loaded = True
+
+    def clear(self):
+        self.tags_index.load({})
+        self.usernames_index.load({})
+        self.loaded = False
+
+    def _check(self):
+        # Commits from other connections change data_version, writes from this connection are applied by changed
+        if not self.loaded or self.database.pragma("data_version") != self._version:
+            self.load()
+
+    def changed(self, table: str, old: list[dict[str, Value]], new: list[dict[str, Value]]):
+        if not self.loaded:
+            return
+        old_tags, old_usernames = self._counts(table, old)
+        new_tags, new_usernames = self._counts(table, new)
+        new_tags.subtract(old_tags)
+        new_usernames.subtract(old_usernames)
+        self.tags_index.update(new_tags)
+        self.usernames_index.update(new_usernames)
+
+    def tags(self, prefix: str, limit: int = 10) -> list[tuple[str, int]]:
+        self._check()
+        return self.tags_index.complete(prefix.lower(), limit)
+
+    def usernames(self, prefix: str, limit: int = 10) -> list[tuple[str, int]]:
+        self._check()
+        return self.usernames_index.complete(clean_username(prefix), limit)
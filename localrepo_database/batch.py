@@ -0,0 +1,148 @@
+from contextlib import contextmanager
+from pathlib import Path
+from re import compile as re_compile
+from re import IGNORECASE
+from re import Pattern
+from time import perf_counter
+from typing import Generator
+from typing import TYPE_CHECKING
+
+from .tracing import QueryEvent
+
+if TYPE_CHECKING:
+    from .database import Database
+
+__all__ = [
+    "Batch",
+]
+
+_write_statement: Pattern = re_compile(r"^\s*(insert|update|delete|replace)\b", IGNORECASE)
+
+
+class Batch:
+    def __init__(self, database: 'Database', max_ops: int = 1000, max_seconds: float = 5):
+        self.database: Database = database
+        self.max_ops: int = max_ops
+        self.max_seconds: float = max_seconds
+        self.ops: int = 0
+        self.commits: int = 0
+        self.rollbacks: int = 0
+        self.rows: int = 0
+        self.rows_per_commit: list[int] = []
+        self._start: float = 0
+        self._committing: bool = False
+        self._savepoints: list[list[tuple[Path, Path | None]]] = []
+        self._released: list[tuple[Path, Path | None]] = []
+        self._backups: int = 0
+        self._discarded: int = 0
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(commits={self.commits}, rows={self.rows}, pending={self.pending_rows})"
+
+    def __enter__(self):
+        if self.database.active_batch is not None:
+            raise RuntimeError("a batch is already active for this database")
+        self.database.commit()
+        self.database.active_batch = self
+        self.database.hooks.append(self._hook)
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, _exc_val, _exc_tb):
+        self.database.hooks.remove(self._hook)
+        self.database.active_batch = None
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+    @property
+    def pending_rows(self) -> int:
+        # total_changes also counts the changes undone by rolled back savepoints
+        return self.database.total_changes - self.database.committed_changes - self._discarded
+
+    @property
+    def depth(self) -> int:
+        return len(self._savepoints)
+
+    def _hook(self, event: QueryEvent):
+        if not self._committing and _write_statement.match(event.sql):
+            self.ops += 1
+            self.check()
+
+    def check(self) -> bool:
+        # Committing releases every open savepoint, so thresholds are only applied between outermost savepoints
+        if self._savepoints or (self.ops < self.max_ops and perf_counter() - self._start < self.max_seconds):
+            return False
+        self.commit()
+        return True
+
+    def commit(self):
+        rows: int = self.pending_rows
+        self._committing = True
+        try:
+            self.database.commit()
+        finally:
+            self._committing = False
+        for _, backup in self._released:
+            if backup:
+                backup.unlink(missing_ok=True)
+        self._released = []
+        if self.ops or rows:
+            self.commits += 1
+            self.rows += rows
+            self.rows_per_commit.append(rows)
+        self.ops = 0
+        self._discarded = 0
+        self._start = perf_counter()
+
+    def rollback(self):
+        self.database.connection.rollback()
+        self.database.clear_caches()
+        self._restore(self._released)
+        self._released = []
+        self._discarded = self.database.total_changes - self.database.committed_changes
+        self.ops = 0
+        self._start = perf_counter()
+
+    @contextmanager
+    def savepoint(self) -> Generator['Batch', None, None]:
+        name: str = f"BATCH_{len(self._savepoints)}"
+        changes: int = self.database.total_changes
+        # A savepoint outside a transaction starts its own and releasing it would commit, so the batch opens one first
+        if not self.database.connection.in_transaction:
+            self.database.execute("begin")
+        self.database.execute(f"savepoint {name}")
+        self._savepoints.append([])
+        try:
+            yield self
+        except BaseException:
+            self.database.execute(f"rollback to {name}")
+            self.database.execute(f"release {name}")
+            self._discarded += self.database.total_changes - changes
+            self.database.clear_caches()
+            self._restore(self._savepoints.pop())
+            self.rollbacks += 1
+            raise
+        else:
+            self.database.execute(f"release {name}")
+            # Released changes stay in the batch transaction, so their backups are kept until it is committed
+            files: list[tuple[Path, Path | None]] = self._savepoints.pop()
+            (self._savepoints[-1] if self._savepoints else self._released).extend(files)
+            self.check()
+
+    @staticmethod
+    def _restore(files: list[tuple[Path, Path | None]]):
+        for path, backup in reversed(files):
+            path.unlink(missing_ok=True)
+            if backup:
+                backup.replace(path)
+
+    def journal_file(self, path: Path):
+        if not self._savepoints:
+            return
+        backup: Path | None = None
+        if path.is_file():
+            self._backups += 1
+            path.replace(backup := path.with_name(f".{path.name}.{self._backups}.savepoint"))
+        self._savepoints[-1].append((path, backup))
@@ -1,3 +1,4 @@
+from copy import copy
 from datetime import datetime
 from json import dumps
 from json import loads
@@ -11,6 +12,8 @@ from typing import TypeVar
 from typing import Union
 from typing import get_args
 from typing import get_origin
+from zlib import compressobj
+from zlib import decompressobj
 
 from .types import Value
 
@@ -66,6 +69,9 @@ def sql_to_type(t: str | Type[Any]) -> Type[T]:
         return datetime
     elif t == "text":
         return str
+    elif t == "blob":
+        # Blob columns hold values of any type, like the dictionary encoded columns that mix codes and text
+        return Any
     else:
         raise TypeError(f"unknown SQLite type {t!r}")
 
@@ -100,7 +106,7 @@ def default_parser(t: Type[T]) -> Callable[[Value], T]:
     elif t_ in (int, float, str, bool):
         return lambda v: t_(v) if v is not None else None
     elif t_ is datetime:
-        return lambda v: datetime.strptime(v, date_format) if v is not None else None
+        return lambda v: datetime.fromisoformat(v) if v is not None else None
     elif t_ in (list, tuple, set):
         return (lambda v: t_(map(sub_type, parse_list_filter_empty(v))) if v is not None else None) if sub_type else (
             lambda v: t_(parse_list_filter_empty(v)) if v is not None else None)
@@ -110,6 +116,119 @@ def default_parser(t: Type[T]) -> Callable[[Value], T]:
         raise TypeError(t, "not allowed")
 
 
+class Codec:
+    name: str = ""
+    # Whether equality selectors can compare encoded values directly instead of decoding stored values in SQL
+    encoded_equality: bool = False
+
+    def encode(self, value: Value) -> Value:
+        return value
+
+    def decode(self, value: Value) -> Value:
+        return value
+
+    def encode_query(self, value: Value) -> Value:
+        return value
+
+    def sql(self, name: str) -> str:
+        return name
+
+    def check(self, check: str) -> str:
+        return check
+
+    def column_type(self, sql_type: str) -> str:
+        return sql_type
+
+
+class ZlibCodec(Codec):
+    name: str = "zlib"
+
+    def __init__(self, dictionaries: dict[int, bytes] = None, dictionary_id: int = 0, *, level: int = 6,
+                 min_size: int = 64):
+        assert 0 <= dictionary_id <= 255, "dictionary id must be between 0 and 255"
+        self.dictionaries: dict[int, bytes] = dictionaries or {}
+        self.dictionary_id: int = dictionary_id
+        self.level: int = level
+        self.min_size: int = min_size
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(dictionaries={sorted(self.dictionaries)}, " \
+               f"dictionary_id={self.dictionary_id}, level={self.level})"
+
+    def encode(self, value: Value) -> Value:
+        if not isinstance(value, str) or len(value) < self.min_size:
+            return value
+        data: bytes = value.encode()
+        compressor = compressobj(self.level, zdict=zdict) if (zdict := self.dictionaries.get(self.dictionary_id)) \
+            else compressobj(self.level)
+        compressed: bytes = bytes([self.dictionary_id if zdict else 0]) + compressor.compress(data) + compressor.flush()
+        return compressed if len(compressed) < len(data) else value
+
+    def decode(self, value: Value) -> Value:
+        if not isinstance(value, bytes):
+            return value
+        decompressor = decompressobj(zdict=self.dictionaries[value[0]]) if value[0] else decompressobj()
+        return (decompressor.decompress(value[1:]) + decompressor.flush()).decode()
+
+    def sql(self, name: str) -> str:
+        return f"decompress({name})"
+
+
+class DictionaryCodec(Codec):
+    name: str = "dictionary"
+    encoded_equality: bool = True
+
+    def __init__(self, column: str, lookup_sql: str, load: Callable[[], dict[str, int]], add: Callable[[str], int]):
+        self.column: str = column
+        self.lookup_sql: str = lookup_sql
+        self._load: Callable[[], dict[str, int]] = load
+        self._add: Callable[[str], int] = add
+        self.codes: dict[str, int] = {}
+        self.values: dict[int, str] = {}
+        self.reload()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.column!r}, codes={len(self.codes)})"
+
+    def reload(self):
+        self.codes = self._load()
+        self.values = {c: v for v, c in self.codes.items()}
+
+    def encode(self, value: Value) -> Value:
+        if not isinstance(value, str):
+            return value
+        elif (code := self.codes.get(value)) is None:
+            code = self.codes[value] = self._add(value)
+            self.values[code] = value
+        return code
+
+    def decode(self, value: Value) -> Value:
+        if not isinstance(value, int):
+            return value
+        elif (decoded := self.values.get(value)) is None:
+            self.reload()
+            decoded = self.values[value]
+        return decoded
+
+    def encode_query(self, value: Value) -> Value:
+        if not isinstance(value, str):
+            return value
+        elif value not in self.codes:
+            self.reload()
+        # Codes start from 1, so unknown values never match
+        return self.codes.get(value, 0)
+
+    def sql(self, name: str) -> str:
+        return f"coalesce(({self.lookup_sql.format(name=name)}), {name})"
+
+    def check(self, check: str) -> str:
+        return f"typeof({{name}}) = 'integer' or ({check})"
+
+    def column_type(self, sql_type: str) -> str:
+        # Columns without affinity keep integer codes and plain text values as they are stored
+        return "blob"
+
+
 class _Column(Protocol[T]):
     name: str
     type: Type[T]
@@ -119,6 +238,7 @@ class _Column(Protocol[T]):
     _check: str
     to_entry: Callable[[T], Value]
     from_entry: Callable[[Value], T]
+    query_entry: Callable[[T], Value]
     default: Union[T, None, Type[NoDefault]]
 
 
@@ -135,11 +255,24 @@ class Column(_Column):
         self._check: str = check
         self.to_entry: Callable[[T], Value] = to_entry if to_entry is not None else default_formatter(self.type)
         self.from_entry: Callable[[Value], T] = from_entry if from_entry is not None else default_parser(self.type)
+        self.query_entry: Callable[[T], Value] = self.to_entry
         self.default: Union[T, None, Type[NoDefault]] = default
+        self.codec: Codec | None = None
 
     def __repr__(self):
         return f"{self.__class__.__name__}({self.name!r}, {self.type})"
 
+    def with_codec(self, codec: Codec) -> 'Column':
+        column: Column = copy(self)
+        column.codec = codec
+        column.to_entry = lambda v: codec.encode(self.to_entry(v))
+        column.from_entry = lambda v: self.from_entry(codec.decode(v))
+        # Query values are left unencoded, selectors compare them with encode_query or the decoded SQL expression
+        column.query_entry = self.query_entry
+        column.sql_type = codec.column_type(self.sql_type)
+        column._check = codec.check(self._check) if self._check else self._check
+        return column
+
     @property
     def check(self) -> str:
         return self._check.format(name=self.name) if self._check else ""
@@ -1,6 +1,20 @@
+from base64 import b64decode
+from base64 import b64encode
+from collections import Counter
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
+from datetime import timedelta
+from functools import partial
+from hashlib import sha256
+from itertools import groupby
+from json import dumps
+from json import loads
+from os import link
 from os import PathLike
 from pathlib import Path
+from re import IGNORECASE
+from re import fullmatch
 from re import search
 from shutil import copy
 from shutil import copy2
@@ -10,44 +24,90 @@ from sqlite3 import Cursor as SQLCursor
 from sqlite3 import DatabaseError
 from sqlite3 import ProgrammingError
 from sqlite3 import connect
+from time import perf_counter
 from typing import Any
+from typing import Callable
 from typing import Generator
+from typing import Hashable
 from typing import Iterable
 from typing import Type
+from typing import TYPE_CHECKING
 from typing import TypeVar
 from typing import overload
 
-from psutil import Process
-
 from .__version__ import __version__
+from .autocomplete import Autocomplete
+from .batch import Batch
+from .column import Codec
 from .column import Column
+from .column import DictionaryCodec
 from .column import NoDefault
+from .column import parse_list_filter_empty
+from .column import ZlibCodec
 from .exceptions import VersionError
+from .files import SubmissionFile
+from .functions import register_functions
 from .selector import AND
 from .selector import EQ
+from .selector import GE
+from .selector import IN
+from .selector import LIKE
+from .selector import LT
+from .selector import NE
+from .selector import NOT
 from .selector import OR
 from .selector import Selector
+from .selector import date_epoch_sql
+from .selector import date_month_sql
 from .selector import selector_to_sql
+from .similarity import MinHash
+from .similarity import features
+from .tables import AllUsernamesColumns
+from .tables import ChangesColumns
+from .tables import CodesColumns
 from .tables import CommentsColumns
+from .tables import CurrentUsernamesColumns
+from .tables import FilesColumns
 from .tables import HistoryColumns
 from .tables import JournalsColumns
 from .tables import SettingsColumns
+from .tables import SimilarityBucketsColumns
+from .tables import SimilarityColumns
 from .tables import SubmissionsColumns
+from .tables import SyncColumns
+from .tables import UserStatsColumns
 from .tables import UsersColumns
+from .tables import all_usernames_table
+from .tables import changes_table
+from .tables import codes_table
 from .tables import comments_table
+from .tables import current_usernames_table
+from .tables import files_table
 from .tables import history_table
 from .tables import journals_table
 from .tables import settings_table
+from .tables import similarity_buckets_table
+from .tables import similarity_table
 from .tables import submissions_table
+from .tables import sync_table
+from .tables import user_stats_table
 from .tables import users_table
+from .tracing import QueryHook
+from .tracing import trace_execute
+from .tracing import trace_executemany
 from .types import Value
 from .update import update_database
 from .util import clean_username
 from .util import compare_version
 from .util import find_connections
 from .util import guess_extension
+from .util import hashed_path
 from .util import query_to_sql
 from .util import tiered_path
+from .util import train_dictionary
+
+if TYPE_CHECKING:
+    from psutil import Process
 
 T = TypeVar("T")
 
@@ -79,6 +139,8 @@ def copy_cursors(db_dest: 'Database', cursors: Iterable['Cursor'], replace: bool
 
     for cursor in cursors:
         cursor_db: Database = cursor.table.database
+        # Saving into a shared files folder rewrites the files being read, so they cannot stay mapped
+        shared_files: bool = cursor_db.submissions.files_folder.resolve() == db_dest.submissions.files_folder.resolve()
         dest_table: Table
         if cursor.table.name.lower() == db_dest.users.name.lower():
             dest_table = db_dest.users
@@ -97,11 +159,24 @@ def copy_cursors(db_dest: 'Database', cursors: Iterable['Cursor'], replace: bool
         for entry in cursor:
             if entry[cursor.table.key.name] in dest_table and not replace:
                 continue
-            elif dest_table.name.lower() == db_dest.submissions.name.lower():
+            elif dest_table.name.lower() == db_dest.submissions.name.lower() and shared_files:
                 fs, t = cursor_db.submissions.get_submission_files(entry[cursor.table.key.name])
                 db_dest.submissions.save_submission(entry, [f.read_bytes() for f in fs or []],
                                                     t.read_bytes() if t else None,
                                                     replace=replace, exist_ok=exist_ok)
+            elif dest_table.name.lower() == db_dest.submissions.name.lower():
+                fs, t = cursor_db.submissions.open_submission_files(entry[cursor.table.key.name])
+                buffers: list = [f.mmap() for f in fs or []]
+                thumbnail = t.mmap() if t else None
+                try:
+                    db_dest.submissions.save_submission(entry, buffers, thumbnail, replace=replace,
+                                                        exist_ok=exist_ok)
+                finally:
+                    for buffer in filter(None, [*buffers, thumbnail]):
+                        if isinstance(buffer, memoryview):
+                            buffer.release()
+                        else:
+                            buffer.close()
             else:
                 dest_table.insert(dest_table.format_entry(entry), replace=replace, exists_ok=True)
 
@@ -132,11 +207,25 @@ class Cursor:
     def fetchone(self):
         return next(self.entries, None)
 
+    def fetchmany(self, size: int = None) -> list[dict[str, Value]]:
+        return [{c.name: c.from_entry(v) for c, v in zip(self.columns, row, strict=True)}
+                for row in self.cursor.fetchmany(self.cursor.arraysize if size is None else size)]
+
     def fetchall(self):
         return list(self.entries)
 
+    def chunks(self, size: int = 1000, *, raw: bool = False
+               ) -> Generator[list[dict[str, Value]] | list[tuple], None, None]:
+        while rows := self.cursor.fetchmany(size):
+            yield rows if raw else [{c.name: c.from_entry(v) for c, v in zip(self.columns, row, strict=True)}
+                                    for row in rows]
+
 
 class Table:
+    keys_chunk_size: int = 10000
+    date_column: str | None = None
+    tracked_columns: list[str] = []
+
     def __init__(self, database: "Database", name: str, columns: Iterable[Column] = None):
         self.database: Database = database
         self.name: str = name
@@ -160,9 +249,9 @@ class Table:
                     ) -> dict[str, Value] | list[dict[str, Value]] | None:
         if isinstance(key, dict):
             return self.select(
-                {AND: [{EQ: {k: v}} for k, v in self.format_entry(key, defaults=False).items()]}).fetchall()
+                {AND: [{EQ: {k: v}} for k, v in self.format_query(key).items()]}).fetchall()
         elif isinstance(key, (tuple, list)):
-            return self.select({OR: [{EQ: {self.key.name: self.key.to_entry(k)}} for k in key]}).fetchall()
+            return self._select_keys(key)
         else:
             return self.select({EQ: {self.key.name: self.key.to_entry(key)}}).fetchone()
 
@@ -171,15 +260,23 @@ class Table:
 
     def __delitem__(self, key: Value | dict[str, Value] | tuple[Value] | list[Value]) -> SQLCursor:
         if isinstance(key, dict):
-            return self.delete({EQ: self.format_entry(key, defaults=False)})
+            return self.delete({EQ: self.format_query(key)})
         elif isinstance(key, (tuple, list)):
-            return self.delete({OR: [{EQ: {self.key.name: self.key.to_entry(k)}} for k in key]})
+            return self.delete({IN: {self.key.name: list(dict.fromkeys(self.key.to_entry(k) for k in key))}})
         else:
             return self.delete({EQ: {self.key.name: self.key.to_entry(key)}})
 
     def __iter__(self) -> Generator[dict[str, Value], None, None]:
         return self.select().entries
 
+    def _select_keys(self, keys: Iterable[Value]) -> list[dict[str, Value]]:
+        keys_: list[Value] = list(dict.fromkeys(self.key.to_entry(k) for k in keys))
+        entries: dict[Value, list[dict[str, Value]]] = {}
+        for i in range(0, len(keys_), self.keys_chunk_size):
+            for entry in self.select({IN: {self.key.name: keys_[i:i + self.keys_chunk_size]}}):
+                entries.setdefault(self.key.to_entry(entry[self.key.name]), []).append(entry)
+        return [entry for k in keys_ for entry in entries.get(k, [])]
+
     def _get_exists(self, key: Value) -> dict:
         if not (entry := self[key]):
             raise KeyError(f"Entry {self.key.name} = {key!r} does not exist in {self.name} table.")
@@ -187,7 +284,8 @@ class Table:
 
     def _get_columns(self) -> list[Column]:
         return [Column(name, t, not_null=bool(not_null), key=pk)
-                for _, name, t, not_null, _, pk in self.database.execute(f"pragma table_info({self.name})")]
+                for _, name, t, not_null, _, pk in
+                self.database.execute(f"pragma table_info({self.name})", table=self.name)]
 
     @property
     def columns(self) -> list[Column]:
@@ -222,7 +320,70 @@ class Table:
         return " ".join(elements)
 
     def create(self, exists_ignore: bool = True):
-        self.database.execute(self.create_statement(exists_ignore=exists_ignore))
+        self.database.execute(self.create_statement(exists_ignore=exists_ignore), table=self.name)
+        if self.date_column:
+            self.create_date_indexes(exists_ignore=exists_ignore)
+
+    def create_date_indexes(self, column: str = None, *, exists_ignore: bool = True):
+        column = column or self.date_column
+        for suffix, expression in (("EPOCH", date_epoch_sql(column)), ("MONTH", date_month_sql(column))):
+            self.database.execute(f"create index {'if not exists ' * exists_ignore}{self.name}_{column}_{suffix}"
+                                  f" on {self.name} ({expression})", table=self.name)
+
+    def _aggregate_term(self, term: str, metric: bool) -> str:
+        if metric and term.strip().lower() in ("count", "count(*)"):
+            return "count(*)"
+        elif not (m := fullmatch(r"\s*(?:(\w+)\s*\(\s*(distinct\s+)?)?(\w+)(\s*\))?\s*", term, IGNORECASE)) or \
+                bool(m[1]) != bool(m[4]) or (column := self.get_column(m[3])) is None:
+            raise ValueError(f"invalid aggregate {'metric' if metric else 'group'} {term!r} for {self.name} table")
+        function: str = (m[1] or "").lower()
+        expression: str = column.codec.sql(column.name) if column.codec else column.name
+        if metric and function in ("count", "sum", "total", "avg", "min", "max"):
+            return f"{function}({'distinct ' * bool(m[2])}{expression})"
+        elif not metric and not m[2] and function in ("", "month", "year"):
+            return {"": expression, "month": date_month_sql(expression),
+                    "year": f"substr({expression}, 1, 4)"}[function]
+        raise ValueError(f"invalid aggregate {'metric' if metric else 'group'} {term!r} for {self.name} table")
+
+    def aggregate(self, group_by: str | list[str] = None, metrics: dict[str, str] = None, where: Selector = None,
+                  order: list[str] = None, limit: int = 0, *, cache: bool = True) -> list[dict[str, Value]]:
+        group_by = [group_by] if isinstance(group_by, str) else list(group_by or [])
+        metrics = metrics or {"count": "count(*)"}
+        names: list[str] = [*group_by, *metrics.keys()]
+        terms: list[str] = [*(self._aggregate_term(g, False) for g in group_by),
+                            *(self._aggregate_term(m, True) for m in metrics.values())]
+        order_terms: list[str] = []
+        for term in order or []:
+            name, direction = fullmatch(r"\s*(.+?)(?:\s+(asc|desc))?\s*", term, IGNORECASE).groups("asc")
+            if name not in names:
+                raise ValueError(f"cannot order by {name!r}, must be one of {', '.join(names)}")
+            order_terms.append(f"{names.index(name) + 1} {direction}")
+        where_sql, values = selector_to_sql(self._encode_selector(where)) if where else ("", [])
+        sql: str = f"select {', '.join(terms)} from {self.name}" + \
+                   (f" where {where_sql}" if where_sql else "") + \
+                   (f" group by {', '.join(map(str, range(1, len(group_by) + 1)))}" if group_by else "") + \
+                   (f" order by {', '.join(order_terms or map(str, range(1, len(group_by) + 1)))}"
+                    if order_terms or group_by else "") + \
+                   (f" limit {int(limit)}" if limit > 0 else "")
+
+        def run() -> list[tuple]:
+            return self.database.execute(sql, values, table=self.name).fetchall()
+
+        rows: list[tuple] = self.database.cached((sql, *map(repr, values)), run) if cache else run()
+        return [dict(zip(names, row)) for row in rows]
+
+    def date_histogram(self, column: str = None, period: str = "month", query: Selector = None) -> dict[str, int]:
+        if period not in ("month", "year"):
+            raise ValueError(f"unknown period {period!r}, must be 'month' or 'year'")
+        month: str = date_month_sql(column or self.date_column)
+        sql, values = selector_to_sql(query) if query else ("", [])
+        histogram: dict[str, int] = {}
+        for key, count in self.database.execute(f"select {month}, count(*) from {self.name}"
+                                                f"{f' where {sql}' if sql else ''} group by 1 order by 1",
+                                                values, table=self.name):
+            key = key[:4] if period == "year" else key
+            histogram[key] = histogram.get(key, 0) + count
+        return histogram
 
     def format_entry(self, entry: dict[str, Any], *, defaults: bool = True) -> dict[str, Value]:
         columns_dict: dict[str, Any] = {}
@@ -232,22 +393,101 @@ class Table:
         entry = {(c := self.get_column(k)).name: c.to_entry(v) for k, v in entry.items()}
         return entry
 
-    def insert(self, entry: dict[str, Value], *, replace: bool = False, exists_ok: bool = False):
-        self.database.execute(
+    def format_query(self, entry: dict[str, Any]) -> dict[str, Value]:
+        # Selectors encode values themselves, lookups must not add new codes to the database
+        return {(c := self.get_column(k)).name: c.query_entry(v) for k, v in entry.items()}
+
+    @property
+    def tracking(self) -> bool:
+        return bool(self.tracked_columns) and \
+            (self.database.user_stats.exists or self.database.autocomplete is not None or
+             self.database.similarity.exists)
+
+    def _tracked_rows(self, sql: str, values: list[Value]) -> list[dict[str, Value]]:
+        columns: list[str] = [self.key.name, *self.tracked_columns]
+        return [dict(zip(columns, row)) for row in
+                self.database.execute(f"select {', '.join(columns)} from {self.name} where {sql}", values,
+                                      table=self.name)]
+
+    def _tracked_keys(self, keys: list[Value]) -> list[dict[str, Value]]:
+        return self._tracked_rows(f"{self.key.name} in (select value from json_each(?))", [dumps(keys)])
+
+    def _track_insert(self, old: list[dict[str, Value]], entries: list[dict[str, Value]], replace: bool):
+        # Without replace, existing entries are either left untouched or the insert fails
+        if not replace:
+            old_keys: set[Value] = {o[self.key.name] for o in old}
+            old, entries = [], [e for e in entries if e[self.key.name] not in old_keys]
+        self.database.entries_changed(self.name, old, [{c: e.get(c) for c in [self.key.name, *self.tracked_columns]}
+                                                       for e in entries])
+
+    def insert(self, entry: dict[str, Value], *, replace: bool = False, exists_ok: bool = False) -> SQLCursor:
+        old: list[dict[str, Value]] | None = \
+            self._tracked_keys([entry[self.key.name]]) if self.tracking and self.key.name in entry else None
+        cursor: SQLCursor = self.database.execute(
             f"""INSERT {'OR REPLACE' if replace else 'OR IGNORE' if exists_ok else ''} INTO {self.name}
                     ({','.join(entry.keys())}) VALUES ({','.join(['?'] * len(entry))})""",
-            [v for v in entry.values()]
+            [v for v in entry.values()],
+            table=self.name
         )
+        if old is not None:
+            self._track_insert(old, [entry], replace)
+        return cursor
+
+    def insert_many(self, entries: Iterable[dict[str, Value]], *, replace: bool = False, exists_ok: bool = False
+                    ) -> int:
+        inserted: int = 0
+        tracking: bool = self.tracking
+        for names, group in groupby(entries, key=lambda e: tuple(e.keys())):
+            group = list(group)
+            old: list[dict[str, Value]] | None = \
+                self._tracked_keys([e[self.key.name] for e in group]) if tracking and self.key.name in names else None
+            inserted += max(0, self.database.executemany(
+                f"""INSERT {'OR REPLACE' if replace else 'OR IGNORE' if exists_ok else ''} INTO {self.name}
+                    ({','.join(names)}) VALUES ({','.join(['?'] * len(names))})""",
+                ([e[k] for k in names] for e in group),
+                table=self.name
+            ).rowcount)
+            if old is not None:
+                self._track_insert(old, group, replace)
+        return inserted
+
+    def _encode_selector(self, query: Selector) -> Selector:
+        if not query or not (codec_columns := {c.name.lower(): c for c in self.columns if c.codec}):
+            return query
+        encoded: Selector = {}
+        for op, value in query.items():
+            if op in (AND, OR):
+                encoded[op] = [self._encode_selector(q) for q in value]
+            elif op == NOT:
+                encoded[op] = self._encode_selector(value)
+            elif (column := codec_columns.get((k := [*value.keys()][0]).lower())) is None:
+                encoded[op] = value
+            elif op in (EQ, NE, IN) and column.codec.encoded_equality:
+                encoded[op] = {k: [column.codec.encode_query(v) for v in value[k]]
+                               if isinstance(value[k], (list, tuple, set)) else column.codec.encode_query(value[k])}
+            else:
+                encoded[op] = {column.codec.sql(column.name): value[k]}
+        return encoded
+
+    def _order_term(self, term: str) -> str:
+        # Encoded columns sort by their codes or compressed bytes, so they are ordered by their decoded values instead
+        if (m := fullmatch(r"\s*(\w+)(\s+(?:asc|desc))?\s*", term, IGNORECASE)) and \
+                (column := self.get_column(m[1])) is not None and column.codec:
+            return column.codec.sql(column.name) + (m[2] or "")
+        return term
 
     def select(self, query: Selector = None, columns: list[str | Column] = None, order: list[str] = None,
                limit: int = 0,
                offset: int = 0) -> Cursor:
-        sql, values = selector_to_sql(query) if query else ("", None)
+        sql, values = selector_to_sql(self._encode_selector(query)) if query else ("", None)
         return self.select_sql(sql, values, columns, order, limit, offset)
 
     def select_query(self, query: str, columns: list[str | Column] = None, default_field: str = None,
                      likes: list[str] = None, aliases: dict[str, str] = None, order: list[str] = None, limit: int = 0,
                      offset: int = 0) -> Cursor:
+        if codec_columns := {c.name.lower(): c.codec.sql(c.name) for c in self.columns if c.codec}:
+            aliases = {k: codec_columns.get(v.lower(), v) for k, v in (aliases or {}).items()}
+            aliases |= {n: sql for n, sql in codec_columns.items() if n not in aliases}
         elements, values = query_to_sql(query, default_field or self.key.name, likes, aliases)
         return self.select_sql(" ".join(elements), values, columns, order, limit, offset)
 
@@ -255,22 +495,34 @@ class Table:
                    order: list[str] = None, limit: int = 0, offset: int = 0) -> Cursor:
         columns_: list[Column] = [(self.get_column(c) or Column(c, Any)) if isinstance(c, str) else c
                                   for c in columns] if columns else self.columns
+        order = [self._order_term(term) for term in order or []]
         sql = " ".join(list(filter(bool, [f"SELECT {','.join(c.name for c in columns_)} FROM {self.name}",
                                           f"WHERE {sql}" if sql else None,
                                           f"ORDER BY {','.join(order)}" if order else None,
                                           f"LIMIT {limit}" if limit > 0 else None,
                                           f"OFFSET {offset}" if limit > 0 and offset > 0 else None])))
-        return Cursor(self.database.execute(sql, values), columns_, self, query=sql, query_values=values)
+        return Cursor(self.database.execute(sql, values, table=self.name), columns_, self,
+                      query=sql, query_values=values)
 
     def update(self, query: Selector, new_entry: dict[str, Value]) -> SQLCursor:
-        sql, values = selector_to_sql(query) if query else ("", [])
+        sql, values = selector_to_sql(self._encode_selector(query)) if query else ("", [])
         update_columns: list[str] = [f"{col} = ?" for col in new_entry]
-        return self.database.execute(f"UPDATE {self.name} SET {','.join(update_columns)} WHERE {sql}",
-                                     [*new_entry.values(), *values])
+        old: list[dict[str, Value]] | None = None
+        if self.tracking and any(c.upper() in self.tracked_columns for c in new_entry):
+            old = self._tracked_rows(sql, values)
+        cursor: SQLCursor = self.database.execute(f"UPDATE {self.name} SET {','.join(update_columns)} WHERE {sql}",
+                                                  [*new_entry.values(), *values], table=self.name)
+        if old:
+            self.database.entries_changed(self.name, old, self._tracked_keys([o[self.key.name] for o in old]))
+        return cursor
 
     def delete(self, query: Selector) -> SQLCursor:
-        sql, values = selector_to_sql(query) if query else ("", [])
-        return self.database.execute(f"DELETE FROM {self.name} WHERE {sql}", values)
+        sql, values = selector_to_sql(self._encode_selector(query)) if query else ("", [])
+        old: list[dict[str, Value]] = self._tracked_rows(sql, values) if self.tracking else []
+        cursor: SQLCursor = self.database.execute(f"DELETE FROM {self.name} WHERE {sql}", values, table=self.name)
+        if old:
+            self.database.entries_changed(self.name, old, [])
+        return cursor
 
     def add_to_list(self, key: Value, column: str | Column, new_values: Iterable[Value]):
         entry: dict = self._get_exists(key)
@@ -291,8 +543,12 @@ class Table:
 
 
 class UsersTable(Table):
+    tracked_columns: list[str] = [UsersColumns.USERNAME.name]
+
     def save_user(self, user: dict[str, Any], *, replace: bool = False, exist_ok: bool = False):
-        self.insert(self.format_entry(user), replace=replace, exists_ok=exist_ok)
+        self.insert(user := self.format_entry(user), replace=replace, exists_ok=exist_ok)
+        if self.database.all_usernames.exists:
+            self.database.all_usernames.add(user[UsersColumns.USERNAME.name])
 
     def set_active(self, user: str, active: bool) -> bool:
         if (entry := self._get_exists(user := clean_username(user)))[UsersColumns.ACTIVE.name] is active:
@@ -315,7 +571,127 @@ class UsersTable(Table):
         return True
 
 
+class UsernamesTable(Table):
+    cache_size: int = 4096
+
+    def __init__(self, database: "Database", name: str, columns: Iterable[Column] = None):
+        super().__init__(database, name, columns)
+        self._cache: OrderedDict[str, tuple[int | None, str]] = OrderedDict()
+        self._cache_version: int | None = None
+        self._exists: bool | None = None
+
+    @property
+    def current(self) -> Table:
+        return self.database.current_usernames
+
+    @property
+    def exists(self) -> bool:
+        if self._exists is None:
+            self._exists = self.name in self.database
+        return self._exists
+
+    def create(self, exists_ignore: bool = True):
+        self.current.create(exists_ignore=exists_ignore)
+        super().create(exists_ignore=exists_ignore)
+        self.database.execute(f"create index {'if not exists ' * exists_ignore}{self.name}_"
+                              f"{AllUsernamesColumns.USER_ID.name} on {self.name} ({AllUsernamesColumns.USER_ID.name})",
+                              table=self.name)
+        self._exists = True
+        self.clear_cache()
+
+    def clear_cache(self):
+        self._cache.clear()
+        self._cache_version = None
+
+    def backfill(self) -> int:
+        user_id, username = CurrentUsernamesColumns.USER_ID.name, CurrentUsernamesColumns.USERNAME.name
+        added: int = self.database.execute(
+            f"insert into {self.current.name} ({user_id}, {username})"
+            f" select (select coalesce(max({user_id}), 0) from {self.current.name})"
+            f" + row_number() over (order by {UsersColumns.USERNAME.name}), {UsersColumns.USERNAME.name}"
+            f" from {self.database.users.name} where {UsersColumns.USERNAME.name} not in"
+            f" (select {AllUsernamesColumns.USERNAME.name} from {self.name})", table=self.current.name).rowcount
+        self.database.execute(
+            f"insert into {self.name} ({AllUsernamesColumns.USERNAME.name}, {AllUsernamesColumns.USER_ID.name})"
+            f" select {username}, {user_id} from {self.current.name}"
+            f" where {username} not in (select {AllUsernamesColumns.USERNAME.name} from {self.name})", table=self.name)
+        self.clear_cache()
+        return added
+
+    def _lookup(self, names: Iterable[str]) -> dict[str, tuple[int | None, str]]:
+        # Committed writes from other connections change data_version, writes from this table clear the cache directly
+        if (version := self.database.pragma("data_version")) != self._cache_version:
+            self._cache.clear()
+            self._cache_version = version
+        found: dict[str, tuple[int | None, str]] = {}
+        missing: list[str] = []
+        for name in dict.fromkeys(names):
+            if (resolved := self._cache.get(name)) is not None:
+                self._cache.move_to_end(name)
+                found[name] = resolved
+            else:
+                missing.append(name)
+        if missing and self.exists:
+            for name, user_id, current in self.database.execute(
+                    f"select a.{AllUsernamesColumns.USERNAME.name}, a.{AllUsernamesColumns.USER_ID.name},"
+                    f" c.{CurrentUsernamesColumns.USERNAME.name} from {self.name} a"
+                    f" left join {self.current.name} c"
+                    f" on c.{CurrentUsernamesColumns.USER_ID.name} = a.{AllUsernamesColumns.USER_ID.name}"
+                    f" where a.{AllUsernamesColumns.USERNAME.name} in (select value from json_each(?))",
+                    [dumps(missing)], table=self.name):
+                found[name] = (user_id, current or name)
+        for name in missing:
+            self._cache[name] = found.setdefault(name, (None, name))
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return found
+
+    def user_id(self, username: str) -> int | None:
+        return self._lookup([username := clean_username(username)])[username][0]
+
+    def resolve(self, username: str) -> str:
+        return self._lookup([username := clean_username(username)])[username][1]
+
+    def resolve_many(self, usernames: Iterable[str]) -> dict[str, str]:
+        cleaned: dict[str, str] = {u: clean_username(u) for u in usernames}
+        resolved: dict[str, tuple[int | None, str]] = self._lookup(cleaned.values())
+        return {u: resolved[c][1] for u, c in cleaned.items()}
+
+    def aliases(self, username: str) -> list[str]:
+        if (user_id := self.user_id(username)) is None:
+            return [clean_username(username)]
+        return [u for [u] in self.select({EQ: {AllUsernamesColumns.USER_ID.name: user_id}},
+                                         [AllUsernamesColumns.USERNAME], [AllUsernamesColumns.USERNAME.name]).tuples]
+
+    def add(self, username: str) -> int:
+        if (user_id := self.user_id(username := clean_username(username))) is not None:
+            return user_id
+        user_id = self.database.execute(f"select coalesce(max({CurrentUsernamesColumns.USER_ID.name}), 0) + 1"
+                                        f" from {self.current.name}", table=self.current.name).fetchone()[0]
+        self.current.insert({CurrentUsernamesColumns.USER_ID.name: user_id,
+                             CurrentUsernamesColumns.USERNAME.name: username})
+        self.insert({AllUsernamesColumns.USERNAME.name: username, AllUsernamesColumns.USER_ID.name: user_id})
+        self.clear_cache()
+        return user_id
+
+    def rename(self, username: str, new_username: str) -> int:
+        user_id: int = self.add(username)
+        if (new_user_id := self.user_id(new_username := clean_username(new_username))) not in (None, user_id):
+            raise ValueError(f"username {new_username!r} belongs to user {new_user_id}")
+        self.current[user_id] = {CurrentUsernamesColumns.USERNAME.name: new_username}
+        self.insert({AllUsernamesColumns.USERNAME.name: new_username, AllUsernamesColumns.USER_ID.name: user_id},
+                    exists_ok=True)
+        self.clear_cache()
+        return user_id
+
+
 class SubmissionsTable(Table):
+    date_column: str = SubmissionsColumns.DATE.name
+    tracked_columns: list[str] = [SubmissionsColumns.AUTHOR.name, SubmissionsColumns.DATE.name,
+                                  SubmissionsColumns.FILESAVED.name, SubmissionsColumns.FAVORITE.name,
+                                  SubmissionsColumns.MENTIONS.name, SubmissionsColumns.TAGS.name,
+                                  SubmissionsColumns.DESCRIPTION.name]
+
     @property
     def files_folder(self) -> Path:
         return self.database.settings.files_folder
@@ -323,6 +699,9 @@ class SubmissionsTable(Table):
     def save_submission(self, submission: dict[str, Value | list[Value]], files: list[bytes] = None,
                         thumbnail: bytes = None, *, replace: bool = False, exist_ok: bool = False):
         submission = self.format_entry(submission)
+        # Saving the files records them again, the hashes of the replaced files are removed from the store if unused
+        old_hashes: list[str] | None = \
+            self.database.files.remove([submission[SubmissionsColumns.ID.name]]) if self.database.files.exists else None
         file_url: list[str] = \
             SubmissionsColumns.FILEURL.from_entry(submission[SubmissionsColumns.FILEURL.name])
 
@@ -333,6 +712,8 @@ class SubmissionsTable(Table):
             for n, file in enumerate(files) if file
         ])
         self.save_submission_thumbnail(submission[SubmissionsColumns.ID.name], thumbnail or None)
+        if old_hashes is not None:
+            self.database.files.prune_store(old_hashes)
 
         submission[SubmissionsColumns.FILESAVED.name] = (
                 (0b100 * all(map(bool, files)) * bool(files)) +  # all files were valid
@@ -351,17 +732,41 @@ class SubmissionsTable(Table):
         ext: str = guess_extension(file, ext) if guess_ext else ext
         folder: Path = self.files_folder / tiered_path(submission_id)
         folder.mkdir(parents=True, exist_ok=True)
-        folder.joinpath(f"{name}{n if n > 0 else ''}" + f".{ext}" * bool(ext)).write_bytes(file)
+        file_path: Path = folder.joinpath(f"{name}{n if n > 0 else ''}" + f".{ext}" * bool(ext))
+
+        if self.database.active_batch is not None:
+            self.database.active_batch.journal_file(file_path)
+
+        if self.database.settings.files_dedup:
+            self.database.files.save_file(submission_id, file_path, file)
+        else:
+            # The existing file may be a hard link to the store shared with other submissions
+            file_path.unlink(missing_ok=True)
+            file_path.write_bytes(file)
 
         return ext
 
+    def delete(self, query: Selector) -> SQLCursor:
+        if not self.database.files.exists:
+            return super().delete(query)
+        ids: list[int] = [id_ for [id_] in self.select(query, [self.key]).tuples]
+        cursor: SQLCursor = super().delete(query)
+        self.database.files.prune_store(self.database.files.remove(ids))
+        return cursor
+
     def save_submission_thumbnail(self, submission_id: int, file: bytes | None):
         self.save_submission_file(submission_id, file, "thumbnail", "jpg", False)
 
     def get_submission_files(self, submission_id: int) -> tuple[list[Path] | None, Path | None]:
-        if (entry := self[submission_id]) is None or (f := entry[SubmissionsColumns.FILESAVED.name]) == 0:
+        if (entry := self[submission_id]) is None:
             return None, None
-        folder: Path = self.files_folder / tiered_path(submission_id)
+        return self._submission_files(self.files_folder, entry)
+
+    @staticmethod
+    def _submission_files(files_folder: Path, entry: dict[str, Value]) -> tuple[list[Path] | None, Path | None]:
+        if (f := entry[SubmissionsColumns.FILESAVED.name]) == 0:
+            return None, None
+        folder: Path = files_folder / tiered_path(entry[SubmissionsColumns.ID.name])
         file_ext: list[str] = entry[SubmissionsColumns.FILEEXT.name]
         return (
             [folder / f"submission{n or ''}{('.' + ext) if ext else ''}"
@@ -369,6 +774,25 @@ class SubmissionsTable(Table):
             folder / "thumbnail.jpg" if f & 0b01 else None
         )
 
+    def open_submission_files(self, submission_id: int
+                              ) -> tuple[list[SubmissionFile] | None, SubmissionFile | None]:
+        return self.open_submissions_files([submission_id]).get(submission_id, (None, None))
+
+    def open_submissions_files(self, submission_ids: Iterable[int], *, chunk_size: int = 500
+                               ) -> dict[int, tuple[list[SubmissionFile] | None, SubmissionFile | None]]:
+        submission_ids = list(submission_ids)
+        files_folder: Path = self.files_folder
+        files: dict[int, tuple[list[SubmissionFile] | None, SubmissionFile | None]] = {}
+        for i in range(0, len(submission_ids), chunk_size):
+            for entry in self.select({IN: {self.key.name: submission_ids[i:i + chunk_size]}},
+                                     [SubmissionsColumns.ID, SubmissionsColumns.FILEEXT,
+                                      SubmissionsColumns.FILESAVED]):
+                id_: int = entry[SubmissionsColumns.ID.name]
+                fs, t = self._submission_files(files_folder, entry)
+                files[id_] = ([SubmissionFile(id_, f, n=n) for n, f in enumerate(fs)] if fs is not None else None,
+                              SubmissionFile(id_, t, thumbnail=True) if t is not None else None)
+        return files
+
     def set_filesaved(self, submission_id: int, all_files: bool | int, any_file: bool | int, thumbnail: bool | int):
         filesaved: int = (0b100 * bool(all_files)) + (0b010 * bool(any_file)) + (0b001 * bool(thumbnail))
         if self._get_exists(submission_id)[SubmissionsColumns.FILESAVED.name] != filesaved:
@@ -402,6 +826,10 @@ class SubmissionsTable(Table):
 
 
 class JournalsTable(Table):
+    date_column: str = JournalsColumns.DATE.name
+    tracked_columns: list[str] = [JournalsColumns.AUTHOR.name, JournalsColumns.DATE.name,
+                                  JournalsColumns.MENTIONS.name]
+
     def save_journal(self, journal: dict[str, Any], *, replace: bool = False, exist_ok: bool = False):
         self.insert(self.format_entry(journal), replace=replace, exists_ok=exist_ok)
 
@@ -419,6 +847,8 @@ class JournalsTable(Table):
 
 
 class CommentsTable(Table):
+    date_column: str = CommentsColumns.DATE.name
+
     def save_comment(self, comment: dict[str, any], *, replace: bool = False, exist_ok: bool = False):
         self.insert(self.format_entry(comment), replace=replace, exists_ok=exist_ok)
 
@@ -441,11 +871,133 @@ class CommentsTable(Table):
             all_comments)} for com in comments]
 
 
+class FilesTable(Table):
+    store_folder_name: str = ".store"
+
+    def __init__(self, database: "Database", name: str, columns: Iterable[Column] = None):
+        super().__init__(database, name, columns)
+        self._exists: bool | None = None
+
+    @property
+    def store_folder(self) -> Path:
+        return self.database.settings.files_folder / self.store_folder_name
+
+    @property
+    def exists(self) -> bool:
+        if self._exists is None:
+            self._exists = self.name in self.database
+        return self._exists
+
+    def create(self, exists_ignore: bool = True):
+        super().create(exists_ignore=exists_ignore)
+        self.database.execute(f"create index {'if not exists ' * exists_ignore}{self.name}_{FilesColumns.HASH.name}"
+                              f" on {self.name} ({FilesColumns.HASH.name})", table=self.name)
+        self._exists = True
+
+    def remove(self, submission_ids: list[int]) -> list[str]:
+        ids: str = dumps(submission_ids)
+        hashes: list[str] = [h for [h] in self.database.execute(
+            f"select distinct {FilesColumns.HASH.name} from {self.name}"
+            f" where {FilesColumns.SUBMISSION_ID.name} in (select value from json_each(?))", [ids], table=self.name)]
+        self.database.execute(f"delete from {self.name}"
+                              f" where {FilesColumns.SUBMISSION_ID.name} in (select value from json_each(?))", [ids],
+                              table=self.name)
+        return hashes
+
+    def prune_store(self, hashes: Iterable[str] = None) -> int:
+        # Without hashes, every file in the store is checked
+        hashes = list(hashes) if hashes is not None else \
+            [f.name for f in self.store_folder.rglob("*") if f.is_file() and not f.suffix]
+        unused: list[str] = [h for [h] in self.database.execute(
+            f"select value from json_each(?)"
+            f" where value not in (select {FilesColumns.HASH.name} from {self.name})", [dumps(hashes)],
+            table=self.name)]
+        for digest in unused:
+            stored: Path = self.store_path(digest)
+            if (batch := self.database.active_batch) is not None and batch.depth:
+                batch.journal_file(stored)
+            else:
+                stored.unlink(missing_ok=True)
+        return len(unused)
+
+    def store_path(self, digest: str) -> Path:
+        return self.store_folder / hashed_path(digest)
+
+    def save_file(self, submission_id: int, file_path: Path, file: bytes) -> str:
+        digest: str = sha256(file).hexdigest()
+        stored: Path = self.store_path(digest)
+
+        if not stored.is_file():
+            stored.parent.mkdir(parents=True, exist_ok=True)
+            stored.with_suffix(".tmp").write_bytes(file)
+            stored.with_suffix(".tmp").replace(stored)
+
+        file_path.unlink(missing_ok=True)
+        try:
+            link(stored, file_path)
+        except OSError:
+            copy(stored, file_path)
+
+        self.insert(self.format_entry({FilesColumns.SUBMISSION_ID.name: submission_id,
+                                       FilesColumns.NAME.name: file_path.name,
+                                       FilesColumns.HASH.name: digest,
+                                       FilesColumns.SIZE.name: len(file)}), replace=True)
+
+        return digest
+
+    def get_files(self, submission_id: int) -> list[dict[str, Value]]:
+        return self.select({EQ: {FilesColumns.SUBMISSION_ID.name: submission_id}},
+                           order=[FilesColumns.NAME.name]).fetchall()
+
+    def get_hash(self, submission_id: int, name: str) -> str | None:
+        return (self.select({AND: [{EQ: {FilesColumns.SUBMISSION_ID.name: submission_id}},
+                                   {EQ: {FilesColumns.NAME.name: name}}]},
+                            [FilesColumns.HASH]).fetchone() or {}).get(FilesColumns.HASH.name)
+
+    def duplicates(self, min_count: int = 2) -> list[dict[str, Value]]:
+        return list(self.select_sql(
+            f"{FilesColumns.HASH.name} in (select {FilesColumns.HASH.name} from {self.name}"
+            f" group by {FilesColumns.HASH.name} having count(*) >= ?)",
+            [min_count], order=[FilesColumns.HASH.name, FilesColumns.SUBMISSION_ID.name, FilesColumns.NAME.name]))
+
+    def stats(self) -> dict[str, int]:
+        files, unique, size, unique_size = self.database.execute(
+            f"select count(*), count(distinct h), coalesce(sum(s), 0), coalesce(sum(u), 0) from"
+            f" (select {FilesColumns.HASH.name} h, {FilesColumns.SIZE.name} s,"
+            f" iif(row_number() over (partition by {FilesColumns.HASH.name}) = 1, {FilesColumns.SIZE.name}, 0) u"
+            f" from {self.name})", table=self.name).fetchone()
+        return {"files": files, "unique": unique, "size": size, "unique_size": unique_size}
+
+    def verify(self, submission_id: int, *, read: bool = False) -> list[dict[str, Value]]:
+        folder: Path = self.database.settings.files_folder / tiered_path(submission_id)
+        errors: list[dict[str, Value]] = []
+        for entry in self.get_files(submission_id):
+            file: Path = folder / entry[FilesColumns.NAME.name]
+            if not file.is_file() or file.stat().st_size != entry[FilesColumns.SIZE.name] or \
+                    (read and sha256(file.read_bytes()).hexdigest() != entry[FilesColumns.HASH.name]):
+                errors.append(entry)
+        return errors
+
+    def deduplicate(self, submission_id: int) -> int:
+        files, thumbnail = self.database.submissions.get_submission_files(submission_id)
+        saved: int = 0
+        for file in [*(files or []), *([thumbnail] if thumbnail else [])]:
+            if file.is_file():
+                self.save_file(submission_id, file, file.read_bytes())
+                saved += 1
+        return saved
+
+
 class SettingsTable(Table):
     version_setting: str = "VERSION"
     files_folder_setting: str = "FILESFOLDER"
     backup_folder_setting: str = "BACKUPFOLDER"
     bbcode_setting: str = "BBCODE"
+    files_dedup_setting: str = "FILESDEDUP"
+    compression_setting: str = "COMPRESSION"
+    compression_dictionary_setting: str = "COMPRESSIONDICT"
+    dictionary_encoding_setting: str = "DICTENCODING"
+    maintenance_setting: str = "MAINTENANCE"
     _default_files_folder: str = "FA.files"
     _default_backup_folder: str = "FA.backup"
 
@@ -493,6 +1045,64 @@ class SettingsTable(Table):
         else:
             self[self.bbcode_setting] = "true" if value else "false"
 
+    @property
+    def files_dedup(self) -> bool:
+        return self[self.files_dedup_setting] == "true"
+
+    @files_dedup.setter
+    def files_dedup(self, value: bool | None):
+        if value is None:
+            del self[self.files_dedup_setting]
+        else:
+            self[self.files_dedup_setting] = "true" if value else "false"
+        if value:
+            self.database.files.create(exists_ignore=True)
+
+    @property
+    def compression(self) -> str | None:
+        return self[self.compression_setting]
+
+    @compression.setter
+    def compression(self, value: str | None):
+        if value is None:
+            del self[self.compression_setting]
+        else:
+            self[self.compression_setting] = value
+
+    @property
+    def dictionary_encoding(self) -> bool:
+        return self[self.dictionary_encoding_setting] == "true"
+
+    @dictionary_encoding.setter
+    def dictionary_encoding(self, value: bool | None):
+        if not value:
+            del self[self.dictionary_encoding_setting]
+        else:
+            self[self.dictionary_encoding_setting] = "true"
+
+    @property
+    def last_maintenance(self) -> datetime | None:
+        return datetime.fromisoformat(v) if (v := self[self.maintenance_setting]) else None
+
+    @last_maintenance.setter
+    def last_maintenance(self, value: datetime | None):
+        if value is None:
+            del self[self.maintenance_setting]
+        else:
+            self[self.maintenance_setting] = value.isoformat()
+
+    @property
+    def compression_dictionaries(self) -> dict[int, bytes]:
+        return {int(e[self.key.name].removeprefix(self.compression_dictionary_setting)):
+                    b64decode(e[SettingsColumns.SVALUE.name])
+                for e in self.select({LIKE: {self.key.name: f"{self.compression_dictionary_setting}%"}})}
+
+    def add_compression_dictionary(self, dictionary: bytes) -> int:
+        dictionary_id: int = max(self.compression_dictionaries, default=0) + 1
+        assert dictionary_id <= 255, "too many compression dictionaries"
+        self[f"{self.compression_dictionary_setting}{dictionary_id}"] = b64encode(dictionary).decode()
+        return dictionary_id
+
     def create(self, exists_ignore: bool = False):
         super().create(exists_ignore=exists_ignore)
         self.insert({SettingsColumns.SETTING.name: self.files_folder_setting,
@@ -501,40 +1111,475 @@ class SettingsTable(Table):
                      SettingsColumns.SVALUE.name: __version__}, exists_ok=True)
 
 
+class ChangesTable(Table):
+    def tracked_tables(self) -> list[Table]:
+        return [self.database.users, self.database.submissions, self.database.journals, self.database.comments]
+
+    def trigger_names(self, table: Table) -> list[str]:
+        return [f"{self.name}_{table.name}_{op}" for op in ("INSERT", "UPDATE", "DELETE")]
+
+    def trigger_statements(self, table: Table) -> list[str]:
+        new_key: str = f"json_array({', '.join(f'NEW.{k.name}' for k in table.keys)})"
+        old_key: str = f"json_array({', '.join(f'OLD.{k.name}' for k in table.keys)})"
+        columns: str = f"{ChangesColumns.TABLE_NAME.name}, {ChangesColumns.KEY.name}, {ChangesColumns.OP.name}"
+        insert, update, delete = self.trigger_names(table)
+        return [
+            f"create trigger if not exists {insert} after insert on {table.name} begin"
+            f" insert into {self.name} ({columns}) values ('{table.name}', {new_key}, 'insert'); end",
+            f"create trigger if not exists {update} after update on {table.name} begin"
+            f" insert into {self.name} ({columns}) select '{table.name}', {old_key}, 'delete'"
+            f" where {old_key} is not {new_key};"
+            f" insert into {self.name} ({columns}) values ('{table.name}', {new_key}, 'update'); end",
+            f"create trigger if not exists {delete} after delete on {table.name} begin"
+            f" insert into {self.name} ({columns}) values ('{table.name}', {old_key}, 'delete'); end",
+        ]
+
+    @property
+    def enabled(self) -> bool:
+        triggers: list[str] = [n for t in self.tracked_tables() for n in self.trigger_names(t)]
+        return self.database.execute(
+            f"select count(*) from sqlite_master where type = 'trigger'"
+            f" and name in ({','.join(['?'] * len(triggers))})",
+            triggers, table=self.name).fetchone()[0] == len(triggers)
+
+    @property
+    def last_seq(self) -> int:
+        return self.database.execute(f"select coalesce(max({ChangesColumns.SEQ.name}), 0) from {self.name}",
+                                     table=self.name).fetchone()[0]
+
+    def enable(self):
+        self.create(exists_ignore=True)
+        for table in self.tracked_tables():
+            for statement in self.trigger_statements(table):
+                self.database.execute(statement, table=table.name)
+
+    def disable(self):
+        for table in self.tracked_tables():
+            for trigger in self.trigger_names(table):
+                self.database.execute(f"drop trigger if exists {trigger}", table=table.name)
+
+    def changes(self, since: int = 0) -> dict[str, dict[str, list[list[Value]]]]:
+        changes: dict[str, dict[str, list[list[Value]]]] = {}
+        for table, key, op, _ in self.database.execute(
+                f"select {ChangesColumns.TABLE_NAME.name}, {ChangesColumns.KEY.name}, {ChangesColumns.OP.name},"
+                f" max({ChangesColumns.SEQ.name}) from {self.name} where {ChangesColumns.SEQ.name} > ?"
+                f" group by {ChangesColumns.TABLE_NAME.name}, {ChangesColumns.KEY.name}", [since], table=self.name):
+            changes.setdefault(table, {}).setdefault("delete" if op == "delete" else "upsert", []).append(
+                ChangesColumns.KEY.from_entry(key))
+        return changes
+
+    def prune(self, seq: int) -> int:
+        return self.database.execute(
+            f"delete from {self.name} where {ChangesColumns.SEQ.name} <= ?"
+            f" and {ChangesColumns.SEQ.name} < (select max({ChangesColumns.SEQ.name}) from {self.name})",
+            [seq], table=self.name).rowcount
+
+
+class CodesTable(Table):
+    def create(self, exists_ignore: bool = True):
+        super().create(exists_ignore=exists_ignore)
+        self.database.execute(f"create unique index {'if not exists ' * exists_ignore}{self.name}_"
+                              f"{CodesColumns.VALUE.name} on {self.name}"
+                              f" ({CodesColumns.COLUMN_NAME.name}, {CodesColumns.VALUE.name})", table=self.name)
+
+    def lookup_sql(self, column: str) -> str:
+        return f"select {CodesColumns.VALUE.name} from {self.name}" \
+               f" where {CodesColumns.COLUMN_NAME.name} = '{column}' and {CodesColumns.CODE.name} = {{name}}"
+
+    def load(self, column: str) -> dict[str, int]:
+        return {value: code for [code, value] in self.select({EQ: {CodesColumns.COLUMN_NAME.name: column}},
+                                                             [CodesColumns.CODE, CodesColumns.VALUE]).tuples}
+
+    def add(self, column: str, value: str) -> int:
+        self.database.execute(
+            f"insert or ignore into {self.name}"
+            f" ({CodesColumns.COLUMN_NAME.name}, {CodesColumns.CODE.name}, {CodesColumns.VALUE.name})"
+            f" select ?, coalesce(max({CodesColumns.CODE.name}), 0) + 1, ? from {self.name}"
+            f" where {CodesColumns.COLUMN_NAME.name} = ?", [column, value, column], table=self.name)
+        return self.select({AND: [{EQ: {CodesColumns.COLUMN_NAME.name: column}},
+                                  {EQ: {CodesColumns.VALUE.name: value}}]}, [CodesColumns.CODE]).cursor.fetchone()[0]
+
+    def counts(self, table: Table, column: str) -> dict[str, int]:
+        return {value: count for value, count in self.database.execute(
+            f"select coalesce(({self.lookup_sql(column).format(name=column)}), {column}), count(*)"
+            f" from {table.name} group by {column} order by 2 desc", table=table.name)}
+
+
+class UserStatsTable(Table):
+    rebuild_chunk_size: int = 10000
+    source_columns: list[str] = [SubmissionsColumns.AUTHOR.name, SubmissionsColumns.DATE.name,
+                                 SubmissionsColumns.FILESAVED.name, SubmissionsColumns.FAVORITE.name,
+                                 SubmissionsColumns.MENTIONS.name]
+
+    def __init__(self, database: "Database", name: str, columns: Iterable[Column] = None):
+        super().__init__(database, name, columns)
+        self._exists: bool | None = None
+
+    @property
+    def exists(self) -> bool:
+        if self._exists is None:
+            self._exists = self.name in self.database
+        return self._exists
+
+    def create(self, exists_ignore: bool = True):
+        super().create(exists_ignore=exists_ignore)
+        self._exists = True
+
+    def drop(self):
+        self.database.execute(f"drop table if exists {self.name}", table=self.name)
+        self._exists = False
+
+    def user(self, username: str) -> dict[str, Value]:
+        return self[username] or {c.name: c.default for c in self.columns if c.default is not NoDefault} | \
+            {UserStatsColumns.USERNAME.name: clean_username(username)}
+
+    def changed(self, table: str, old: list[dict[str, Value]], new: list[dict[str, Value]]):
+        submissions: bool = table == submissions_table
+        count_column: str = (UserStatsColumns.SUBMISSIONS if submissions else UserStatsColumns.JOURNALS).name
+        last_column: str = (UserStatsColumns.LAST_SUBMISSION if submissions else UserStatsColumns.LAST_JOURNAL).name
+        list_columns: list[tuple[str, str]] = [
+            *([(SubmissionsColumns.FAVORITE.name, UserStatsColumns.FAVORITES.name)] if submissions else []),
+            (SubmissionsColumns.MENTIONS.name, UserStatsColumns.MENTIONS.name),
+        ]
+        deltas: dict[str, Counter[str]] = {}
+        removed: dict[str, str] = {}
+        added: dict[str, str] = {}
+
+        for rows, sign, dates in ((old, -1, removed), (new, 1, added)):
+            for row in rows:
+                if author := clean_username(row.get(SubmissionsColumns.AUTHOR.name) or ""):
+                    counter: Counter[str] = deltas.setdefault(author, Counter())
+                    counter[count_column] += sign
+                    if submissions and (row.get(SubmissionsColumns.FILESAVED.name) or 0) & 0b100:
+                        counter[UserStatsColumns.SAVED.name] += sign
+                    if date := row.get(SubmissionsColumns.DATE.name):
+                        dates[author] = max(dates.get(author, ""), str(date))
+                for column, stat in list_columns:
+                    for user in parse_list_filter_empty(row.get(column) or ""):
+                        deltas.setdefault(clean_username(user), Counter())[stat] += sign
+
+        stats: list[str] = [c.name for c in self.columns if c.type is int]
+        updates: list[list[Value]] = [
+            [user, *(counter[s] for s in stats), added.get(user)]
+            for user, counter in deltas.items()
+            if any(counter.values()) or user in added
+        ]
+        self.database.executemany(
+            f"insert into {self.name} ({self.key.name}, {', '.join(stats)}, {last_column})"
+            f" values ({', '.join(['?'] * (len(stats) + 2))})"
+            f" on conflict ({self.key.name}) do update set {', '.join(f'{s} = {s} + excluded.{s}' for s in stats)},"
+            f" {last_column} = nullif(max(coalesce({last_column}, ''), coalesce(excluded.{last_column}, '')), '')",
+            updates, table=self.name)
+
+        # The stored date only needs to be looked up again if the latest entry of a user was removed or moved back
+        if recompute := [[user, user, date] for user, date in removed.items() if date > added.get(user, "")]:
+            self.database.executemany(
+                f"update {self.name} set {last_column} = (select max({SubmissionsColumns.DATE.name}) from {table}"
+                f" where clean_username({SubmissionsColumns.AUTHOR.name}) = ?)"
+                f" where {self.key.name} = ? and {last_column} <= ?",
+                recompute, table=self.name)
+
+    def rebuild(self) -> int:
+        self.database.execute(f"delete from {self.name}", table=self.name)
+        for table in (self.database.submissions, self.database.journals):
+            columns: list[str] = [c for c in table.tracked_columns if c in self.source_columns]
+            cursor: SQLCursor = self.database.execute(f"select {', '.join(columns)} from {table.name}",
+                                                      table=table.name)
+            while rows := cursor.fetchmany(self.rebuild_chunk_size):
+                self.changed(table.name, [], [dict(zip(columns, row)) for row in rows])
+        return len(self)
+
+
+class SimilarityTable(Table):
+    minhash: MinHash = MinHash()
+    rebuild_chunk_size: int = 1000
+    max_candidates: int = 1000
+
+    def __init__(self, database: "Database", name: str, columns: Iterable[Column] = None):
+        super().__init__(database, name, columns)
+        self._exists: bool | None = None
+
+    @property
+    def buckets(self) -> Table:
+        return self.database.similarity_buckets
+
+    @property
+    def exists(self) -> bool:
+        if self._exists is None:
+            self._exists = self.name in self.database
+        return self._exists
+
+    def create(self, exists_ignore: bool = True):
+        super().create(exists_ignore=exists_ignore)
+        self.buckets.create(exists_ignore=exists_ignore)
+        self.database.execute(f"create index {'if not exists ' * exists_ignore}{self.buckets.name}_"
+                              f"{SimilarityBucketsColumns.ID.name} on {self.buckets.name}"
+                              f" ({SimilarityBucketsColumns.ID.name})", table=self.buckets.name)
+        self._exists = True
+
+    def drop(self):
+        self.database.execute(f"drop table if exists {self.buckets.name}", table=self.buckets.name)
+        self.database.execute(f"drop table if exists {self.name}", table=self.name)
+        self._exists = False
+
+    def signature(self, tags: Iterable[str] | str | None, description: str | None) -> bytes | None:
+        tags = parse_list_filter_empty(tags or "") if isinstance(tags, str) or tags is None else tags
+        return self.minhash.signature(features(tags, description))
+
+    def set_signatures(self, signatures: dict[int, bytes | None], *, replace: bool = True):
+        ids: str = dumps(list(signatures))
+        if replace:
+            for table in (self.buckets, self):
+                self.database.execute(f"delete from {table.name} where {SimilarityColumns.ID.name} in"
+                                      f" (select value from json_each(?))", [ids], table=table.name)
+        signatures = {id_: s for id_, s in signatures.items() if s is not None}
+        self.database.executemany(f"insert into {self.name} ({SimilarityColumns.ID.name},"
+                                  f" {SimilarityColumns.SIGNATURE.name}) values (?, ?)",
+                                  signatures.items(), table=self.name)
+        self.database.executemany(f"insert into {self.buckets.name} ({SimilarityBucketsColumns.BAND.name},"
+                                  f" {SimilarityBucketsColumns.BUCKET.name}, {SimilarityBucketsColumns.ID.name})"
+                                  f" values (?, ?, ?)",
+                                  # Sorted rows are inserted in primary key order and touch fewer pages
+                                  sorted((band, bucket, id_) for id_, s in signatures.items()
+                                         for band, bucket in self.minhash.buckets(s)), table=self.buckets.name)
+
+    def changed(self, old: list[dict[str, Value]], new: list[dict[str, Value]]):
+        key, tags, description = \
+            SubmissionsColumns.ID.name, SubmissionsColumns.TAGS.name, SubmissionsColumns.DESCRIPTION.name
+        column: Column = self.database.submissions.get_column(description)
+        decode: Callable[[Value], Value] = column.codec.decode if column.codec else lambda v: v
+        previous: dict[int, tuple[Value, Value]] = {o[key]: (o.get(tags), o.get(description)) for o in old}
+        signatures: dict[int, bytes | None] = {id_: None for id_ in previous}
+        for entry in new:
+            if (id_ := entry.get(key)) is None:
+                continue
+            elif previous.get(id_) == (entry.get(tags), entry.get(description)):
+                # Changes to other columns, e.g. favorites, keep the stored signature
+                signatures.pop(id_, None)
+            else:
+                signatures[id_] = self.signature(entry.get(tags), decode(entry.get(description)))
+        if signatures:
+            self.set_signatures(signatures)
+
+    def rebuild(self, progress: Callable[[int], Any] = None) -> int:
+        for table in (self.buckets, self):
+            self.database.execute(f"delete from {table.name}", table=table.name)
+        key: str = SubmissionsColumns.ID.name
+        rows_done: int = 0
+        last_id: int = 0
+        while rows := self.database.execute(
+                f"select {key}, {SubmissionsColumns.TAGS.name}, decompress({SubmissionsColumns.DESCRIPTION.name})"
+                f" from {submissions_table} where {key} > ? order by {key} limit ?",
+                [last_id, self.rebuild_chunk_size], table=submissions_table).fetchall():
+            self.set_signatures({id_: self.signature(tags, text) for id_, tags, text in rows}, replace=False)
+            rows_done += len(rows)
+            last_id = rows[-1][0]
+            if progress:
+                progress(rows_done)
+        return len(self)
+
+    def _signatures(self, ids: list[int]) -> dict[int, bytes]:
+        return dict(self.database.execute(
+            f"select {SimilarityColumns.ID.name}, {SimilarityColumns.SIGNATURE.name} from {self.name}"
+            f" where {SimilarityColumns.ID.name} in (select value from json_each(?))", [dumps(ids)],
+            table=self.name).fetchall())
+
+    def query(self, signature: bytes | None, limit: int = 10, min_similarity: float = 0, *, exclude: int = None
+              ) -> list[tuple[int, float]]:
+        if signature is None:
+            return []
+        band, bucket, id_ = (c.name for c in SimilarityBucketsColumns.as_list())
+        # Candidates share at least one LSH band with the signature, those sharing more bands are more likely similar
+        candidates: list[int] = [c for [c] in self.database.execute(
+            f"select b.{id_} from json_each(?) j join {self.buckets.name} b"
+            f" on b.{band} = json_extract(j.value, '$[0]') and b.{bucket} = json_extract(j.value, '$[1]')"
+            f" where b.{id_} != ? group by b.{id_} order by count(*) desc limit ?",
+            [dumps(self.minhash.buckets(signature)), exclude or 0, self.max_candidates], table=self.buckets.name)]
+        signatures: dict[int, bytes] = self._signatures(candidates)
+        results: list[tuple[int, float]] = [
+            (c, s) for c, s in zip(signatures, self.minhash.similarities(signature, list(signatures.values())))
+            if s >= min_similarity
+        ]
+        return sorted(results, key=lambda r: (-r[1], r[0]))[:limit if limit > 0 else None]
+
+    def similar(self, submission_id: int, limit: int = 10, min_similarity: float = 0) -> list[tuple[int, float]]:
+        return self.query(self._signatures([submission_id]).get(submission_id), limit, min_similarity,
+                          exclude=submission_id)
+
+    def duplicates(self, min_similarity: float = 0.9) -> Generator[tuple[int, int, float], None, None]:
+        band, bucket, id_ = (c.name for c in SimilarityBucketsColumns.as_list())
+        seen: set[tuple[int, int]] = set()
+        for [group] in self.database.execute(f"select json_group_array({id_}) from {self.buckets.name}"
+                                           f" group by {band}, {bucket} having count(*) > 1",
+                                           table=self.buckets.name).fetchall():
+            ids: list[int] = sorted(loads(group))
+            pairs: list[tuple[int, int]] = [(a, b) for i, a in enumerate(ids) for b in ids[i + 1:]
+                                            if (a, b) not in seen]
+            if not pairs:
+                continue
+            seen.update(pairs)
+            signatures: dict[int, bytes] = self._signatures(ids)
+            for a, b in pairs:
+                if (s := self.minhash.similarities(signatures[a], [signatures[b]])[0]) >= min_similarity:
+                    yield a, b, s
+
+
+class SyncTable(Table):
+    def __getitem__(self, source: str) -> int:
+        return (super().__getitem__(source) or {}).get(SyncColumns.SEQ.name, 0)
+
+    def __setitem__(self, source: str, seq: int):
+        self.insert(self.format_entry({SyncColumns.SOURCE.name: source, SyncColumns.SEQ.name: seq}), replace=True)
+
+
 class HistoryTable(Table):
+    def __init__(self, database: "Database", name: str, columns: Iterable[Column] = None):
+        super().__init__(database, name, columns)
+        self.buffer_events: int = 0
+        self.buffer_seconds: float = 0
+        self._buffer: list[dict[str, Value]] = []
+        self._buffer_start: float = 0
+        self._last_time: datetime | None = None
+
     def __iter__(self) -> Generator[dict[str, Value], None, None]:
         return self.select(order=[self.key.name]).entries
 
+    def _next_time(self) -> datetime:
+        if self._last_time is None:
+            last: str | None = self.database.execute(f"select max({HistoryColumns.TIME.name}) from {self.name}",
+                                                     table=self.name).fetchone()[0]
+            self._last_time = datetime.fromisoformat(last) if last else datetime.min
+        # TIME is unique, so events logged within the same microsecond are moved forward instead of replacing each other
+        self._last_time = max(datetime.now(), self._last_time + timedelta(microseconds=1))
+        return self._last_time
+
     def add_event(self, event: str, time: datetime = None):
-        self[time or datetime.now()] = {HistoryColumns.EVENT.name: event}
+        entry: dict[str, Value] = self.format_entry({HistoryColumns.TIME.name: time or self._next_time(),
+                                                     HistoryColumns.EVENT.name: event})
+        if not self.buffer_events:
+            self.insert(entry, replace=True)
+            return
+        if not self._buffer:
+            self._buffer_start = perf_counter()
+        self._buffer.append(entry)
+        if len(self._buffer) >= self.buffer_events or perf_counter() - self._buffer_start >= self.buffer_seconds:
+            self.flush()
+
+    @property
+    def buffered(self) -> int:
+        return len(self._buffer)
+
+    def flush(self) -> int:
+        if not self._buffer:
+            return 0
+        buffer, self._buffer = self._buffer, []
+        return self.insert_many(buffer, replace=True)
+
+    @contextmanager
+    def buffer(self, max_events: int = 1000, max_seconds: float = 5):
+        previous: tuple[int, float] = (self.buffer_events, self.buffer_seconds)
+        self.buffer_events, self.buffer_seconds = max_events, max_seconds
+        try:
+            yield self
+        finally:
+            self.buffer_events, self.buffer_seconds = previous
+            self.flush()
+
+    def between(self, start: datetime = None, end: datetime = None) -> Cursor:
+        conditions: list[Selector] = [{op: {HistoryColumns.TIME.name: HistoryColumns.TIME.to_entry(time)}}
+                                      for op, time in ((GE, start), (LT, end)) if time is not None]
+        return self.select({AND: conditions} if conditions else None, order=[HistoryColumns.TIME.name])
+
+    def prune(self, before: datetime = None, *, keep: int = None) -> int:
+        self.flush()
+        deleted: int = 0
+        if before is not None:
+            deleted += self.delete({LT: {HistoryColumns.TIME.name: HistoryColumns.TIME.to_entry(before)}}).rowcount
+        if keep is not None:
+            deleted += self.database.execute(
+                f"delete from {self.name} where {HistoryColumns.TIME.name} <"
+                f" (select {HistoryColumns.TIME.name} from {self.name}"
+                f" order by {HistoryColumns.TIME.name} desc limit 1 offset ?)", [max(keep, 1) - 1],
+                table=self.name).rowcount
+        return deleted
+
+    def compact(self, before: datetime, period: str = "day") -> int:
+        if period not in (lengths := {"day": 10, "month": 7, "year": 4}):
+            raise ValueError(f"unknown period {period!r}, must be one of {', '.join(lengths)}")
+        self.flush()
+        time, event = HistoryColumns.TIME.name, HistoryColumns.EVENT.name
+        where: str = f"{time} < ?"
+        values: list[Value] = [HistoryColumns.TIME.to_entry(before)]
+        # Repeated events in each period are replaced by their first occurrence annotated with the number of repeats
+        groups: list[tuple[str, str, int]] = self.database.execute(
+            f"select min({time}), {event}, count(*) from {self.name} where {where}"
+            f" group by substr({time}, 1, {lengths[period]}), {event} having count(*) > 1", values,
+            table=self.name).fetchall()
+        for first, text, count in groups:
+            self.database.execute(
+                f"delete from {self.name} where {where} and substr({time}, 1, {lengths[period]}) = ?"
+                f" and {event} = ? and {time} != ?", [*values, first[:lengths[period]], text, first], table=self.name)
+            self.database.execute(f"update {self.name} set {event} = ? where {time} = ?",
+                                  [f"{text} (repeated {count} times)", first], table=self.name)
+        return sum(count - 1 for *_, count in groups)
 
 
 class Database:
+    cache_size: int = 256
+    encoded_columns: list[str] = [
+        SubmissionsColumns.CATEGORY.name, SubmissionsColumns.SPECIES.name, SubmissionsColumns.GENDER.name,
+        SubmissionsColumns.RATING.name, SubmissionsColumns.TYPE.name, SubmissionsColumns.FOLDER.name,
+    ]
+    compressed_columns: dict[str, list[str]] = {
+        users_table: [UsersColumns.USERPAGE.name],
+        submissions_table: [SubmissionsColumns.DESCRIPTION.name, SubmissionsColumns.FOOTER.name],
+        journals_table: [JournalsColumns.CONTENT.name, JournalsColumns.FOOTER.name],
+        comments_table: [CommentsColumns.TEXT.name],
+    }
+
     def __init__(self, path: str | PathLike | Path, *, init: bool = False, check_connections: bool = True,
                  check_version: bool = True, read_only: bool = False, autocommit: bool = False):
         self.path: Path = Path(path).resolve()
         self.read_only: bool = read_only
+        self.hooks: list[QueryHook] = []
+        self.active_batch: Batch | None = None
+        self._cache: OrderedDict[Hashable, Any] = OrderedDict()
+        self._cache_version: tuple[int, int] | None = None
 
         if check_connections:
             self.check_connection()
 
         self.connection: Connection = connect(self.path.as_uri() + ("?mode=ro" if read_only else ""), uri=True)
         self.autocommit = autocommit
+        self.codec: Codec | None = None
+        self.dictionary_codecs: dict[str, DictionaryCodec] = {}
+        register_functions(self.connection)
+        self.connection.create_function("decompress", 1, lambda v: self.codec.decode(v) if self.codec else v,
+                                        deterministic=True)
 
         self.users: UsersTable = UsersTable(self, users_table, UsersColumns.as_list())
-        self.current_usernames:  Table = Table(self, current_usernames_table, CurrentUsernamesColumns.as_list())
-        self.all_usernames:  Table = Table(self, all_usernames_table, AllUsernamesColumns.as_list())
+        self.current_usernames: Table = Table(self, current_usernames_table, CurrentUsernamesColumns.as_list())
+        self.all_usernames: UsernamesTable = UsernamesTable(self, all_usernames_table, AllUsernamesColumns.as_list())
         self.submissions: SubmissionsTable = SubmissionsTable(self, submissions_table, SubmissionsColumns.as_list())
         self.journals: JournalsTable = JournalsTable(self, journals_table, JournalsColumns.as_list())
         self.comments: CommentsTable = CommentsTable(self, comments_table, CommentsColumns.as_list())
         self.settings: SettingsTable = SettingsTable(self, settings_table, SettingsColumns.as_list())
         self.history: HistoryTable = HistoryTable(self, history_table, HistoryColumns.as_list())
+        self.files: FilesTable = FilesTable(self, files_table, FilesColumns.as_list())
+        self.changes: ChangesTable = ChangesTable(self, changes_table, ChangesColumns.as_list())
+        self.sync: SyncTable = SyncTable(self, sync_table, SyncColumns.as_list())
+        self.codes: CodesTable = CodesTable(self, codes_table, CodesColumns.as_list())
+        self.user_stats: UserStatsTable = UserStatsTable(self, user_stats_table, UserStatsColumns.as_list())
+        self.autocomplete: Autocomplete | None = None
+        self.similarity: SimilarityTable = SimilarityTable(self, similarity_table, SimilarityColumns.as_list())
+        self.similarity_buckets: Table = Table(self, similarity_buckets_table, SimilarityBucketsColumns.as_list())
 
         self.committed_changes: int = self.total_changes
 
         if self.is_formatted:
             if check_version:
                 self.check_version()
+            self.load_codec()
         elif init:
             self.init()
 
@@ -596,15 +1641,19 @@ class Database:
         return self.settings.version
 
     def init(self):
+        # auto_vacuum can only be changed without a full vacuum before the first table is created
+        if not self.tables:
+            self.execute("pragma auto_vacuum = incremental")
         self.users.create(exists_ignore=True)
         self.submissions.create(exists_ignore=True)
         self.journals.create(exists_ignore=True)
         self.comments.create(exists_ignore=True)
         self.settings.create(exists_ignore=True)
         self.history.create(exists_ignore=True)
+        self.all_usernames.create(exists_ignore=True)
 
     def check_connection(self: Type["Database"] | str | PathLike | Path, raise_for_error: bool = True, limit: int = 0
-                         ) -> list[Process]:
+                         ) -> list['Process']:
         return find_connections(self.path if isinstance(self, Database) else Path(self), raise_for_error, limit)
 
     def check_version(self, raise_for_error: bool = True) -> VersionError | None:
@@ -613,23 +1662,45 @@ class Database:
             raise err
         return err
 
-    def execute(self, sql: str, parameters: Iterable = None) -> SQLCursor:
-        return self.connection.execute(sql, parameters or [])
+    def execute(self, sql: str, parameters: Iterable = None, *, table: str = None) -> SQLCursor:
+        if not self.hooks:
+            return self.connection.execute(sql, parameters or [])
+        return trace_execute(self, sql, parameters or [], table)
+
+    def executemany(self, sql: str, parameters: Iterable[Iterable], *, table: str = None) -> SQLCursor:
+        if not self.hooks:
+            return self.connection.executemany(sql, parameters)
+        return trace_executemany(self, sql, parameters, table)
 
     def commit(self):
+        self.history.flush()
         self.connection.commit()
         self.committed_changes = self.total_changes
 
     def rollback(self):
         self.execute("ROLLBACK")
+        self.clear_caches()
+
+    def clear_caches(self):
+        # Rolled back changes do not change total_changes or data_version, so the caches cannot detect them
+        self._cache.clear()
+        self._cache_version = None
+        self.all_usernames.clear_cache()
+        if self.autocomplete is not None:
+            self.autocomplete.clear()
+
+    def batch(self, max_ops: int = 1000, max_seconds: float = 5) -> Batch:
+        return Batch(self, max_ops, max_seconds)
 
     def reset(self, *, init: bool = False, check_connections: bool = True, check_version: bool = True,
               read_only: bool = None, autocommit: bool = None):
+        hooks: list[QueryHook] = self.hooks
+        autocommit = self.autocommit if autocommit is None else autocommit
         self.close()
         self.connection = None
         self.__init__(self.path, init=init, check_connections=check_connections, check_version=check_version,
-                      read_only=self.read_only if read_only is None else read_only,
-                      autocommit=self.autocommit if autocommit is None else autocommit)
+                      read_only=self.read_only if read_only is None else read_only, autocommit=autocommit)
+        self.hooks = hooks
 
     def upgrade(self, *, check_connections: bool = True, read_only: bool = None, autocommit: bool = None):
         self.connection = update_database(self.connection, __version__)
@@ -645,6 +1716,272 @@ class Database:
         copy_cursors(db_b, cursors or [self.users.select(), self.submissions.select(), self.journals.select()],
                      replace=replace, exist_ok=exist_ok)
 
+    def cached(self, key: Hashable, compute: Callable[[], T]) -> T:
+        # Changes made by this connection update total_changes, commits from other connections update data_version
+        if (version := (self.total_changes, self.pragma("data_version"))) != self._cache_version:
+            self._cache.clear()
+            self._cache_version = version
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        result: T = compute()
+        self._cache[key] = result
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def pragma(self, name: str) -> Value:
+        return row[0] if (row := self.execute(f"pragma {name}").fetchone()) else None
+
+    @property
+    def auto_vacuum(self) -> str:
+        return ("none", "full", "incremental")[self.pragma("auto_vacuum")]
+
+    def enable_incremental_vacuum(self):
+        self.commit()
+        self.execute("pragma auto_vacuum = incremental")
+        self.execute("vacuum")
+
+    def maintain(self, *, analysis_limit: int = 1000, vacuum_pages: int = 10000, vacuum_step: int = 500,
+                 max_seconds: float = None, checkpoint: bool = True, migrate: bool = False,
+                 interval: timedelta = None) -> dict[str, Any] | None:
+        if interval is not None and (last := self.settings.last_maintenance) and datetime.now() - last < interval:
+            return None
+
+        self.commit()
+        start: float = perf_counter()
+        report: dict[str, Any] = {
+            "page_size": self.pragma("page_size"),
+            "pages_before": self.pragma("page_count"),
+            "free_pages_before": self.pragma("freelist_count"),
+        }
+
+        if migrate and self.auto_vacuum != "incremental":
+            step_start: float = perf_counter()
+            self.enable_incremental_vacuum()
+            report["migrate"] = perf_counter() - step_start
+
+        step_start = perf_counter()
+        self.execute(f"pragma analysis_limit = {int(analysis_limit)}")
+        # optimize only analyzes tables already in sqlite_stat1 or used by this connection, so the first run is explicit
+        if self.execute("select 1 from sqlite_master where name = 'sqlite_stat1'").fetchone():
+            self.execute("pragma optimize").fetchall()
+        else:
+            self.execute("analyze")
+        self.commit()
+        report["analyze"] = perf_counter() - step_start
+
+        step_start = perf_counter()
+        report["vacuumed_pages"] = 0
+        if self.auto_vacuum == "incremental":
+            while (report["vacuumed_pages"] < vacuum_pages and (free := self.pragma("freelist_count")) and
+                   (max_seconds is None or perf_counter() - start < max_seconds)):
+                # Every step runs in its own short transaction so writers are only blocked for one step at a time
+                self.execute(f"pragma incremental_vacuum({min(vacuum_step, vacuum_pages - report['vacuumed_pages'])})"
+                             ).fetchall()
+                self.commit()
+                report["vacuumed_pages"] += free - self.pragma("freelist_count")
+        report["vacuum"] = perf_counter() - step_start
+
+        step_start = perf_counter()
+        if checkpoint and self.pragma("journal_mode") == "wal":
+            busy, _, checkpointed = self.execute("pragma wal_checkpoint(truncate)").fetchone()
+            report["checkpoint_busy"], report["checkpoint_pages"] = bool(busy), checkpointed
+        report["checkpoint"] = perf_counter() - step_start
+
+        report["pages_after"] = self.pragma("page_count")
+        report["free_pages_after"] = self.pragma("freelist_count")
+        report["time"] = perf_counter() - start
+
+        self.settings.last_maintenance = datetime.now()
+        self.commit()
+        return report
+
+    def create_date_indexes(self):
+        for table in (self.submissions, self.journals, self.comments):
+            table.create_date_indexes()
+
+    def _codecs(self, table_name: str) -> dict[str, Codec]:
+        codecs: dict[str, Codec] = {}
+        if self.codec:
+            codecs |= {c: self.codec for c in self.compressed_columns.get(table_name, [])}
+        if table_name == submissions_table:
+            codecs |= self.dictionary_codecs
+        return codecs
+
+    def load_codec(self):
+        dictionaries: dict[int, bytes] = self.settings.compression_dictionaries
+        self.codec = ZlibCodec(dictionaries, max(dictionaries, default=0)) \
+            if self.settings.compression == ZlibCodec.name else None
+        self.dictionary_codecs = {
+            c: DictionaryCodec(c, self.codes.lookup_sql(c), partial(self.codes.load, c), partial(self.codes.add, c))
+            for c in self.encoded_columns
+        } if self.settings.dictionary_encoding else {}
+        for table, columns in ((self.users, UsersColumns), (self.submissions, SubmissionsColumns),
+                               (self.journals, JournalsColumns), (self.comments, CommentsColumns)):
+            codecs: dict[str, Codec] = self._codecs(table.name)
+            table._columns = [c.with_codec(codec) if (codec := codecs.get(c.name)) else c for c in columns.as_list()]
+
+    def train_compression_dictionary(self, *, samples: int = 2000, size: int = 32768) -> bytes:
+        return train_dictionary(
+            text for table in (self.users, self.submissions, self.journals, self.comments)
+            for c in self.compressed_columns[table.name]
+            for [text] in self.execute(f"select decompress({c}) from {table.name} order by random() limit ?",
+                                       [samples], table=table.name)
+            if text)
+
+    def enable_compression(self, *, dictionary: bytes = None, chunk_size: int = 1000,
+                           progress: Callable[[str, int], Any] = None) -> dict[str, int]:
+        self.settings.compression = ZlibCodec.name
+        if dictionary:
+            self.settings.add_compression_dictionary(dictionary)
+        self.load_codec()
+        return self._transcode({t: {c: self.codec.encode for c in cs} for t, cs in self.compressed_columns.items()},
+                               chunk_size, progress)
+
+    def disable_compression(self, *, chunk_size: int = 1000, progress: Callable[[str, int], Any] = None
+                            ) -> dict[str, int]:
+        codec: Codec = self.codec or Codec()
+        changed: dict[str, int] = self._transcode(
+            {t: {c: codec.decode for c in cs} for t, cs in self.compressed_columns.items()}, chunk_size, progress)
+        self.settings.compression = None
+        self.load_codec()
+        self.commit()
+        return changed
+
+    def enable_dictionary_encoding(self, *, chunk_size: int = 1000, progress: Callable[[str, int], Any] = None
+                                   ) -> dict[str, int]:
+        self.codes.create(exists_ignore=True)
+        self.settings.dictionary_encoding = True
+        self.load_codec()
+        self._rebuild_table(self.submissions)
+        return self._transcode({submissions_table: {c: codec.encode for c, codec in self.dictionary_codecs.items()}},
+                               chunk_size, progress)
+
+    def disable_dictionary_encoding(self, *, chunk_size: int = 1000, progress: Callable[[str, int], Any] = None
+                                    ) -> dict[str, int]:
+        changed: dict[str, int] = self._transcode(
+            {submissions_table: {c: codec.decode for c, codec in self.dictionary_codecs.items()}}, chunk_size, progress)
+        self.settings.dictionary_encoding = False
+        self.load_codec()
+        self._rebuild_table(self.submissions)
+        return changed
+
+    def enable_user_stats(self) -> int:
+        self.user_stats.create(exists_ignore=True)
+        users: int = self.user_stats.rebuild()
+        self.commit()
+        return users
+
+    def disable_user_stats(self):
+        self.user_stats.drop()
+        self.commit()
+
+    def enable_similarity(self, progress: Callable[[int], Any] = None) -> int:
+        self.similarity.create(exists_ignore=True)
+        signatures: int = self.similarity.rebuild(progress)
+        self.commit()
+        return signatures
+
+    def disable_similarity(self):
+        self.similarity.drop()
+        self.commit()
+
+    def enable_autocomplete(self) -> Autocomplete:
+        # The indexes are only read from the database the first time they are queried
+        self.autocomplete = self.autocomplete or Autocomplete(self)
+        return self.autocomplete
+
+    def disable_autocomplete(self):
+        self.autocomplete = None
+
+    def entries_changed(self, table: str, old: list[dict[str, Value]], new: list[dict[str, Value]]):
+        if self.user_stats.exists and table in (submissions_table, journals_table):
+            self.user_stats.changed(table, old, new)
+        if self.autocomplete is not None:
+            self.autocomplete.changed(table, old, new)
+        if self.similarity.exists and table == submissions_table:
+            self.similarity.changed(old, new)
+
+    def _rebuild_table(self, table: Table):
+        # SQLite rewrites the head of stored statements ("CREATE TABLE", quoted names), so only the definitions compare
+        create_statement: str = table.create_statement()
+        stored: str = self.execute("select sql from sqlite_master where type = 'table' and name = ?", [table.name],
+                                   table=table.name).fetchone()[0]
+        if stored[stored.index("("):] == create_statement[create_statement.index("("):]:
+            return
+        changelog: bool = self.changes.enabled
+        columns: str = ", ".join(c.name for c in table.columns)
+        self.commit()
+        self.execute("begin")
+        try:
+            self.execute(Table(self, f"{table.name}_NEW", table.columns).create_statement(), table=table.name)
+            self.execute(f"insert into {table.name}_NEW ({columns}) select {columns} from {table.name}",
+                         table=table.name)
+            self.execute(f"drop table {table.name}", table=table.name)
+            self.execute(f"alter table {table.name}_NEW rename to {table.name}", table=table.name)
+            if table.date_column:
+                table.create_date_indexes()
+            if changelog:
+                self.changes.enable()
+        except BaseException:
+            self.connection.rollback()
+            raise
+        self.commit()
+
+    def _transcode(self, functions: dict[str, dict[str, Callable[[Value], Value]]], chunk_size: int,
+                   progress: Callable[[str, int], Any] = None) -> dict[str, int]:
+        changed: dict[str, int] = {}
+        for table_name, column_functions in functions.items():
+            columns: list[str] = list(column_functions.keys())
+            changed[table_name] = last_rowid = 0
+            while rows := self.execute(f"select rowid, {', '.join(columns)} from {table_name} where rowid > ?"
+                                       f" order by rowid limit ?", [last_rowid, chunk_size],
+                                       table=table_name).fetchall():
+                updates: list[list[Value]] = [
+                    [*new, rowid] for rowid, *old in rows
+                    if (new := [f(v) for f, v in zip(column_functions.values(), old)]) != old
+                ]
+                self.executemany(f"update {table_name} set {', '.join(f'{c} = ?' for c in columns)} where rowid = ?",
+                                 updates, table=table_name)
+                self.commit()
+                changed[table_name] += len(updates)
+                last_rowid = rows[-1][0]
+                if progress:
+                    progress(table_name, last_rowid)
+        return changed
+
+    def enable_changelog(self):
+        self.changes.enable()
+
+    def disable_changelog(self):
+        self.changes.disable()
+
+    def sync_from(self, db_b: 'Database', since: int = None, *, chunk_size: int = 10000) -> dict[str, int]:
+        if not db_b.changes.enabled:
+            raise DatabaseError("Source database does not have a change log.")
+
+        self.sync.create(exists_ignore=True)
+        source: str = str(db_b.path)
+        since = self.sync[source] if since is None else since
+        last_seq: int = db_b.changes.last_seq
+        changes: dict[str, dict[str, list[list[Value]]]] = db_b.changes.changes(since)
+        synced: dict[str, int] = {}
+
+        for table_b in db_b.changes.tracked_tables():
+            if not (table_changes := changes.get(table_b.name)):
+                continue
+            table: Table = next(t for t in self.changes.tracked_tables() if t.name == table_b.name)
+            for key in table_changes.get("delete", []):
+                table.delete({AND: [{EQ: {k.name: v}} for k, v in zip(table.keys, key)]})
+            upserts: list[Value] = list(dict.fromkeys(key[0] for key in table_changes.get("upsert", [])))
+            copy_cursors(self, [table_b.select({IN: {table_b.key.name: upserts[i:i + chunk_size]}})
+                                for i in range(0, len(upserts), chunk_size)], replace=True, exist_ok=True)
+            synced[table_b.name] = sum(map(len, table_changes.values()))
+
+        self.sync[source] = max(since, last_seq)
+        return synced
+
     def backup(self, *, folder: Path = None, date_format: str = "%Y-%m-%d %H.%M.%S"):
         folder: Path | None = folder or self.settings.backup_folder
         if folder is None:
@@ -661,4 +1998,11 @@ class Database:
             backup_file.with_suffix(".tmp").unlink(missing_ok=True)
 
     def close(self):
+        # Buffered events are written like events added without a buffer, they are committed unless they join changes
+        # that were never committed, which are discarded with them
+        if self.history.buffered:
+            pending: bool = self.connection.in_transaction
+            self.history.flush()
+            if not pending:
+                self.commit()
         self.connection.close()
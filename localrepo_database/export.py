@@ -0,0 +1,183 @@
+from csv import field_size_limit
+from csv import reader as csv_reader
+from csv import writer as csv_writer
+from gzip import open as gzip_open
+from json import dumps
+from json import loads
+from pathlib import Path
+from typing import Any
+from typing import Generator
+from typing import Iterable
+from typing import TextIO
+from typing import TYPE_CHECKING
+
+from .column import Column
+from .selector import Selector
+from .tables import settings_table
+from .tables import similarity_buckets_table
+from .tables import similarity_table
+from .types import Value
+
+if TYPE_CHECKING:
+    from .database import Database
+    from .database import Table
+
+__all__ = [
+    "formats",
+    "export_table",
+    "import_table",
+    "export_database",
+    "import_database",
+]
+
+formats: tuple[str, ...] = ("jsonl", "csv")
+# Signatures are binary and derived from the submissions, they are rebuilt with enable_similarity instead
+_derived_tables: tuple[str, ...] = (similarity_table, similarity_buckets_table)
+
+
+def _file_format(file: Path | TextIO, format_: str | None) -> str:
+    if format_ is None:
+        if not isinstance(file, Path):
+            raise ValueError("format must be set when using a file object")
+        format_ = file.name.removesuffix(".gz").rsplit(".", 1)[-1].lower()
+    if format_ not in formats:
+        raise ValueError(f"unknown format {format_!r}, must be one of {', '.join(formats)}")
+    return format_
+
+
+def _tables(db: 'Database', tables: list[str] | None) -> list[str]:
+    if not tables:
+        return [t.name for t in db.tables if t.name.upper() not in _derived_tables]
+    elif derived := [t for t in tables if t.upper() in _derived_tables]:
+        raise ValueError(f"cannot export or import derived tables: {', '.join(derived)}")
+    return [t.upper() for t in tables]
+
+
+def _get_table(db: 'Database', name: str) -> 'Table':
+    return next((t for t in (db.users, db.submissions, db.journals, db.comments, db.settings, db.history, db.files,
+                             db.current_usernames, db.all_usernames, db.codes, db.user_stats)
+                 if t.name.upper() == name.upper()), db[name])
+
+
+def _open(file: Path, mode: str) -> TextIO:
+    if file.suffix.lower() == ".gz":
+        return gzip_open(file, mode + "t", encoding="utf-8", newline="")
+    return file.open(mode, encoding="utf-8", newline="")
+
+
+def _csv_value(column: Column, value: str) -> Value:
+    if value == "" and not column.not_null:
+        return None
+    elif column.sql_type in ("integer", "boolean"):
+        return int(value)
+    elif column.sql_type == "real":
+        return float(value)
+    return value
+
+
+def _write_rows(file: TextIO, format_: str, names: list[str], chunks: Iterable[list[tuple]]) -> int:
+    count: int = 0
+    if format_ == "csv":
+        writer = csv_writer(file)
+        writer.writerow(names)
+        for rows in chunks:
+            writer.writerows(rows)
+            count += len(rows)
+    else:
+        for rows in chunks:
+            file.writelines(dumps(dict(zip(names, row)), ensure_ascii=False) + "\n" for row in rows)
+            count += len(rows)
+    return count
+
+
+def _read_rows(file: TextIO, format_: str) -> Generator[tuple[list[str], list[Any]], None, None]:
+    if format_ == "csv":
+        field_size_limit(max(field_size_limit(), 1 << 30))
+        rows = csv_reader(file)
+        names: list[str] = next(rows, [])
+        for row in rows:
+            yield names, row
+    else:
+        for line in file:
+            if line.strip():
+                yield [*(entry := loads(line)).keys()], [*entry.values()]
+
+
+def export_table(table: 'Table', file: Path | TextIO, format_: str = None, *, columns: list[str] = None,
+                 query: Selector = None, order: list[str] = None, chunk_size: int = 1000) -> int:
+    format_ = _file_format(file, format_)
+    columns_: list[Column] = [table.get_column(c) for c in columns] if columns else table.columns
+    if any(c is None for c in columns_):
+        raise KeyError(f"Unknown columns for {table.name} table: "
+                       f"{', '.join(n for n, c in zip(columns, columns_) if c is None)}")
+    order = order or [c.name for c in table.keys]
+    # Encoded values are exported decoded so files do not depend on the codec settings of the database
+    select_columns: list[Column] = [Column(c.codec.sql(c.name), Any) if c.codec else c for c in columns_]
+    chunks: Generator[list[tuple], None, None] = table.select(query, select_columns, order).chunks(chunk_size,
+                                                                                                   raw=True)
+    if isinstance(file, Path):
+        with _open(file, "w") as f:
+            return _write_rows(f, format_, [c.name for c in columns_], chunks)
+    return _write_rows(file, format_, [c.name for c in columns_], chunks)
+
+
+def import_table(table: 'Table', file: Path | TextIO, format_: str = None, *, replace: bool = False,
+                 exists_ok: bool = False, chunk_size: int = 1000) -> int:
+    format_ = _file_format(file, format_)
+
+    def entries(f: TextIO) -> Generator[dict[str, Value], None, None]:
+        columns: dict[str, Column] = {}
+        for names, row in _read_rows(f, format_):
+            for name in names:
+                if name.upper() not in columns:
+                    columns[name.upper()] = table.get_column(name)
+            if unknown := [n for n in names if columns[n.upper()] is None]:
+                raise KeyError(f"Unknown columns for {table.name} table: {', '.join(unknown)}")
+            yield table.format_entry({
+                n: c.from_entry(_csv_value(c, v) if format_ == "csv" else v)
+                for n, v in zip(names, row, strict=True)
+                for c in [columns[n.upper()]]
+            })
+
+    def insert(f: TextIO) -> int:
+        inserted: int = 0
+        chunk: list[dict[str, Value]] = []
+        for entry in entries(f):
+            chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                inserted += table.insert_many(chunk, replace=replace, exists_ok=exists_ok)
+                chunk.clear()
+        return inserted + table.insert_many(chunk, replace=replace, exists_ok=exists_ok)
+
+    if isinstance(file, Path):
+        with _open(file, "r") as f:
+            return insert(f)
+    return insert(file)
+
+
+def export_database(db: 'Database', folder: Path, format_: str = "jsonl", *, compress: bool = False,
+                    tables: list[str] = None, chunk_size: int = 1000) -> dict[str, int]:
+    format_ = _file_format(folder, format_)
+    folder.mkdir(parents=True, exist_ok=True)
+    tables = _tables(db, tables)
+    return {
+        name: export_table(_get_table(db, name),
+                           folder / f"{name}.{format_}{'.gz' if compress else ''}", format_, chunk_size=chunk_size)
+        for name in tables
+    }
+
+
+def import_database(db: 'Database', folder: Path, format_: str = "jsonl", *, tables: list[str] = None,
+                    replace: bool = False, exists_ok: bool = False, chunk_size: int = 1000) -> dict[str, int]:
+    format_ = _file_format(folder, format_)
+    tables = _tables(db, tables)
+    counts: dict[str, int] = {}
+    for name in tables:
+        file: Path = folder / f"{name}.{format_}"
+        if not file.is_file() and not (file := file.with_name(file.name + ".gz")).is_file():
+            continue
+        # Initialized databases already hold every setting, so the imported settings replace them
+        counts[name] = import_table(_get_table(db, name), file, format_,
+                                    replace=replace or name.upper() == settings_table, exists_ok=exists_ok,
+                                    chunk_size=chunk_size)
+    return counts
@@ -0,0 +1,82 @@
+from mmap import ACCESS_READ
+from mmap import mmap
+from os import write
+from pathlib import Path
+from typing import BinaryIO
+from typing import Generator
+
+from .util import guess_mime
+
+try:
+    from os import sendfile as os_sendfile
+except ImportError:  # not available on Windows
+    os_sendfile = None
+
+__all__ = [
+    "SubmissionFile",
+]
+
+
+class SubmissionFile:
+    def __init__(self, submission_id: int, path: Path, *, thumbnail: bool = False, n: int = 0):
+        self.submission_id: int = submission_id
+        self.path: Path = path
+        self.thumbnail: bool = thumbnail
+        self.n: int = n
+        self._size: int | None = None
+        self._mime: str | None = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.submission_id}, {str(self.path)!r})"
+
+    def __fspath__(self) -> str:
+        return str(self.path)
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    @property
+    def exists(self) -> bool:
+        return self.path.is_file()
+
+    @property
+    def size(self) -> int:
+        if self._size is None:
+            self._size = self.path.stat().st_size
+        return self._size
+
+    @property
+    def mime(self) -> str:
+        if self._mime is None:
+            self._mime = guess_mime(self.path)
+        return self._mime
+
+    def open(self) -> BinaryIO:
+        return self.path.open("rb", buffering=0)
+
+    def mmap(self) -> mmap | memoryview:
+        with self.open() as f:
+            if not (size := self.size):
+                return memoryview(b"")
+            return mmap(f.fileno(), size, access=ACCESS_READ)
+
+    def chunks(self, chunk_size: int = 1 << 16) -> Generator[bytes, None, None]:
+        with self.open() as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def sendfile(self, out_fd: int, offset: int = 0, count: int = None) -> int:
+        count = self.size - offset if count is None else count
+        sent: int = 0
+        with self.open() as f:
+            if os_sendfile is None:
+                f.seek(offset)
+                while sent < count and (chunk := f.read(min(1 << 16, count - sent))):
+                    sent += write(out_fd, chunk)
+                return sent
+            while sent < count:
+                if not (n := os_sendfile(out_fd, f.fileno(), offset + sent, count - sent)):
+                    break
+                sent += n
+        return sent
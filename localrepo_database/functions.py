@@ -0,0 +1,64 @@
+from functools import lru_cache
+from re import compile as re_compile
+from re import Pattern
+from sqlite3 import Connection
+from typing import Any
+from typing import Callable
+
+from .column import parse_list_filter_empty
+from .util import clean_username
+from .util import tiered_path
+
+__all__ = [
+    "regexp",
+    "bar_contains",
+    "bar_length",
+    "sql_clean_username",
+    "sql_tiered_path",
+    "functions",
+    "register_functions",
+]
+
+
+@lru_cache(maxsize=256)
+def _pattern(pattern: str) -> Pattern:
+    return re_compile(pattern)
+
+
+# SQLite calls "X regexp Y" as regexp(Y, X)
+def regexp(pattern: str | None, value: Any) -> int | None:
+    if pattern is None or value is None:
+        return None
+    return _pattern(pattern).search(value if isinstance(value, str) else str(value)) is not None
+
+
+def bar_contains(value: str | None, item: str | None) -> int | None:
+    if value is None or item is None:
+        return None
+    return f"|{item}|" in value
+
+
+def bar_length(value: str | None) -> int | None:
+    return len(parse_list_filter_empty(value)) if value is not None else None
+
+
+def sql_clean_username(value: str | None) -> str | None:
+    return clean_username(value) if value else value
+
+
+def sql_tiered_path(id_: int | str | None, depth: int = 5, width: int = 2) -> str | None:
+    return tiered_path(id_, depth, width).as_posix() if id_ is not None else None
+
+
+functions: dict[str, tuple[int, Callable]] = {
+    "regexp": (2, regexp),
+    "bar_contains": (2, bar_contains),
+    "bar_length": (1, bar_length),
+    "clean_username": (1, sql_clean_username),
+    "tiered_path": (-1, sql_tiered_path),
+}
+
+
+def register_functions(connection: Connection):
+    for name, (args, function) in functions.items():
+        connection.create_function(name, args, function, deterministic=True)
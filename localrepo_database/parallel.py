@@ -0,0 +1,83 @@
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+from math import ceil
+from os import cpu_count
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Generator
+from typing import TypeVar
+
+from .database import Database
+from .selector import AND
+from .selector import GE
+from .selector import LT
+from .selector import Selector
+from .selector import selector_to_sql
+from .types import Value
+
+__all__ = [
+    "scan_ranges",
+    "scan",
+]
+
+T = TypeVar("T")
+
+_databases: dict[Path, Database] = {}
+
+
+def scan_ranges(db: Database, table: str, chunk_size: int, query: Selector = None
+                ) -> list[tuple[Value, Value | None, int]]:
+    table_: Any = getattr(db, table)
+    key: str = table_.key.name
+    sql, values = selector_to_sql(table_._encode_selector(query)) if query else ("", [])
+    # The first key of every chunk, found with a single pass over the key index
+    starts: list[tuple[Value, int]] = db.execute(
+        f"select {key}, n from (select {key}, row_number() over (order by {key}) - 1 as n from {table_.name}"
+        f"{f' where {sql}' if sql else ''}) where n % ? = 0", [*values, chunk_size], table=table_.name).fetchall()
+    total: int = db.execute(f"select count(*) from {table_.name}{f' where {sql}' if sql else ''}", values,
+                            table=table_.name).fetchone()[0]
+    return [(start, starts[i + 1][0] if i + 1 < len(starts) else None,
+             (starts[i + 1][1] if i + 1 < len(starts) else total) - n)
+            for i, (start, n) in enumerate(starts)]
+
+
+def _scan_range(path: Path, table: str, start: Value, end: Value | None, query: Selector | None,
+                columns: list[str] | None, function: Callable[[dict[str, Value]], T]) -> list[T]:
+    if (db := _databases.get(path)) is None:
+        db = _databases[path] = Database(path, read_only=True, check_connections=False)
+    table_: Any = getattr(db, table)
+    key: str = table_.key.name
+    conditions: list[Selector] = [{GE: {key: start}}, *([{LT: {key: end}}] if end is not None else []),
+                                  *([query] if query else [])]
+    return [r for entry in table_.select({AND: conditions}, columns, [key]) if (r := function(entry)) is not None]
+
+
+def scan(db: Database, table: str, function: Callable[[dict[str, Value]], T], *, query: Selector = None,
+         columns: list[str] = None, chunk_size: int = None, workers: int = None, ordered: bool = True,
+         progress: Callable[[int, int, int], Any] = None) -> Generator[T, None, None]:
+    workers = workers or cpu_count() or 1
+    if chunk_size is None:
+        # Several chunks per worker keep the pool busy when some ranges are slower than others
+        count: int = len(getattr(db, table))
+        chunk_size = max(100, min(10_000, ceil(count / (workers * 4)) or 1))
+    db.commit()
+    ranges: list[tuple[Value, Value | None, int]] = scan_ranges(db, table, chunk_size, query)
+    rows: int = 0
+
+    with ProcessPoolExecutor(min(workers, len(ranges)) or 1) as executor:
+        futures: list[Future] = [executor.submit(_scan_range, db.path, table, start, end, query, columns, function)
+                                 for start, end, _ in ranges]
+        sizes: dict[Future, int] = {f: size for f, (*_, size) in zip(futures, ranges)}
+        try:
+            for n, future in enumerate(futures if ordered else as_completed(futures), 1):
+                results: list[T] = future.result()
+                rows += sizes[future]
+                if progress:
+                    progress(n, len(ranges), rows)
+                yield from results
+        finally:
+            # Stopping the scan early should not wait for the ranges that have not started yet
+            for future in futures:
+                future.cancel()
@@ -1,8 +1,14 @@
+from calendar import timegm
+from datetime import datetime
+from json import dumps
 from typing import Optional
 from typing import Union
 
 from .exceptions import UnknownSelector
+from .tables import AllUsernamesColumns
+from .tables import all_usernames_table
 from .types import Value
+from .util import clean_username
 
 Selector = dict[str, Union[dict[str, Union[Value, list[Value]]], 'Selector', list['Selector']]]
 SELECTOR_NOT = NOT = "$not"
@@ -19,6 +25,14 @@ SELECTOR_INSTR = INSTR = "$instr"
 SELECTOR_BETWEEN = BETWEEN = "$between"
 SELECTOR_LIKE = LIKE = "$like"
 SELECTOR_GLOB = GLOB = "$glob"
+SELECTOR_DATE_RANGE = DATE_RANGE = "$daterange"
+SELECTOR_MONTH = MONTH = "$month"
+SELECTOR_ALIASES = ALIASES = "$aliases"
+SELECTOR_REGEX = REGEX = "$regex"
+SELECTOR_HAS = HAS = "$has"
+
+# Lists with more values than this are passed to $in as a single JSON array parameter
+IN_PARAMETERS_LIMIT: int = 100
 
 
 def flatten(list_old: list) -> list:
@@ -28,13 +42,35 @@ def flatten(list_old: list) -> list:
     return list_new
 
 
+def date_epoch_sql(column: str) -> str:
+    return f"cast(strftime('%s', {column}) as integer)"
+
+
+def date_month_sql(column: str) -> str:
+    return f"substr({column}, 1, 7)"
+
+
+def date_to_epoch(value: datetime | str | int | float) -> int:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return timegm(value.utctimetuple()) if isinstance(value, datetime) else int(value)
+
+
+def aliases_sql() -> str:
+    username, user_id = AllUsernamesColumns.USERNAME.name, AllUsernamesColumns.USER_ID.name
+    return f"select {username} from {all_usernames_table} where {user_id} in" \
+           f" (select {user_id} from {all_usernames_table} where {username} in (select value from json_each(?)))" \
+           f" union select value from json_each(?)"
+
+
 def selector_to_sql(selector: Selector) -> tuple[str, list[Value]]:
     sql, values = "", []
     assert isinstance(selector, dict), "selector needs to be of type dict"
     for key, value in selector.items():
         if key in (AND, OR):
             assert isinstance(value, list) and all(isinstance(v, dict) for v in value)
-        elif key in (NOT, EQ, NE, GT, LT, GE, LE, IN, INSTR, BETWEEN, LIKE, GLOB):
+        elif key in (NOT, EQ, NE, GT, LT, GE, LE, IN, INSTR, BETWEEN, LIKE, GLOB, DATE_RANGE, MONTH,
+                     ALIASES, REGEX, HAS):
             assert isinstance(value, dict)
         else:
             raise UnknownSelector(key)
@@ -70,9 +106,13 @@ def selector_to_sql(selector: Selector) -> tuple[str, list[Value]]:
             sql = f"{(k := [*value.keys()][0])} <= ?"
             values.append(value[k])
         elif key == SELECTOR_IN:
-            sql = f"{(k := [*value.keys()][0])} in " + \
-                  f"({','.join(['?'] * len(vs if isinstance(vs := value[k], list) else [vs]))})"
-            values.extend(vs)
+            vs = vs if isinstance(vs := value[(k := [*value.keys()][0])], (list, tuple, set)) else [vs]
+            if len(vs) > IN_PARAMETERS_LIMIT and all(isinstance(v, (str, int, float)) for v in vs):
+                sql = f"{k} in (select value from json_each(?))"
+                values.append(dumps(list(vs)))
+            else:
+                sql = f"{k} in ({','.join(['?'] * len(vs))})"
+                values.extend(vs)
         elif key == SELECTOR_INSTR:
             sql = f"instr({(k := [*value.keys()][0])}, ?)"
             values.append(value[k])
@@ -84,6 +124,34 @@ def selector_to_sql(selector: Selector) -> tuple[str, list[Value]]:
             assert isinstance((v := value[(k := [*value.keys()][0])]), str)
             sql = f"{k} like ?" if key == SELECTOR_LIKE else f"{k} glob ?"
             values.append(v)
+        elif key == SELECTOR_DATE_RANGE:
+            assert isinstance((v := value[(k := [*value.keys()][0])]), (list, tuple)) and len(v) == 2
+            sql = " and ".join([f"{date_epoch_sql(k)} {op} ?" for op, d in zip((">=", "<"), v) if d is not None]
+                               or ["1"])
+            values.extend(date_to_epoch(d) for d in v if d is not None)
+        elif key == SELECTOR_MONTH:
+            vs = vs if isinstance(vs := value[(k := [*value.keys()][0])], (list, tuple, set)) else [vs]
+            sql = " or ".join(f"{date_month_sql(k)} between ? and ?" if len(m) == 4 else f"{date_month_sql(k)} = ?"
+                              for m in vs)
+            sql = f"({sql})" if len(vs) > 1 else sql
+            values.extend(v for m in vs for v in ([f"{m}-01", f"{m}-12"] if len(m) == 4 else [m]))
+        elif key == SELECTOR_ALIASES:
+            vs = vs if isinstance(vs := value[(k := [*value.keys()][0])], (list, tuple, set)) else [vs]
+            # Bar-separated lists are matched element by element, single usernames after cleaning
+            sql = f"case when substr({k}, 1, 1) = '|' then exists (select 1 from ({aliases_sql()})" \
+                  f" where instr({k}, '|' || {AllUsernamesColumns.USERNAME.name} || '|'))" \
+                  f" else clean_username({k}) in ({aliases_sql()}) end"
+            values.extend([dumps(names := [clean_username(v) for v in vs]), dumps(names)] * 2)
+        elif key == SELECTOR_REGEX:
+            assert isinstance((v := value[(k := [*value.keys()][0])]), str)
+            sql = f"{k} regexp ?"
+            values.append(v)
+        elif key == SELECTOR_HAS:
+            # Bar-separated lists contain every element as |element|, so a native instr is enough to match elements
+            vs = vs if isinstance(vs := value[(k := [*value.keys()][0])], (list, tuple, set)) else [vs]
+            sql = " and ".join(f"instr({k}, ?) > 0" for _ in vs)
+            sql = f"({sql})" if len(vs) > 1 else sql
+            values.extend(f"|{v}|" for v in vs)
 
     return sql, values
 
@@ -133,3 +201,18 @@ class SelectorBuilder:
 
     def __mul__(self, value: Value) -> Selector:  # GLOB
         return {SELECTOR_GLOB: {self.field: value}}
+
+    def date_range(self, start: datetime | str | int | None, end: datetime | str | int | None) -> Selector:
+        return {SELECTOR_DATE_RANGE: {self.field: [start, end]}}
+
+    def month(self, value: str | list[str]) -> Selector:
+        return {SELECTOR_MONTH: {self.field: value}}
+
+    def aliases(self, value: str | list[str]) -> Selector:
+        return {SELECTOR_ALIASES: {self.field: value}}
+
+    def regex(self, pattern: str) -> Selector:
+        return {SELECTOR_REGEX: {self.field: pattern}}
+
+    def has(self, value: Value | list[Value]) -> Selector:
+        return {SELECTOR_HAS: {self.field: value}}
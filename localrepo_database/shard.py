@@ -0,0 +1,310 @@
+from heapq import merge
+from itertools import chain
+from itertools import islice
+from pathlib import Path
+from re import match
+from typing import Any
+from typing import Callable
+from typing import Generator
+from typing import Iterable
+
+from .database import Cursor
+from .database import Database
+from .database import HistoryTable
+from .database import SettingsTable
+from .database import Table
+from .database import UsersTable
+from .selector import Selector
+from .tables import CommentsColumns
+from .tables import JournalsColumns
+from .tables import SubmissionsColumns
+from .types import Value
+
+__all__ = [
+    "FederatedCursor",
+    "FederatedTable",
+    "ShardedTable",
+    "FederatedDatabase",
+    "ShardedDatabase",
+]
+
+
+class _Descending:
+    def __init__(self, value: Any):
+        self.value: Any = value
+
+    def __lt__(self, other: '_Descending') -> bool:
+        return other.value < self.value
+
+    def __eq__(self, other: '_Descending') -> bool:
+        return self.value == other.value
+
+
+def _order_terms(order: list[str]) -> list[tuple[str, bool]]:
+    terms: list[tuple[str, bool]] = []
+    for term in order:
+        if not (m := match(r"^\s*(\w+)(?:\s+(asc|desc))?\s*$", term.lower())):
+            raise ValueError(f"Unsupported order term for federated select: {term!r}")
+        terms.append((m[1].upper(), m[2] == "desc"))
+    return terms
+
+
+def _order_columns(columns: list[str] | None, order: list[str] | None) -> list[str] | None:
+    # Shards are merged on the order columns, so they are selected even when they are not requested
+    if not columns or not order:
+        return columns
+    names: set[str] = {c.upper() for c in columns}
+    return [*columns, *dict.fromkeys(n for n, _ in _order_terms(order) if n not in names)]
+
+
+def _order_key(order: list[str]) -> Callable[[dict[str, Value]], tuple]:
+    terms: list[tuple[str, bool]] = _order_terms(order)
+
+    def key(entry: dict[str, Value]) -> tuple:
+        values: dict[str, Value] = {k.upper(): v for k, v in entry.items()}
+        return tuple(_Descending((v is not None, v)) if desc else (v is not None, v)
+                     for name, desc in terms for v in [values[name]])
+
+    return key
+
+
+class FederatedCursor:
+    def __init__(self, cursors: list[Cursor], order: list[str] = None, limit: int = 0, offset: int = 0, *,
+                 columns: list[str] = None):
+        self.cursors: list[Cursor] = cursors
+        self.order: list[str] = order or []
+        self.limit: int = limit
+        self.offset: int = offset
+        self.columns: list[str] | None = columns
+
+    def __next__(self) -> dict[str, Value]:
+        return next(self.entries)
+
+    def __iter__(self) -> Generator[dict[str, Value], None, None]:
+        return self.entries
+
+    @property
+    def entries(self) -> Generator[dict[str, Value], None, None]:
+        if self.order:
+            entries: Iterable[dict[str, Value]] = merge(*(c.entries for c in self.cursors),
+                                                        key=_order_key(self.order))
+        else:
+            entries = chain.from_iterable(c.entries for c in self.cursors)
+        if self.limit > 0:
+            entries = islice(entries, self.offset, self.offset + self.limit)
+        if self.columns and self.order:
+            names: set[str] = {c.upper() for c in self.columns}
+            return ({k: v for k, v in e.items() if k.upper() in names} for e in entries)
+        return (e for e in entries)
+
+    def fetchone(self) -> dict[str, Value] | None:
+        return next(self.entries, None)
+
+    def fetchall(self) -> list[dict[str, Value]]:
+        return list(self.entries)
+
+
+class FederatedTable:
+    def __init__(self, attribute: str, databases: Callable[[], list[Database]]):
+        self.attribute: str = attribute
+        self._databases: Callable[[], list[Database]] = databases
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.attribute!r}, tables={len(self.tables)})"
+
+    def __len__(self) -> int:
+        return sum(len(t) for t in self.tables)
+
+    def __contains__(self, key: Value) -> bool:
+        return any(key in t for t in self.tables)
+
+    def __getitem__(self, key: Value | list[Value] | tuple[Value]
+                    ) -> dict[str, Value] | list[dict[str, Value]] | None:
+        if isinstance(key, (dict, list, tuple)):
+            return [e for t in self.tables for e in t[key]]
+        return next(filter(None, (t[key] for t in self.tables)), None)
+
+    def __iter__(self) -> Generator[dict[str, Value], None, None]:
+        return (e for t in self.tables for e in t)
+
+    @property
+    def tables(self) -> list[Table]:
+        return [getattr(db, self.attribute) for db in self._databases()]
+
+    def select(self, query: Selector = None, columns: list[str] = None, order: list[str] = None, limit: int = 0,
+               offset: int = 0) -> FederatedCursor:
+        return FederatedCursor([t.select(query, _order_columns(columns, order), order,
+                                         limit + offset if limit > 0 else 0)
+                                for t in self.tables], order, limit, offset, columns=columns)
+
+    def select_query(self, query: str, columns: list[str] = None, default_field: str = None,
+                     likes: list[str] = None, aliases: dict[str, str] = None, order: list[str] = None, limit: int = 0,
+                     offset: int = 0) -> FederatedCursor:
+        return FederatedCursor([t.select_query(query, _order_columns(columns, order), default_field, likes, aliases,
+                                               order, limit + offset if limit > 0 else 0)
+                                for t in self.tables], order, limit, offset, columns=columns)
+
+
+class ShardedTable(FederatedTable):
+    def __init__(self, attribute: str, databases: Callable[[], list[Database]],
+                 shard: Callable[[int, bool], Database | None], route_column: str, key_column: str = None):
+        super().__init__(attribute, databases)
+        self._shard: Callable[[int, bool], Database | None] = shard
+        self.route_column: str = route_column
+        self.routes_keys: bool = key_column is None or key_column == route_column
+
+    def __contains__(self, key: int) -> bool:
+        if not self.routes_keys:
+            return super().__contains__(key)
+        return (table := self.route(key, create=False)) is not None and key in table
+
+    def __getitem__(self, key: int | list[int] | tuple[int]) -> dict[str, Value] | list[dict[str, Value]] | None:
+        if not self.routes_keys or isinstance(key, dict):
+            return super().__getitem__(key)
+        elif isinstance(key, (list, tuple)):
+            entries: dict[int, list[dict[str, Value]]] = {}
+            for table, keys in self._group(key).items():
+                for entry in table[keys]:
+                    entries.setdefault(entry[table.key.name], []).append(entry)
+            return [e for k in dict.fromkeys(key) for e in entries.get(k, [])]
+        return table[key] if (table := self.route(key, create=False)) is not None else None
+
+    def __delitem__(self, key: int | list[int] | tuple[int]):
+        if not self.routes_keys:
+            for table in self.tables:
+                del table[key]
+            return
+        for table, keys in self._group(key if isinstance(key, (list, tuple)) else [key]).items():
+            del table[keys]
+
+    def _group(self, keys: Iterable[int]) -> dict[Table, list[int]]:
+        groups: dict[Table, list[int]] = {}
+        for key in keys:
+            if (table := self.route(key, create=False)) is not None:
+                groups.setdefault(table, []).append(key)
+        return groups
+
+    def route(self, key: int, *, create: bool = True) -> Table | None:
+        return getattr(db, self.attribute) if (db := self._shard(int(key), create)) is not None else None
+
+    def save(self, entry: dict[str, Any], *args, **kwargs):
+        table: Table = self.route(entry[self.route_column])
+        getattr(table, f"save_{self.attribute.removesuffix('s')}")(entry, *args, **kwargs)
+
+
+class FederatedDatabase:
+    def __init__(self, *paths: str | Path, check_connections: bool = False):
+        self.databases: list[Database] = [Database(p, read_only=True, check_connections=check_connections)
+                                          for p in paths]
+        self.users: FederatedTable = FederatedTable("users", lambda: self.databases)
+        self.submissions: FederatedTable = FederatedTable("submissions", lambda: self.databases)
+        self.journals: FederatedTable = FederatedTable("journals", lambda: self.databases)
+        self.comments: FederatedTable = FederatedTable("comments", lambda: self.databases)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _exc_type, _exc_val, _exc_tb):
+        self.close()
+
+    def mount(self, path: str | Path, *, check_connections: bool = False) -> Database:
+        self.databases.append(db := Database(path, read_only=True, check_connections=check_connections))
+        return db
+
+    def unmount(self, path: str | Path):
+        path = Path(path).resolve()
+        for db in [db for db in self.databases if db.path == path]:
+            self.databases.remove(db)
+            db.close()
+
+    def close(self):
+        for db in self.databases:
+            db.close()
+
+
+class ShardedDatabase:
+    shard_size_setting: str = "SHARDSIZE"
+    core_name: str = "core.db"
+    shard_name: str = "shard-{:04d}.db"
+
+    def __init__(self, folder: str | Path, *, shard_size: int = 10_000_000, init: bool = False,
+                 check_connections: bool = True, read_only: bool = False, autocommit: bool = False):
+        self.folder: Path = Path(folder).resolve()
+        self.read_only: bool = read_only
+        self.autocommit: bool = autocommit
+        self.check_connections: bool = check_connections
+
+        if init:
+            self.folder.mkdir(parents=True, exist_ok=True)
+
+        self.core: Database = self._open(self.folder / self.core_name, init)
+        if (size := self.core.settings[self.shard_size_setting]) is None:
+            if not read_only:
+                self.core.settings[self.shard_size_setting] = str(shard_size)
+        else:
+            shard_size = int(size)
+        self.shard_size: int = shard_size
+
+        self.shards: dict[int, Database] = {}
+        for path in sorted(self.folder.glob(self.shard_name.replace("{:04d}", "[0-9]*"))):
+            if m := match(r"^shard-(\d+)\.db$", path.name):
+                self.shards[int(m[1])] = self._open(path, False)
+
+        self.users: UsersTable = self.core.users
+        self.settings: SettingsTable = self.core.settings
+        self.history: HistoryTable = self.core.history
+        self.submissions: ShardedTable = ShardedTable("submissions", self._shard_list, self.shard,
+                                                      SubmissionsColumns.ID.name)
+        self.journals: ShardedTable = ShardedTable("journals", self._shard_list, self.shard,
+                                                   JournalsColumns.ID.name)
+        self.comments: ShardedTable = ShardedTable("comments", self._shard_list, self.shard,
+                                                   CommentsColumns.PARENT_ID.name, CommentsColumns.ID.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _exc_type, _exc_val, _exc_tb):
+        self.close()
+
+    def _open(self, path: Path, init: bool) -> Database:
+        return Database(path, init=init, check_connections=self.check_connections, read_only=self.read_only,
+                        autocommit=self.autocommit)
+
+    def _shard_list(self) -> list[Database]:
+        return [self.shards[n] for n in sorted(self.shards)]
+
+    @property
+    def databases(self) -> list[Database]:
+        return [self.core, *self._shard_list()]
+
+    def shard_number(self, id_: int) -> int:
+        return (id_ - 1) // self.shard_size
+
+    def shard(self, id_: int, create: bool = True) -> Database | None:
+        if (db := self.shards.get(n := self.shard_number(id_))) is None and create and not self.read_only:
+            db = self.shards[n] = self._open(self.folder / self.shard_name.format(n), True)
+            db.settings.files_folder = self.core.settings.files_folder
+            db.settings.bbcode = self.core.settings.bbcode
+        return db
+
+    def get_comments(self, parent_table: str, parent_id: int) -> list[dict]:
+        db: Database | None = self.shard(parent_id, create=False)
+        return db.comments.get_comments(parent_table, parent_id) if db else []
+
+    def get_comments_tree(self, parent_table: str, parent_id: int) -> list[dict]:
+        db: Database | None = self.shard(parent_id, create=False)
+        return db.comments.get_comments_tree(parent_table, parent_id) if db else []
+
+    def commit(self):
+        for db in self.databases:
+            db.commit()
+
+    def rollback(self):
+        # Rolling back an idle database raises, which would leave the pending writes of the following shards
+        for db in self.databases:
+            if db.connection.in_transaction:
+                db.rollback()
+
+    def close(self):
+        for db in self.databases:
+            db.close()
@@ -0,0 +1,87 @@
+from functools import lru_cache
+from hashlib import blake2b
+from random import Random
+from re import compile as re_compile
+from re import Pattern
+from struct import pack
+from struct import unpack
+from types import ModuleType
+from typing import Iterable
+from zlib import crc32
+
+__all__ = [
+    "features",
+    "MinHash",
+]
+
+_prime: int = (1 << 61) - 1
+_mask32: int = (1 << 32) - 1
+_mask64: int = (1 << 64) - 1
+_markup: Pattern = re_compile(r"<[^>]*>|\[[^]]*]|&\w+;")
+_word: Pattern = re_compile(r"\w+")
+
+
+@lru_cache(maxsize=None)
+def _numpy() -> ModuleType | None:
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def features(tags: Iterable[str], text: str | None, shingle_size: int = 3) -> set[str]:
+    words: list[str] = _word.findall(_markup.sub(" ", text or "").lower())
+    return {f"t:{t.lower()}" for t in tags if t} | \
+        {"d:" + " ".join(words[i:i + shingle_size]) for i in range(max(1, len(words) - shingle_size + 1)) if words}
+
+
+class MinHash:
+    def __init__(self, num_perm: int = 128, bands: int = 32, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm {num_perm} is not a multiple of bands {bands}")
+        self.num_perm: int = num_perm
+        self.bands: int = bands
+        self.rows: int = num_perm // bands
+        random: Random = Random(seed)
+        self.a: list[int] = [random.randrange(1, _prime) for _ in range(num_perm)]
+        self.b: list[int] = [random.randrange(0, _prime) for _ in range(num_perm)]
+        self._arrays: tuple | None = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(num_perm={self.num_perm}, bands={self.bands})"
+
+    @staticmethod
+    def hash(feature: str) -> int:
+        return crc32(feature.encode())
+
+    def signature(self, features_: Iterable[str]) -> bytes | None:
+        if not (hashes := [self.hash(f) for f in features_]):
+            return None
+        if (np := _numpy()) is not None:
+            # uint64 products wrap around like the masked pure Python version below, so both give the same signatures
+            if self._arrays is None:
+                self._arrays = np.array(self.a, dtype=np.uint64), np.array(self.b, dtype=np.uint64)
+            a, b = self._arrays
+            permuted = (np.array(hashes, dtype=np.uint64)[:, None] * a + b) % np.uint64(_prime) & np.uint64(_mask32)
+            return permuted.min(axis=0).astype("<u4").tobytes()
+        return pack(f"<{self.num_perm}I", *(min((((h * a) + b) & _mask64) % _prime & _mask32 for h in hashes)
+                                            for a, b in zip(self.a, self.b)))
+
+    def unpack(self, signature: bytes) -> tuple[int, ...]:
+        return unpack(f"<{self.num_perm}I", signature)
+
+    def buckets(self, signature: bytes) -> list[tuple[int, int]]:
+        size: int = self.rows * 4
+        return [(band, int.from_bytes(blake2b(signature[band * size:(band + 1) * size], digest_size=8).digest(),
+                                      "little", signed=True))
+                for band in range(self.bands)]
+
+    def similarities(self, signature: bytes, others: list[bytes]) -> list[float]:
+        if not others:
+            return []
+        if (np := _numpy()) is not None:
+            matrix = np.frombuffer(b"".join(others), dtype="<u4").reshape(len(others), self.num_perm)
+            return (matrix == np.frombuffer(signature, dtype="<u4")).mean(axis=1).tolist()
+        values: tuple[int, ...] = self.unpack(signature)
+        return [sum(x == y for x, y in zip(values, self.unpack(o))) / self.num_perm for o in others]
@@ -1,4 +1,7 @@
 from datetime import datetime
+from json import dumps
+from json import loads
+from typing import Any
 
 from .column import Column
 from .column import parse_list
@@ -6,17 +9,35 @@ from .util import clean_username
 
 __all__ = [
     "users_table",
+    "current_usernames_table",
+    "all_usernames_table",
     "submissions_table",
     "journals_table",
     "comments_table",
     "settings_table",
     "history_table",
+    "files_table",
+    "changes_table",
+    "sync_table",
+    "codes_table",
+    "user_stats_table",
+    "similarity_table",
+    "similarity_buckets_table",
     "UsersColumns",
+    "CurrentUsernamesColumns",
+    "AllUsernamesColumns",
     "SubmissionsColumns",
     "JournalsColumns",
     "CommentsColumns",
     "SettingsColumns",
     "HistoryColumns",
+    "FilesColumns",
+    "ChangesColumns",
+    "SyncColumns",
+    "CodesColumns",
+    "UserStatsColumns",
+    "SimilarityColumns",
+    "SimilarityBucketsColumns",
 ]
 
 users_table: str = "USERS"
@@ -27,6 +48,13 @@ journals_table: str = "JOURNALS"
 comments_table: str = "COMMENTS"
 settings_table: str = "SETTINGS"
 history_table: str = "HISTORY"
+files_table: str = "FILES"
+changes_table: str = "CHANGES"
+sync_table: str = "SYNC"
+codes_table: str = "CODES"
+user_stats_table: str = "USER_STATS"
+similarity_table: str = "SIMILARITY"
+similarity_buckets_table: str = "SIMILARITY_BUCKETS"
 
 
 class Columns:
@@ -43,14 +71,15 @@ class UsersColumns(Columns):
     USERPAGE: Column = Column("USERPAGE", str, to_entry=str.strip)
 
 class CurrentUsernamesColumns(Columns):
-    USER_ID = Column("ID", int, unique=True, key=True, check="{name} > 0")
+    USER_ID: Column = Column("USER_ID", int, unique=True, key=True, check="{name} > 0")
     USERNAME: Column = Column("USERNAME", str, unique=True, check="length({name}) > 0",
                               to_entry=clean_username)
 
+
 class AllUsernamesColumns(Columns):
     USERNAME: Column = Column("USERNAME", str, unique=True, key=True, check="length({name}) > 0",
                               to_entry=clean_username)
-    USER_ID = Column("ID", int, check="{name} > 0")
+    USER_ID: Column = Column("USER_ID", int, check="{name} > 0")
 
 class SubmissionsColumns(Columns):
     ID: Column = Column("ID", int, unique=True, key=True, check="{name} > 0")
@@ -94,7 +123,7 @@ class CommentsColumns(Columns):
     REPLY_TO: Column = Column("REPLY_TO", int, not_null=False, check="{name} == null or {name} > 0")
     AUTHOR: Column = Column("AUTHOR", str, check="length({name}) > 0")
     DATE: Column = Column("DATE", datetime, to_entry=lambda v: v.strftime("%Y-%m-%dT%H:%M:%S"),
-                          from_entry=lambda v: datetime.strptime(v, "%Y-%m-%dT%H:%M:%S"))
+                          from_entry=datetime.fromisoformat)
     TEXT: Column = Column("TEXT", str)
 
 
@@ -106,5 +135,53 @@ class SettingsColumns(Columns):
 class HistoryColumns(Columns):
     TIME: Column = Column("TIME", datetime, unique=True, key=True,
                           to_entry=lambda v: v.strftime("%Y-%m-%dT%H:%M:%S.%f"),
-                          from_entry=lambda v: datetime.strptime(v, "%Y-%m-%dT%H:%M:%S.%f"))
+                          from_entry=datetime.fromisoformat)
     EVENT: Column = Column("EVENT", str)
+
+
+class FilesColumns(Columns):
+    SUBMISSION_ID: Column = Column("SUBMISSION_ID", int, key=True, check="{name} > 0")
+    NAME: Column = Column("NAME", str, key=True, check="length({name}) > 0")
+    HASH: Column = Column("HASH", str, check="length({name}) = 64")
+    SIZE: Column = Column("SIZE", int, check="{name} >= 0")
+
+
+class ChangesColumns(Columns):
+    SEQ: Column = Column("SEQ", int, key=True)
+    TABLE_NAME: Column = Column("TABLE_NAME", str, check="length({name}) > 0")
+    KEY: Column = Column("KEY", list, to_entry=dumps, from_entry=loads)
+    OP: Column = Column("OP", str, check="{name} in ('insert', 'update', 'delete')")
+
+
+class SyncColumns(Columns):
+    SOURCE: Column = Column("SOURCE", str, unique=True, key=True, check="length({name}) > 0")
+    SEQ: Column = Column("SEQ", int, check="{name} >= 0")
+
+
+class CodesColumns(Columns):
+    COLUMN_NAME: Column = Column("COLUMN_NAME", str, key=True, check="length({name}) > 0")
+    CODE: Column = Column("CODE", int, key=True, check="{name} > 0")
+    VALUE: Column = Column("VALUE", str)
+
+
+class UserStatsColumns(Columns):
+    USERNAME: Column = Column("USERNAME", str, unique=True, key=True, check="length({name}) > 0",
+                              to_entry=clean_username)
+    SUBMISSIONS: Column = Column("SUBMISSIONS", int, default=0)
+    JOURNALS: Column = Column("JOURNALS", int, default=0)
+    FAVORITES: Column = Column("FAVORITES", int, default=0)
+    MENTIONS: Column = Column("MENTIONS", int, default=0)
+    SAVED: Column = Column("SAVED", int, default=0)
+    LAST_SUBMISSION: Column = Column("LAST_SUBMISSION", datetime, not_null=False, default=None)
+    LAST_JOURNAL: Column = Column("LAST_JOURNAL", datetime, not_null=False, default=None)
+
+
+class SimilarityColumns(Columns):
+    ID: Column = Column("ID", int, unique=True, key=True, check="{name} > 0")
+    SIGNATURE: Column = Column("SIGNATURE", Any, sql_type="blob")
+
+
+class SimilarityBucketsColumns(Columns):
+    BAND: Column = Column("BAND", int, key=True)
+    BUCKET: Column = Column("BUCKET", int, key=True)
+    ID: Column = Column("ID", int, key=True)
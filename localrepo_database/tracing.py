@@ -0,0 +1,238 @@
+from collections import deque
+from math import ceil
+from re import compile as re_compile
+from re import Pattern
+from sqlite3 import Cursor as SQLCursor
+from sqlite3 import DatabaseError
+from time import perf_counter
+from typing import Any
+from typing import Callable
+from typing import Iterable
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .database import Database
+
+__all__ = [
+    "QueryEvent",
+    "QueryHook",
+    "QueryStats",
+    "SlowQueryLog",
+    "statement_shape",
+    "trace_execute",
+    "trace_executemany",
+]
+
+_string_literal: Pattern = re_compile(r"'(?:[^']|'')*'")
+_number_literal: Pattern = re_compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_parameters_list: Pattern = re_compile(r"\?(?:\s*,\s*\?)+")
+_whitespace: Pattern = re_compile(r"\s+")
+
+
+def statement_shape(sql: str) -> str:
+    sql = _string_literal.sub("?", sql)
+    sql = _number_literal.sub("?", sql)
+    sql = _parameters_list.sub("?,...", sql)
+    return _whitespace.sub(" ", sql).strip()
+
+
+class QueryEvent:
+    def __init__(self, database: 'Database', sql: str, parameters: list[Any] | dict[str, Any], duration: float,
+                 rows: int, table: str | None):
+        self.database: Database = database
+        self.sql: str = sql
+        self.parameters: list[Any] | dict[str, Any] = parameters
+        self.duration: float = duration
+        self.rows: int = rows
+        self.table: str | None = table
+        self.plan: list[str] | None = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.sql!r}, duration={self.duration:.6f}, rows={self.rows})"
+
+    @property
+    def shape(self) -> str:
+        return statement_shape(self.sql)
+
+    def explain(self) -> list[str]:
+        try:
+            return [detail for *_, detail in
+                    self.database.connection.execute(f"EXPLAIN QUERY PLAN {self.sql}", self.parameters)]
+        except DatabaseError:
+            return []
+
+
+QueryHook = Callable[[QueryEvent], Any]
+
+
+class _TracedCursor:
+    def __init__(self, cursor: SQLCursor, finish: Callable[[float, int], None], duration: float):
+        self.cursor: SQLCursor = cursor
+        self.duration: float = duration
+        self.rows: int = 0
+        self._finish: Callable[[float, int], None] | None = finish
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> tuple:
+        start: float = perf_counter()
+        try:
+            row: tuple = next(self.cursor)
+        except StopIteration:
+            self.duration += perf_counter() - start
+            self.finish()
+            raise
+        self.duration += perf_counter() - start
+        self.rows += 1
+        return row
+
+    def __getattr__(self, item: str):
+        return getattr(self.cursor, item)
+
+    def __del__(self):
+        # Cursors that are dropped before being exhausted are finished here, hook errors are reported by Python as
+        # unraisable exceptions since they cannot propagate out of __del__
+        self.finish()
+
+    def fetchone(self) -> tuple | None:
+        # Most single row reads never exhaust the cursor, so the event is emitted after the first row
+        row: tuple | None = next(self, None)
+        self.finish()
+        return row
+
+    def fetchmany(self, size: int = None) -> list[tuple]:
+        start: float = perf_counter()
+        rows: list[tuple] = self.cursor.fetchmany(self.cursor.arraysize if size is None else size)
+        self.duration += perf_counter() - start
+        self.rows += len(rows)
+        if not rows:
+            self.finish()
+        return rows
+
+    def fetchall(self) -> list[tuple]:
+        start: float = perf_counter()
+        rows: list[tuple] = self.cursor.fetchall()
+        self.duration += perf_counter() - start
+        self.rows += len(rows)
+        self.finish()
+        return rows
+
+    def close(self):
+        self.finish()
+        self.cursor.close()
+
+    def finish(self):
+        if self._finish is not None:
+            finish, self._finish = self._finish, None
+            finish(self.duration, self.rows)
+
+
+def trace_execute(database: 'Database', sql: str, parameters: list[Any] | dict[str, Any], table: str | None
+                  ) -> SQLCursor | _TracedCursor:
+    def finish(duration: float, rows: int):
+        event: QueryEvent = QueryEvent(database, sql, parameters, duration, rows, table)
+        for hook in list(database.hooks):
+            hook(event)
+
+    start: float = perf_counter()
+    cursor: SQLCursor = database.connection.execute(sql, parameters)
+    duration: float = perf_counter() - start
+
+    if cursor.description is None:
+        finish(duration, max(cursor.rowcount, 0))
+        return cursor
+
+    return _TracedCursor(cursor, finish, duration)
+
+
+def trace_executemany(database: 'Database', sql: str, parameters: Iterable[Iterable[Any]], table: str | None
+                      ) -> SQLCursor:
+    start: float = perf_counter()
+    cursor: SQLCursor = database.connection.executemany(sql, parameters)
+    event: QueryEvent = QueryEvent(database, sql, [], perf_counter() - start, max(cursor.rowcount, 0), table)
+    for hook in list(database.hooks):
+        hook(event)
+    return cursor
+
+
+class ShapeStats:
+    def __init__(self, shape: str, samples: int = 1000):
+        self.shape: str = shape
+        self.count: int = 0
+        self.total: float = 0
+        self.rows: int = 0
+        self.tables: set[str] = set()
+        self.samples: deque[float] = deque(maxlen=samples)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.shape!r}, count={self.count}, total={self.total:.6f})"
+
+    def add(self, event: QueryEvent):
+        self.count += 1
+        self.total += event.duration
+        self.rows += event.rows
+        self.samples.append(event.duration)
+        if event.table:
+            self.tables.add(event.table)
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0
+        samples: list[float] = sorted(self.samples)
+        return samples[max(0, ceil(q * len(samples)) - 1)]
+
+    @property
+    def p50(self) -> float:
+        return self.percentile(.5)
+
+    @property
+    def p99(self) -> float:
+        return self.percentile(.99)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"shape": self.shape, "count": self.count, "total": self.total, "p50": self.p50, "p99": self.p99,
+                "rows": self.rows, "tables": sorted(self.tables)}
+
+
+class QueryStats:
+    def __init__(self, samples: int = 1000):
+        self.samples: int = samples
+        self.shapes: dict[str, ShapeStats] = {}
+
+    def __call__(self, event: QueryEvent):
+        if (stats := self.shapes.get(shape := event.shape)) is None:
+            stats = self.shapes[shape] = ShapeStats(shape, self.samples)
+        stats.add(event)
+
+    def __iter__(self) -> Iterable[ShapeStats]:
+        return iter(sorted(self.shapes.values(), key=lambda s: s.total, reverse=True))
+
+    def dump(self, *, reset: bool = False) -> list[dict[str, Any]]:
+        stats: list[dict[str, Any]] = [s.as_dict() for s in self]
+        if reset:
+            self.reset()
+        return stats
+
+    def reset(self):
+        self.shapes.clear()
+
+
+class SlowQueryLog:
+    def __init__(self, threshold: float = .1, size: int = 100, logger: QueryHook = None, explain: bool = True):
+        self.threshold: float = threshold
+        self.entries: deque[QueryEvent] = deque(maxlen=size)
+        self.logger: QueryHook | None = logger
+        self.explain: bool = explain
+
+    def __call__(self, event: QueryEvent):
+        if event.duration < self.threshold:
+            return
+        if self.explain:
+            event.plan = event.explain()
+        self.entries.append(event)
+        if self.logger is not None:
+            self.logger(event)
+
+    def clear(self):
+        self.entries.clear()
@@ -1,26 +1,31 @@
+from collections import Counter
+from functools import lru_cache
+from mimetypes import guess_type
 from pathlib import Path
 from re import match
-from re import split
 from re import sub
-
-from chardet import detect as detect_encoding
-from filetype import guess_extension as filetype_guess_extension
-from psutil import AccessDenied
-from psutil import NoSuchProcess
-from psutil import Process
-from psutil import process_iter
+from typing import Iterable
+from typing import NamedTuple
+from typing import TYPE_CHECKING
 
 from .__version__ import __version__
 from .exceptions import MultipleConnections
 from .exceptions import VersionError
 
+if TYPE_CHECKING:
+    from psutil import Process
+
 __all__ = [
     "compare_version",
     "find_connections",
     "clean_username",
     "guess_extension",
+    "guess_mime",
     "tiered_path",
+    "hashed_path",
+    "train_dictionary",
     "format_value",
+    "parse_query",
     "query_to_sql",
 ]
 
@@ -53,7 +58,11 @@ def compare_version(version_a: str, *, major: bool = True, minor: bool = True, p
         return VersionError(f"patch version is not latest: {version_a} != {version_b}") if patch else None
 
 
-def find_connections(path: Path, raise_for_limit: bool = False, limit: int = 0) -> list:
+def find_connections(path: Path, raise_for_limit: bool = False, limit: int = 0) -> list['Process']:
+    from psutil import AccessDenied
+    from psutil import NoSuchProcess
+    from psutil import process_iter
+
     ps: list[Process] = []
     path_: str = str(path.resolve())
     for process in process_iter():
@@ -72,6 +81,8 @@ def clean_username(username: str) -> str:
 
 
 def check_plain_text(file: bytes) -> bool:
+    from chardet import detect as detect_encoding
+
     result: dict = detect_encoding(file[:2048])
     if str(result.get("encoding", "") or "").upper() in _encodings and result.get("confidence", 0) > .9:
         return True
@@ -80,6 +91,8 @@ def check_plain_text(file: bytes) -> bool:
 
 
 def guess_extension(file: bytes | None, default: str = "") -> str:
+    from filetype import guess_extension as filetype_guess_extension
+
     if (default := default.lower()) == "jpg":
         default = "jpeg"
 
@@ -93,6 +106,17 @@ def guess_extension(file: bytes | None, default: str = "") -> str:
         return ext
 
 
+def guess_mime(file: Path, default: str = "application/octet-stream") -> str:
+    from filetype import guess_mime as filetype_guess_mime
+
+    if (mime := filetype_guess_mime(file)) is not None:
+        return str(mime)
+    elif (mime := guess_type(file.name)[0]) is not None:
+        return mime
+    with file.open("rb") as f:
+        return "text/plain" if check_plain_text(f.read(2048)) else default
+
+
 def tiered_path(id_: int | str, depth: int = 5, width: int = 2) -> Path:
     assert isinstance(id_, int) or (isinstance(id_, str) and id_.isdigit()), "id not an integer"
     assert isinstance(depth, int) and depth > 0, "depth must be greater than 0"
@@ -102,6 +126,31 @@ def tiered_path(id_: int | str, depth: int = 5, width: int = 2) -> Path:
     return Path(*[id_str[n:n + width] for n in range(0, depth * width, width)])
 
 
+def hashed_path(digest: str, depth: int = 2, width: int = 2) -> Path:
+    assert isinstance(digest, str) and len(digest) > depth * width, "digest too short"
+
+    return Path(*[digest[n:n + width] for n in range(0, depth * width, width)], digest)
+
+
+def train_dictionary(texts: Iterable[str], size: int = 32768, phrase_words: int = 3) -> bytes:
+    counts: Counter[str] = Counter()
+    for text in texts:
+        words: list[str] = text.split(" ")
+        counts.update(" ".join(words[i:i + phrase_words]) for i in range(len(words) - phrase_words + 1))
+
+    selected: list[bytes] = []
+    total: int = 0
+    for phrase, n in sorted(counts.items(), key=lambda pn: pn[1] * len(pn[0]), reverse=True):
+        if n < 2 or total >= size:
+            break
+        elif total + len(phrase_bytes := phrase.encode() + b" ") <= size:
+            selected.append(phrase_bytes)
+            total += len(phrase_bytes)
+
+    # zlib finds matches closer to the end of the dictionary with shorter distances, so the most useful phrases go last
+    return b"".join(reversed(selected))
+
+
 def format_value(value: str, *, like: bool = False) -> str:
     value = sub(r"(?<!\\)((?:\\\\)+)?([%_^$])", r"\1\\\2", m.group(1)) if (m := match(r'^"(.*)"$', value)) else value
     value = value.lstrip("^") if match(r"^[%^].*", value) else "%" + value if like else value
@@ -109,37 +158,143 @@ def format_value(value: str, *, like: bool = False) -> str:
     return value
 
 
+_operators: str = "&|"
+_parentheses: str = "()"
+
+
+class QueryToken(NamedTuple):
+    kind: str
+    value: str
+    negated: bool = False
+
+
+def _trim_query(query: str) -> str:
+    # Remove leading operators and spaces, and trailing unescaped operators and spaces (ignoring a final newline)
+    start: int = 0
+    while start < len(query) and query[start] in "&| ":
+        start += 1
+    end: int = len(query) - 1 if query.endswith("\n") else len(query)
+    trail: int = end
+    while trail > start and (query[trail - 1] == " " or (
+            query[trail - 1] in _operators and (trail < 2 or query[trail - 2] != "\\"))):
+        trail -= 1
+    query = query[start:trail] + query[end:]
+
+    # Remove sequences of operators that are followed by another operator and a field or parenthesis
+    trimmed: list[str] = []
+    i: int = 0
+    while i < len(query):
+        if query[i] not in "&| ":
+            trimmed.append(query[i])
+            i += 1
+            continue
+        groups: list[int] = []
+        j: int = i
+        while True:
+            while j < len(query) and query[j] == " ":
+                j += 1
+            if j < len(query) and query[j] in _operators:
+                groups.append(j := j + 1)
+            else:
+                break
+        if len(groups) >= 2 and j < len(query) and query[j] in "@()":
+            i = groups[-2]
+        elif groups:
+            trimmed.append(query[i:groups[-1]])
+            i = groups[-1]
+        else:
+            trimmed.append(query[i])
+            i += 1
+
+    return "".join(trimmed)
+
+
+def _split_query(query: str) -> list[str]:
+    elements: list[str] = []
+    word_start: int = 0
+    i: int = 0
+
+    def add(element: str):
+        if element := element.strip():
+            elements.append(element)
+
+    while i < len(query):
+        c: str = query[i]
+        escaped: bool = i > 0 and query[i - 1] == "\\"
+        end: int = -1
+        if not escaped and (c == '"' or (c == "!" and query[i + 1:i + 2] == '"')):
+            body: int = i + 1 + (c == "!")
+            j: int = body
+            while j < len(query) and (query[j] != '"' or query[j - 1] == "\\"):
+                j += 1
+            if j < len(query):
+                end = j + 1
+            elif (j := query.rfind('"', body)) >= 0:
+                end = j + 1
+        elif not escaped and (c in _operators or c in _parentheses):
+            end = i + 1
+        elif c == " ":
+            end = i + 1
+            while end < len(query) and query[end] == " ":
+                end += 1
+        if end < 0:
+            i += 1
+            continue
+        add(query[word_start:i])
+        add(query[i:end])
+        word_start = i = end
+
+    add(query[word_start:])
+
+    return elements
+
+
+@lru_cache(maxsize=1024)
+def parse_query(query: str) -> tuple[QueryToken, ...]:
+    tokens: list[QueryToken] = []
+    for elem in _split_query(_trim_query(query)):
+        if elem[0] == "@" and len(elem) > 1 and all(c == "_" or c.isalnum() for c in elem[1:]):
+            tokens.append(QueryToken("field", elem[1:].lower()))
+        elif elem in _operators:
+            tokens.append(QueryToken("operator", "and" if elem == "&" else "or"))
+        elif elem in _parentheses:
+            tokens.append(QueryToken("parenthesis", elem))
+        elif value := elem.removeprefix("!"):
+            tokens.append(QueryToken("value", value, elem.startswith("!")))
+    return tuple(tokens)
+
+
+@lru_cache(maxsize=4096)
+def _compile_query(query: str, default_field: str, likes: tuple[str, ...], aliases: tuple[tuple[str, str], ...]
+                   ) -> tuple[tuple[str, ...], tuple[str, ...]]:
+    aliases_: dict[str, str] = dict(aliases)
+    elements: list[str] = []
+    values: list[str] = []
+
+    field, prev = default_field, None
+    for token in parse_query(query):
+        if token.kind == "field":
+            field = token.value
+            continue
+        elif token.kind == "operator":
+            elements.append(token.value)
+        elif token.kind == "parenthesis":
+            elements.append("and") if token.value == "(" and prev in ("value", ")") else None
+            elements.append(token.value)
+        else:
+            elements.append("and") if prev in ("value", ")") else None
+            elements.append(f"({aliases_.get(field, field)}{' not' * token.negated} like ? escape '\\')")
+            values.append(format_value(token.value, like=field in likes))
+        prev = token.value if token.kind == "parenthesis" else token.kind
+
+    return tuple(elements), tuple(values)
+
+
 def query_to_sql(query: str, default_field: str, likes: list[str] = None, aliases: dict[str, str] = None
                  ) -> tuple[list[str], list[str]]:
     if not query:
         return [], []
 
-    likes, aliases = likes or [], aliases or {}
-    elements: list[str] = []
-    values: list[str] = []
+    elements, values = _compile_query(query, default_field, tuple(likes or []), tuple((aliases or {}).items()))
 
-    query = sub(r"(^[&| ]+|((?<!\\)[&|]| )+$)", "", query)
-    query = sub(r"( *[&|])+(?= *[&|] *[@()])", "", query)
-
-    field, prev = default_field, ""
-    for elem in filter(bool, map(str.strip, split(r'((?<!\\)(?:"|!")(?:[^"]|(?<=\\)")*"|(?<!\\)[()&|]| +)', query))):
-        if m := match(r"^@(\w+)$", elem):
-            field = m.group(1).lower()
-            continue
-        elif elem == "&":
-            elements.append("and")
-        elif elem == "|":
-            elements.append("or")
-        elif elem in ("(", ")"):
-            elements.append("and") if elem == "(" and prev not in ("", "&", "|", "(") else None
-            elements.append(elem)
-        elif elem:
-            not_, elem = match(r"^(!)?(.*)$", elem).groups()
-            if not elem:
-                continue
-            elements.append("and") if prev not in ("", "&", "|", "(") else None
-            elements.append(f"({aliases.get(field, field)}{' not' * bool(not_)} like ? escape '\\')")
-            values.append(format_value(elem, like=field in likes))
-        prev = elem
-
-    return elements, values
+    return list(elements), list(values)
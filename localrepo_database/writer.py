@@ -0,0 +1,190 @@
+from concurrent.futures import Future
+from os import PathLike
+from pathlib import Path
+from queue import Empty
+from queue import Queue
+from sys import maxsize
+from threading import Lock
+from threading import Thread
+from time import perf_counter
+from typing import Any
+from typing import Callable
+from typing import Iterable
+from typing import TypeVar
+
+from .batch import Batch
+from .database import Database
+from .selector import Selector
+from .types import Value
+
+__all__ = [
+    "Operation",
+    "WriteQueue",
+]
+
+T = TypeVar("T")
+Operation = Callable[[Database], T]
+
+
+class WriteQueue:
+    def __init__(self, path: str | PathLike | Path, *, max_queue: int = 1000, max_ops: int = 500,
+                 check_connections: bool = False, check_version: bool = True):
+        self.path: Path = Path(path).resolve()
+        self.max_ops: int = max_ops
+        self.check_connections: bool = check_connections
+        self.check_version: bool = check_version
+        self.queue: Queue[tuple[Operation, Future] | None] = Queue(max_queue)
+        self.thread: Thread | None = None
+        self.submitted: int = 0
+        self.completed: int = 0
+        self.failed: int = 0
+        self.transactions: int = 0
+        self.largest_transaction: int = 0
+        self.busy_time: float = 0
+        self._start: float = 0
+        self._lock: Lock = Lock()
+        self._ready: Future[None] = Future()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({str(self.path)!r}, pending={self.queue.qsize()})"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, _exc_type, _exc_val, _exc_tb):
+        self.close()
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self) -> 'WriteQueue':
+        if self.running:
+            return self
+        self._ready = Future()
+        self._start = perf_counter()
+        self.thread = Thread(target=self._run, name=f"{self.__class__.__name__}({self.path.name})", daemon=True)
+        self.thread.start()
+        # Errors opening the database are raised in the thread that started the writer
+        self._ready.result()
+        return self
+
+    def close(self, timeout: float = None):
+        if not self.running:
+            return
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    def submit(self, operation: Operation, *, timeout: float = None) -> Future:
+        if not self.running:
+            raise RuntimeError("writer is not running")
+        future: Future = Future()
+        # A full queue blocks the producer until the writer catches up
+        self.queue.put((operation, future), timeout=timeout)
+        with self._lock:
+            self.submitted += 1
+        return future
+
+    def _run(self):
+        try:
+            db: Database = Database(self.path, check_connections=self.check_connections,
+                                    check_version=self.check_version)
+        except BaseException as err:
+            self._ready.set_exception(err)
+            return
+        self._ready.set_result(None)
+        with db, db.batch(maxsize, float("inf")) as batch:
+            stop: bool = False
+            while not stop:
+                operations, stop = self._next_operations()
+                if operations:
+                    self._apply(batch, operations)
+
+    def _next_operations(self) -> tuple[list[tuple[Operation, Future]], bool]:
+        # Block for the first operation, then group whatever else is already queued into the same transaction
+        operations: list[tuple[Operation, Future]] = []
+        item: tuple[Operation, Future] | None = self.queue.get()
+        while item is not None:
+            operations.append(item)
+            if len(operations) >= self.max_ops:
+                break
+            try:
+                item = self.queue.get_nowait()
+            except Empty:
+                break
+        return operations, item is None
+
+    def _apply(self, batch: Batch, operations: list[tuple[Operation, Future]]):
+        start: float = perf_counter()
+        results: list[tuple[Future, Any, BaseException | None]] = []
+        for operation, future in operations:
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with batch.savepoint():
+                    results.append((future, operation(batch.database), None))
+            except BaseException as err:
+                results.append((future, None, err))
+        commit_error: BaseException | None = None
+        try:
+            batch.commit()
+        except BaseException as err:
+            commit_error = err
+            # The group shares one transaction, so none of its operations are kept if the commit fails
+            batch.rollback()
+        # Results are only delivered after the transaction that contains them is committed
+        for future, result, error in results:
+            if error := error or commit_error:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        with self._lock:
+            self.transactions += 1
+            self.largest_transaction = max(self.largest_transaction, len(results))
+            self.completed += sum(1 for *_, e in results if not (e or commit_error))
+            self.failed += sum(1 for *_, e in results if e or commit_error)
+            self.busy_time += perf_counter() - start
+
+    def metrics(self) -> dict[str, Any]:
+        with self._lock:
+            uptime: float = perf_counter() - self._start if self._start else 0
+            return {
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "pending": self.queue.qsize(),
+                "transactions": self.transactions,
+                "largest_transaction": self.largest_transaction,
+                "ops_per_transaction": (self.completed + self.failed) / self.transactions if self.transactions else 0,
+                "ops_per_second": self.completed / uptime if uptime else 0,
+                "utilization": self.busy_time / uptime if uptime else 0,
+            }
+
+    def save_user(self, user: dict[str, Any], **kwargs) -> Future:
+        return self.submit(lambda db: db.users.save_user(user, **kwargs))
+
+    def save_submission(self, submission: dict[str, Any], files: list[bytes] = None, thumbnail: bytes = None,
+                        **kwargs) -> Future:
+        return self.submit(lambda db: db.submissions.save_submission(submission, files, thumbnail, **kwargs))
+
+    def save_journal(self, journal: dict[str, Any], **kwargs) -> Future:
+        return self.submit(lambda db: db.journals.save_journal(journal, **kwargs))
+
+    def save_comment(self, comment: dict[str, Any], **kwargs) -> Future:
+        return self.submit(lambda db: db.comments.save_comment(comment, **kwargs))
+
+    def add_event(self, event: str) -> Future:
+        return self.submit(lambda db: db.history.add_event(event))
+
+    # Tables are given by their Database attribute name, e.g. "submissions"
+    def insert(self, table: str, entry: dict[str, Value], **kwargs) -> Future:
+        return self.submit(lambda db: (t := getattr(db, table)).insert(t.format_entry(entry), **kwargs))
+
+    def update(self, table: str, query: Selector, entry: dict[str, Value]) -> Future:
+        return self.submit(lambda db: getattr(db, table).update(query, entry).rowcount)
+
+    def add_to_list(self, table: str, key: Value, column: str, values: Iterable[Value]) -> Future:
+        return self.submit(lambda db: getattr(db, table).add_to_list(key, column, list(values)))
+
+    def remove_from_list(self, table: str, key: Value, column: str, values: Iterable[Value]) -> Future:
+        return self.submit(lambda db: getattr(db, table).remove_from_list(key, column, list(values)))
@@ -0,0 +1,36 @@
+from pathlib import Path
+
+from pytest import raises
+
+from benchmarks.generate import generate_database
+from benchmarks.generate import Scale
+from localrepo_database import Database
+from localrepo_database.selector import LT
+
+
+def _count(db: Database) -> int:
+    return db.submissions.aggregate(metrics={"count": "count"})[0]["count"]
+
+
+def test_aggregate_cache_after_rollback(tmp_path: Path):
+    generate_database(tmp_path / "test.db", Scale(50, files=0)).close()
+
+    with Database(tmp_path / "test.db", check_connections=False) as db:
+        assert _count(db) == 50
+        db.submissions.delete({LT: {"ID": 11}})
+        assert _count(db) == 40
+        db.rollback()
+        assert _count(db) == 50
+
+
+def test_aggregate_cache_after_savepoint_rollback(tmp_path: Path):
+    generate_database(tmp_path / "test.db", Scale(50, files=0)).close()
+
+    with Database(tmp_path / "test.db", check_connections=False) as db:
+        with db.batch() as batch:
+            with raises(ValueError):
+                with batch.savepoint():
+                    db.submissions.delete({LT: {"ID": 11}})
+                    assert _count(db) == 40
+                    raise ValueError
+            assert _count(db) == 50
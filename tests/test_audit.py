@@ -0,0 +1,29 @@
+from pathlib import Path
+
+from benchmarks.generate import ArchiveGenerator
+from benchmarks.generate import Scale
+from localrepo_database import Database
+from localrepo_database.audit import audit_files
+
+
+def test_audit_files(tmp_path: Path):
+    with Database(tmp_path / "test.db", init=True, check_connections=False) as db:
+        generator: ArchiveGenerator = ArchiveGenerator(Scale(300, files=0))
+        ids: list[int] = []
+        for n, submission in enumerate(generator.submissions(1, 300)):
+            if n % 3:
+                db.submissions.save_submission(submission, [generator.file("png")], generator.thumbnail())
+            else:
+                db.submissions.save_submission(submission, [])
+            ids.append(submission["ID"])
+        db.commit()
+
+        assert audit_files(db, chunk_size=50).mismatched == 0
+
+        files, _ = db.submissions.get_submission_files(ids[1])
+        files[0].unlink()
+        report = audit_files(db, chunk_size=50, repair=True)
+        assert report.complete
+        assert report.checked == len(ids)
+        assert [(m.submission_id, m.missing) for m in report.mismatches] == [(ids[1], [files[0].name])]
+        assert audit_files(db, chunk_size=50).mismatched == 0
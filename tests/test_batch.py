@@ -0,0 +1,80 @@
+from pathlib import Path
+from sqlite3 import connect
+
+from pytest import raises
+
+from benchmarks.generate import ArchiveGenerator
+from benchmarks.generate import Scale
+from localrepo_database import Database
+
+
+def _count(path: Path) -> int:
+    with connect(path) as connection:
+        return connection.execute("select count(*) from USERS").fetchone()[0]
+
+
+def test_savepoints_share_the_batch_transaction(tmp_path: Path):
+    users: list[dict] = list(ArchiveGenerator(Scale(400)).users())[:4]
+
+    with Database(tmp_path / "test.db", init=True, check_connections=False) as db:
+        db.commit()
+        with db.batch(max_ops=100, max_seconds=60) as batch:
+            for user in users[:3]:
+                with batch.savepoint():
+                    db.users.save_user(user)
+            with raises(ValueError):
+                with batch.savepoint():
+                    db.users.save_user(users[3])
+                    raise ValueError
+
+            # Released savepoints stay in the open transaction until the batch commits
+            assert db.connection.in_transaction
+            assert _count(db.path) == 0
+            assert batch.commits == 0
+
+        assert _count(db.path) == 3
+        assert batch.commits == 1
+        assert len(batch.rows_per_commit) == 1
+        assert batch.rollbacks == 1
+
+
+def test_batch_rollback_undoes_released_savepoints(tmp_path: Path):
+    users: list[dict] = list(ArchiveGenerator(Scale(400)).users())[:2]
+
+    with Database(tmp_path / "test.db", init=True, check_connections=False) as db:
+        db.commit()
+        with raises(ValueError):
+            with db.batch(max_ops=100, max_seconds=60) as batch:
+                for user in users:
+                    with batch.savepoint():
+                        db.users.save_user(user)
+                raise ValueError
+
+        assert len(db.users) == 0
+        assert _count(db.path) == 0
+
+
+def test_batch_rollback_restores_released_files(tmp_path: Path):
+    submission: dict = next(iter(ArchiveGenerator(Scale(3, files=0)).submissions(1, 2)))
+
+    with Database(tmp_path / "test.db", init=True, check_connections=False) as db:
+        db.submissions.save_submission(submission, [b"OLD"])
+        db.commit()
+        file: Path = db.submissions.get_submission_files(submission["ID"])[0][0]
+
+        with raises(ValueError):
+            with db.batch(max_ops=100, max_seconds=60) as batch:
+                with batch.savepoint():
+                    db.submissions.save_submission(submission, [b"NEW"], replace=True)
+                assert file.read_bytes() == b"NEW"
+                raise ValueError
+
+        assert file.read_bytes() == b"OLD"
+        assert [f.name for f in file.parent.iterdir() if f.name.endswith(".savepoint")] == []
+
+        with db.batch(max_ops=100, max_seconds=60) as batch:
+            with batch.savepoint():
+                db.submissions.save_submission(submission, [b"NEW"], replace=True)
+
+        assert file.read_bytes() == b"NEW"
+        assert [f.name for f in file.parent.iterdir() if f.name.endswith(".savepoint")] == []
@@ -0,0 +1,60 @@
+from pathlib import Path
+from typing import Any
+
+from benchmarks.generate import ArchiveGenerator
+from benchmarks.generate import Scale
+from localrepo_database import Column
+from localrepo_database import Database
+
+
+def _database(path: Path) -> Database:
+    db: Database = Database(path, init=True, check_connections=False)
+    generator: ArchiveGenerator = ArchiveGenerator(Scale(50, files=0))
+    for submission in generator.submissions(1, 50):
+        db.submissions.save_submission(submission, [])
+    db.commit()
+    return db
+
+
+def test_order_by_encoded_columns(tmp_path: Path):
+    with _database(tmp_path / "test.db") as db:
+        expected_species: list[str] = sorted(s["SPECIES"] for s in db.submissions)
+        expected_descriptions: list[str] = sorted((s["DESCRIPTION"] for s in db.submissions), reverse=True)
+        db.enable_dictionary_encoding()
+        db.enable_compression()
+        assert [s["SPECIES"] for s in db.submissions.select(order=["SPECIES"])] == expected_species
+        assert [s["DESCRIPTION"] for s in db.submissions.select(order=["DESCRIPTION desc"])] == expected_descriptions
+
+
+def test_lookups_do_not_add_codes(tmp_path: Path):
+    with _database(tmp_path / "test.db") as db:
+        db.enable_dictionary_encoding()
+        db.commit()
+        codes: int = len(db.codes)
+        assert db.submissions[{"SPECIES": "Unknown Species"}] == []
+        del db.submissions[{"RATING": "Unknown Rating"}]
+        assert len(db.codes) == codes
+        species: str = next(iter(db.submissions))["SPECIES"]
+        assert db.submissions[{"SPECIES": species}]
+        assert len(db.codes) == codes
+
+
+def test_encoded_table_columns(tmp_path: Path):
+    with _database(tmp_path / "test.db") as db:
+        db.enable_dictionary_encoding()
+        columns: dict[str, Column] = {c.name: c for c in db["SUBMISSIONS"].columns}
+        assert columns["SPECIES"].type is Any
+        assert next(db["SUBMISSIONS"].select(columns=["SPECIES"]))["SPECIES"] is not None
+
+
+def test_encoding_rebuilds_the_table_once(tmp_path: Path):
+    with _database(tmp_path / "test.db") as db:
+        statements: list[str] = []
+        db.hooks.append(lambda event: statements.append(event.sql.lower()))
+        db.enable_dictionary_encoding()
+        assert sum(s.startswith("drop table") for s in statements) == 1
+        statements.clear()
+        db.enable_dictionary_encoding()
+        assert not any(s.startswith("drop table") for s in statements)
+        db.disable_dictionary_encoding()
+        assert sum(s.startswith("drop table") for s in statements) == 1
@@ -0,0 +1,51 @@
+from pathlib import Path
+
+from pytest import raises
+
+from benchmarks.generate import ArchiveGenerator
+from benchmarks.generate import Scale
+from localrepo_database import Database
+from localrepo_database.export import export_database
+from localrepo_database.export import import_database
+
+
+def _database(path: Path) -> Database:
+    db: Database = Database(path, init=True, check_connections=False)
+    generator: ArchiveGenerator = ArchiveGenerator(Scale(20, files=0))
+    for user in generator.users():
+        db.users.save_user(user)
+    for submission in generator.submissions(1, 20):
+        db.submissions.save_submission(submission, [])
+    db.commit()
+    return db
+
+
+def test_export_with_similarity(tmp_path: Path):
+    with _database(tmp_path / "test.db") as db:
+        db.enable_similarity()
+        counts: dict[str, int] = export_database(db, tmp_path / "export")
+        assert "SIMILARITY" not in counts and "SIMILARITY_BUCKETS" not in counts
+        assert counts["SUBMISSIONS"] == len(db.submissions)
+        assert not list((tmp_path / "export").glob("SIMILARITY*"))
+        with raises(ValueError):
+            export_database(db, tmp_path / "export", tables=["SIMILARITY"])
+
+
+def test_round_trip_into_new_database(tmp_path: Path):
+    with _database(tmp_path / "test.db") as db:
+        db.settings["KEY"] = "VALUE"
+        db.history.add_event("event")
+        db.commit()
+        counts: dict[str, int] = export_database(db, tmp_path / "export", compress=True)
+        submissions: list[dict] = list(db.submissions)
+        users: list[dict] = list(db.users)
+
+    with Database(tmp_path / "copy.db", init=True, check_connections=False) as copy:
+        imported: dict[str, int] = import_database(copy, tmp_path / "export")
+        copy.commit()
+        assert imported == {n: c for n, c in counts.items() if n in imported}
+        assert imported["SUBMISSIONS"] == len(submissions)
+        assert list(copy.submissions) == submissions
+        assert list(copy.users) == users
+        assert copy.settings["KEY"] == "VALUE"
+        assert [e["EVENT"] for e in copy.history] == ["event"]
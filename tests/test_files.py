@@ -0,0 +1,55 @@
+from pathlib import Path
+
+from benchmarks.generate import ArchiveGenerator
+from benchmarks.generate import Scale
+from localrepo_database import Database
+
+
+def _database(path: Path) -> tuple[Database, list[dict]]:
+    db: Database = Database(path, init=True, check_connections=False)
+    return db, list(ArchiveGenerator(Scale(3, files=0)).submissions(1, 2))
+
+
+def test_files_table_only_with_dedup(tmp_path: Path):
+    db, _ = _database(tmp_path / "test.db")
+    with db:
+        assert "FILES" not in db
+        db.settings.files_dedup = True
+        assert "FILES" in db
+
+
+def test_disabling_dedup_does_not_write_through_links(tmp_path: Path):
+    db, (a, b) = _database(tmp_path / "test.db")
+    with db:
+        db.settings.files_dedup = True
+        db.submissions.save_submission(a, [b"SAME"])
+        db.submissions.save_submission(b, [b"SAME"])
+        digest: str = db.files.get_files(a["ID"])[0]["HASH"]
+        db.settings.files_dedup = False
+        db.submissions.save_submission(a, [b"CHANGED"], replace=True)
+
+        assert db.submissions.get_submission_files(a["ID"])[0][0].read_bytes() == b"CHANGED"
+        assert db.submissions.get_submission_files(b["ID"])[0][0].read_bytes() == b"SAME"
+        assert db.files.store_path(digest).read_bytes() == b"SAME"
+        assert db.files.get_files(a["ID"]) == []
+
+
+def test_unused_store_files_are_removed(tmp_path: Path):
+    db, (a, b) = _database(tmp_path / "test.db")
+    with db:
+        db.settings.files_dedup = True
+        db.submissions.save_submission(a, [b"SHARED"])
+        db.submissions.save_submission(b, [b"SHARED"])
+        shared: Path = db.files.store_path(db.files.get_files(a["ID"])[0]["HASH"])
+
+        db.submissions.save_submission(a, [b"REPLACED"], replace=True)
+        replaced: Path = db.files.store_path(db.files.get_files(a["ID"])[0]["HASH"])
+        assert shared.is_file()
+
+        del db.submissions[b["ID"]]
+        assert not shared.is_file()
+        assert db.files.get_files(b["ID"]) == []
+
+        db.submissions.save_submission(a, [b"AGAIN"], replace=True)
+        assert not replaced.is_file()
+        assert db.files.stats()["files"] == 1
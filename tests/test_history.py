@@ -0,0 +1,27 @@
+from pathlib import Path
+
+from localrepo_database import Database
+
+
+def test_buffered_events_are_written_on_close(tmp_path: Path):
+    with Database(tmp_path / "test.db", init=True, check_connections=False) as db:
+        db.commit()
+        db.history.buffer_events, db.history.buffer_seconds = 1000, float("inf")
+        db.history.add_event("first")
+        db.history.add_event("second")
+        assert db.history.buffered == 2
+
+    with Database(tmp_path / "test.db", check_connections=False) as db:
+        assert [e["EVENT"] for e in db.history] == ["first", "second"]
+
+
+def test_buffered_events_follow_uncommitted_changes(tmp_path: Path):
+    with Database(tmp_path / "test.db", init=True, check_connections=False) as db:
+        db.commit()
+        db.settings["KEY"] = "VALUE"
+        db.history.buffer_events, db.history.buffer_seconds = 1000, float("inf")
+        db.history.add_event("discarded")
+
+    with Database(tmp_path / "test.db", check_connections=False) as db:
+        assert list(db.history) == []
+        assert db.settings["KEY"] is None
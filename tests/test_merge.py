@@ -0,0 +1,61 @@
+from pathlib import Path
+
+from pytest import MonkeyPatch
+
+from benchmarks.generate import ArchiveGenerator
+from benchmarks.generate import Scale
+from localrepo_database import Database
+from localrepo_database.files import SubmissionFile
+
+
+def test_merge_shared_files_folder(tmp_path: Path):
+    generator: ArchiveGenerator = ArchiveGenerator(Scale(3, files=0))
+    file: bytes = generator.file("png")
+    thumbnail: bytes = generator.thumbnail()
+
+    with Database(tmp_path / "source.db", init=True, check_connections=False) as source:
+        submission_ids: list[int] = []
+        for submission in generator.submissions(1, 3):
+            source.submissions.save_submission(submission, [file], thumbnail)
+            submission_ids.append(submission["ID"])
+        source.commit()
+
+        # Both databases use the default files folder next to them, so merging rewrites the files it reads
+        with Database(tmp_path / "destination.db", init=True, check_connections=False) as destination:
+            assert destination.submissions.files_folder == source.submissions.files_folder
+            destination.merge(source)
+            destination.commit()
+
+            assert len(destination.submissions) == len(submission_ids)
+            for submission_id in submission_ids:
+                files, thumbnail_file = destination.submissions.get_submission_files(submission_id)
+                assert [f.read_bytes() for f in files] == [file]
+                assert thumbnail_file.read_bytes() == thumbnail
+
+
+def test_merge_maps_files_from_other_folders(tmp_path: Path, monkeypatch: MonkeyPatch):
+    generator: ArchiveGenerator = ArchiveGenerator(Scale(3, files=0))
+    file: bytes = generator.file("png")
+    thumbnail: bytes = generator.thumbnail()
+    mapped: list[SubmissionFile] = []
+    mmap = SubmissionFile.mmap
+    monkeypatch.setattr(SubmissionFile, "mmap", lambda self: mapped.append(self) or mmap(self))
+    (tmp_path / "source").mkdir()
+    (tmp_path / "destination").mkdir()
+
+    with Database(tmp_path / "source" / "FA.db", init=True, check_connections=False) as source:
+        submission_ids: list[int] = []
+        for submission in generator.submissions(1, 3):
+            source.submissions.save_submission(submission, [file], thumbnail)
+            submission_ids.append(submission["ID"])
+        source.commit()
+
+        with Database(tmp_path / "destination" / "FA.db", init=True, check_connections=False) as destination:
+            destination.merge(source)
+            destination.commit()
+
+            assert len(mapped) == 2 * len(submission_ids)
+            for submission_id in submission_ids:
+                files, thumbnail_file = destination.submissions.get_submission_files(submission_id)
+                assert [f.read_bytes() for f in files] == [file]
+                assert thumbnail_file.read_bytes() == thumbnail
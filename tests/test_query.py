@@ -0,0 +1,99 @@
+from random import Random
+from re import match
+from re import split
+from re import sub
+
+from pytest import mark
+
+from localrepo_database.util import query_to_sql
+
+
+# The regular expression implementation replaced by the single-pass tokenizer, kept as the reference behaviour
+def _reference_format_value(value: str, *, like: bool = False) -> str:
+    value = sub(r"(?<!\\)((?:\\\\)+)?([%_^$])", r"\1\\\2", m.group(1)) if (m := match(r'^"(.*)"$', value)) else value
+    value = value.lstrip("^") if match(r"^[%^].*", value) else "%" + value if like else value
+    value = value.rstrip("$") if match(r".*(?<!\\)((?:\\\\)+)?[%$]$", value) else value + "%" if like else value
+    return value
+
+
+def _reference_query_to_sql(query: str, default_field: str, likes: list[str] = None, aliases: dict[str, str] = None
+                            ) -> tuple[list[str], list[str]]:
+    if not query:
+        return [], []
+
+    likes, aliases = likes or [], aliases or {}
+    elements: list[str] = []
+    values: list[str] = []
+
+    query = sub(r"(^[&| ]+|((?<!\\)[&|]| )+$)", "", query)
+    query = sub(r"( *[&|])+(?= *[&|] *[@()])", "", query)
+
+    field, prev = default_field, ""
+    for elem in filter(bool, map(str.strip, split(r'((?<!\\)(?:"|!")(?:[^"]|(?<=\\)")*"|(?<!\\)[()&|]| +)', query))):
+        if m := match(r"^@(\w+)$", elem):
+            field = m.group(1).lower()
+            continue
+        elif elem == "&":
+            elements.append("and")
+        elif elem == "|":
+            elements.append("or")
+        elif elem in ("(", ")"):
+            elements.append("and") if elem == "(" and prev not in ("", "&", "|", "(") else None
+            elements.append(elem)
+        elif elem:
+            not_, elem = match(r"^(!)?(.*)$", elem).groups()
+            if not elem:
+                continue
+            elements.append("and") if prev not in ("", "&", "|", "(") else None
+            elements.append(f"({aliases.get(field, field)}{' not' * bool(not_)} like ? escape '\\')")
+            values.append(_reference_format_value(elem, like=field in likes))
+        prev = elem
+
+    return elements, values
+
+
+_pieces: list[str] = ["fox", "wolf", "Ych", "a_b", "50%", "^start", "end$", "@title", "@TAGS", "@any", "@", "&", "|",
+                      "(", ")", '"', '!"', "!", "\\", "\\&", "\\|", "\\\"", " ", "  ", "\n", "\t", "-", "é", "_"]
+
+
+def _random_query(random: Random) -> str:
+    return "".join(random.choice(_pieces) for _ in range(random.randint(1, 12)))
+
+
+def _compile(function, query: str) -> tuple[list[str], list[str]] | type[Exception]:
+    try:
+        return function(query, "any", ["any", "tags"], {"any": "TITLE || TAGS", "title": "TITLE"})
+    except Exception as err:
+        return type(err)
+
+
+@mark.parametrize("query", [
+    "fox", "fox wolf", "fox & wolf | (ych)", "@title fox @tags !wolf", '"exact match" | !"not this"',
+    "^start end$", "50%_", "a\\&b", "&& fox ||", "fox | & @title wolf", "(fox)(wolf)", "!", '"unterminated', "",
+])
+def test_query_to_sql_examples(query: str):
+    assert _compile(query_to_sql, query) == _compile(_reference_query_to_sql, query)
+
+
+def test_query_to_sql_equivalence():
+    random: Random = Random(0)
+    failed_reference: int = 0
+    for _ in range(20_000):
+        query: str = _random_query(random)
+        expected = _compile(_reference_query_to_sql, query)
+        result = _compile(query_to_sql, query)
+        if isinstance(expected, type):
+            # The reference raised, e.g. on values containing a newline, the tokenizer must still compile the query
+            failed_reference += 1
+            assert not isinstance(result, type), query
+        else:
+            assert result == expected, query
+    assert failed_reference > 0
+
+
+@mark.parametrize("query", ["fox\nwolf", "fox\n", "\nfox", "@title a\nb & c", '"a\nb"', "!a\nb"])
+def test_query_to_sql_newlines(query: str):
+    assert isinstance(_compile(_reference_query_to_sql, query), type) or \
+           _compile(query_to_sql, query) == _compile(_reference_query_to_sql, query)
+    elements, values = query_to_sql(query, "any")
+    assert len(values) == sum(e.endswith("like ? escape '\\')") for e in elements)
@@ -0,0 +1,35 @@
+from pathlib import Path
+
+from benchmarks.generate import ArchiveGenerator
+from benchmarks.generate import Scale
+from localrepo_database import Database
+from localrepo_database.shard import FederatedDatabase
+from localrepo_database.shard import ShardedDatabase
+
+
+def test_federated_order_by_unselected_column(tmp_path: Path):
+    generator: ArchiveGenerator = ArchiveGenerator(Scale(20, files=0))
+    submissions: list[dict] = list(generator.submissions(1, 20))
+    for n, path in enumerate((tmp_path / "a.db", tmp_path / "b.db")):
+        with Database(path, init=True, check_connections=False) as db:
+            for submission in submissions[n::2]:
+                db.submissions.save_submission(submission, [])
+            db.commit()
+
+    with FederatedDatabase(tmp_path / "a.db", tmp_path / "b.db") as db:
+        entries: list[dict] = db.submissions.select(columns=["TITLE"], order=["ID desc"], limit=5, offset=2).fetchall()
+        expected: list[dict] = sorted(submissions, key=lambda s: s["ID"], reverse=True)[2:7]
+        assert entries == [{"TITLE": s["TITLE"]} for s in expected]
+
+
+def test_sharded_rollback_skips_idle_databases(tmp_path: Path):
+    first, *_, last = ArchiveGenerator(Scale(20, files=0)).submissions(1, 20)
+    with ShardedDatabase(tmp_path, shard_size=10, init=True, check_connections=False) as db:
+        db.shard(last["ID"]).submissions.save_submission(last, [])
+        db.commit()
+        db.shard(first["ID"]).submissions.save_submission(first, [])
+        assert [d.connection.in_transaction for d in db.databases] == [False, True, False]
+        db.rollback()
+        assert db.submissions[first["ID"]] is None
+        assert db.submissions[last["ID"]] is not None
+        assert not any(d.connection.in_transaction for d in db.databases)
@@ -0,0 +1,38 @@
+from pathlib import Path
+
+from pytest import raises
+
+from localrepo_database import Database
+from localrepo_database.tracing import QueryEvent
+from localrepo_database.tracing import QueryStats
+
+
+def test_named_parameters_with_hooks(tmp_path: Path):
+    with Database(tmp_path / "test.db", init=True, check_connections=False) as db:
+        events: list[QueryEvent] = []
+        db.hooks.append(events.append)
+        assert db.execute("select :a + :b", {"a": 1, "b": 2}).fetchone() == (3,)
+        assert events[-1].parameters == {"a": 1, "b": 2}
+        assert events[-1].explain()
+
+
+def test_fetchone_finishes_event(tmp_path: Path):
+    with Database(tmp_path / "test.db", init=True, check_connections=False) as db:
+        stats: QueryStats = QueryStats()
+        db.hooks.append(stats)
+        cursor = db.execute("select 1 union all select 2")
+        assert cursor.fetchone() == (1,)
+        assert [s.count for s in stats] == [1]
+        assert list(cursor) == [(2,)]
+        assert [s.count for s in stats] == [1]
+
+
+def test_hook_errors_propagate(tmp_path: Path):
+    def hook(_event: QueryEvent):
+        raise ValueError("hook failed")
+
+    with Database(tmp_path / "test.db", init=True, check_connections=False) as db:
+        db.hooks.append(hook)
+        with raises(ValueError, match="hook failed"):
+            db.execute("select 1").fetchone()
+        db.hooks.remove(hook)
@@ -0,0 +1,103 @@
+from pathlib import Path
+from sqlite3 import connect
+from threading import Event
+
+from pytest import raises
+
+from benchmarks.generate import ArchiveGenerator
+from benchmarks.generate import Scale
+from localrepo_database import Database
+from localrepo_database.util import tiered_path
+from localrepo_database.writer import WriteQueue
+
+
+def _committed_users(path: Path) -> set[str]:
+    with connect(path) as connection:
+        return {u for [u] in connection.execute("select USERNAME from USERS")}
+
+
+def _database(path: Path) -> Path:
+    with Database(path, init=True, check_connections=False) as db:
+        db.commit()
+    return path
+
+
+def test_operations_are_committed_as_a_group(tmp_path: Path):
+    path: Path = _database(tmp_path / "test.db")
+    users: list[dict] = list(ArchiveGenerator(Scale(400)).users())[:3]
+    started: Event = Event()
+    release: Event = Event()
+    visible: list[set[str]] = []
+
+    with WriteQueue(path) as writer:
+        # The first operation holds the writer until the others are queued, so they are applied together
+        writer.submit(lambda db: started.set() or release.wait(10))
+        started.wait(10)
+        futures = [writer.save_user(user) for user in users]
+        futures.append(writer.submit(lambda db: visible.append(_committed_users(path))))
+        release.set()
+        for future in futures:
+            future.result(10)
+        metrics: dict = writer.metrics()
+
+    assert visible == [set()]
+    assert _committed_users(path) == {u["USERNAME"] for u in users}
+    assert metrics["transactions"] == 2
+    assert metrics["largest_transaction"] == len(futures)
+
+
+def _fail_commit(db: Database):
+    commit = db.commit
+
+    def failing_commit():
+        db.commit = commit
+        raise RuntimeError("commit failed")
+
+    db.commit = failing_commit
+
+
+def test_failed_commit_discards_the_group(tmp_path: Path):
+    path: Path = _database(tmp_path / "test.db")
+    users: list[dict] = list(ArchiveGenerator(Scale(400)).users())[:3]
+    started: Event = Event()
+    release: Event = Event()
+
+    with WriteQueue(path) as writer:
+        writer.submit(lambda db: started.set() or release.wait(10))
+        started.wait(10)
+        futures = [writer.save_user(user) for user in users]
+        futures.append(writer.submit(_fail_commit))
+        release.set()
+        for future in futures:
+            with raises(RuntimeError, match="commit failed"):
+                future.result(10)
+        assert writer.metrics()["failed"] == len(futures)
+
+    assert _committed_users(path) == set()
+
+
+def test_failed_commit_restores_files(tmp_path: Path):
+    path: Path = _database(tmp_path / "test.db")
+    old, new = list(ArchiveGenerator(Scale(3, files=0)).submissions(1, 3))[:2]
+    with Database(path, check_connections=False) as db:
+        db.submissions.save_submission(old, [b"OLD"])
+        db.commit()
+        file: Path = db.submissions.get_submission_files(old["ID"])[0][0]
+    started: Event = Event()
+    release: Event = Event()
+
+    with WriteQueue(path) as writer:
+        writer.submit(lambda db: started.set() or release.wait(10))
+        started.wait(10)
+        futures = [writer.save_submission(old, [b"NEW"], replace=True), writer.save_submission(new, [b"NEW"]),
+                   writer.submit(_fail_commit)]
+        release.set()
+        for future in futures:
+            with raises(RuntimeError, match="commit failed"):
+                future.result(10)
+
+    with Database(path, check_connections=False) as db:
+        assert file.read_bytes() == b"OLD"
+        assert db.submissions[new["ID"]] is None
+        assert list((db.submissions.files_folder / tiered_path(new["ID"])).glob("submission*")) == []
+        assert [f for f in file.parent.iterdir() if f.name.endswith(".savepoint")] == []